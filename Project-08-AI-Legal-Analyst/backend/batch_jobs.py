@@ -0,0 +1,207 @@
+# backend/batch_jobs.py
+
+import json
+import os
+import sqlite3
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+
+class BatchJobManager:
+    """
+    Runs batch contract analyses on a bounded worker pool and persists every job in SQLite.
+
+    Documents are stored with their job, so the worker queue only carries (job_id, doc_index)
+    pairs and unfinished documents are re-queued after a restart by resume_unfinished(). Uploads
+    that could not be read are recorded as "skipped" documents with the reason in their error.
+    """
+
+    def __init__(self, db_path: str, max_workers: int, analyze_fn):
+        # analyze_fn(text, options) -> dict runs one analysis and raises on failure
+        self.db_path = db_path
+        self.analyze_fn = analyze_fn
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="lexpro-batch")
+
+        os.makedirs(os.path.dirname(db_path) or ".", exist_ok=True)
+        with self._connect() as db:
+            db.execute("PRAGMA journal_mode=WAL")
+            db.execute(
+                "CREATE TABLE IF NOT EXISTS batch_jobs ("
+                "id TEXT PRIMARY KEY, created_at REAL NOT NULL, options TEXT NOT NULL)"
+            )
+            db.execute(
+                "CREATE TABLE IF NOT EXISTS batch_documents ("
+                "job_id TEXT NOT NULL, doc_index INTEGER NOT NULL, filename TEXT NOT NULL, "
+                "status TEXT NOT NULL, text TEXT NOT NULL, result TEXT, error TEXT, "
+                "started_at REAL, finished_at REAL, PRIMARY KEY (job_id, doc_index))"
+            )
+            db.execute("CREATE INDEX IF NOT EXISTS idx_batch_documents_status ON batch_documents(status)")
+
+    @contextmanager
+    def _connect(self):
+        # One short-lived connection per operation keeps SQLite safe across worker threads
+        db = sqlite3.connect(self.db_path, timeout=30)
+        try:
+            with db: # Commits on success, rolls back on error
+                yield db
+        finally:
+            db.close()
+
+    def create_job(self, documents: list, options: dict, skipped: list = None) -> str:
+        """
+        Persists a new job with its documents [(filename, text), ...] and queues every document.
+        skipped [(filename, reason), ...] are stored after them with status "skipped" and never analyzed.
+        """
+        job_id = uuid.uuid4().hex
+        with self._connect() as db:
+            db.execute(
+                "INSERT INTO batch_jobs (id, created_at, options) VALUES (?, ?, ?)",
+                (job_id, time.time(), json.dumps(options))
+            )
+            db.executemany(
+                "INSERT INTO batch_documents (job_id, doc_index, filename, status, text) VALUES (?, ?, ?, 'queued', ?)",
+                [(job_id, index, filename, text) for index, (filename, text) in enumerate(documents)]
+            )
+            db.executemany(
+                "INSERT INTO batch_documents (job_id, doc_index, filename, status, text, error, finished_at) "
+                "VALUES (?, ?, ?, 'skipped', '', ?, ?)",
+                [(job_id, len(documents) + index, filename, reason, time.time())
+                 for index, (filename, reason) in enumerate(skipped or [])]
+            )
+        for index in range(len(documents)):
+            self._executor.submit(self._process, job_id, index)
+        return job_id
+
+    def resume_unfinished(self) -> int:
+        """
+        Re-queues documents that were queued or running when the server stopped.
+        Returns the number of documents re-queued.
+        """
+        with self._connect() as db:
+            db.execute("UPDATE batch_documents SET status = 'queued', started_at = NULL WHERE status = 'running'")
+            pending = db.execute(
+                "SELECT d.job_id, d.doc_index FROM batch_documents d JOIN batch_jobs j ON j.id = d.job_id "
+                "WHERE d.status = 'queued' ORDER BY j.created_at, d.doc_index"
+            ).fetchall()
+        for job_id, index in pending:
+            self._executor.submit(self._process, job_id, index)
+        return len(pending)
+
+    def _process(self, job_id: str, index: int):
+        with self._connect() as db:
+            row = db.execute(
+                "SELECT d.text, j.options FROM batch_documents d JOIN batch_jobs j ON j.id = d.job_id "
+                "WHERE d.job_id = ? AND d.doc_index = ? AND d.status = 'queued'",
+                (job_id, index)
+            ).fetchone()
+            if row is None:
+                return
+            db.execute(
+                "UPDATE batch_documents SET status = 'running', started_at = ? WHERE job_id = ? AND doc_index = ?",
+                (time.time(), job_id, index)
+            )
+        text, options = row[0], json.loads(row[1])
+
+        status, result, error = "completed", None, None
+        try:
+            result = json.dumps(self.analyze_fn(text, options))
+        except Exception as e:
+            # HTTPException carries its message in .detail; anything else in str(e)
+            status, error = "failed", str(getattr(e, "detail", e))
+            print(f"Batch job {job_id}: document {index} failed: {error}")
+
+        with self._connect() as db:
+            db.execute(
+                "UPDATE batch_documents SET status = ?, result = ?, error = ?, finished_at = ? "
+                "WHERE job_id = ? AND doc_index = ?",
+                (status, result, error, time.time(), job_id, index)
+            )
+
+    def get_status(self, job_id: str):
+        """
+        Returns job progress and per-document status (without results), or None if the job is unknown.
+        """
+        with self._connect() as db:
+            job = db.execute("SELECT created_at, options FROM batch_jobs WHERE id = ?", (job_id,)).fetchone()
+            if job is None:
+                return None
+            documents = db.execute(
+                "SELECT doc_index, filename, status, error, started_at, finished_at FROM batch_documents "
+                "WHERE job_id = ? ORDER BY doc_index",
+                (job_id,)
+            ).fetchall()
+
+        counts = {"queued": 0, "running": 0, "completed": 0, "failed": 0, "skipped": 0}
+        for document in documents:
+            counts[document[2]] += 1
+        total, done = len(documents), counts["completed"] + counts["failed"] + counts["skipped"]
+        if done == total:
+            status = (
+                "failed" if not counts["completed"]
+                else "completed_with_errors" if counts["failed"] or counts["skipped"] else "completed"
+            )
+        else:
+            status = "running" if done or counts["running"] else "queued"
+        finished = [document[5] for document in documents if document[5]]
+
+        return {
+            "job_id": job_id,
+            "status": status,
+            "options": json.loads(job[1]),
+            "created_at": job[0],
+            "finished_at": max(finished) if done == total and finished else None,
+            "total": total,
+            **counts,
+            "progress": round(done / total * 100, 1) if total else 100.0,
+            "documents": [
+                {
+                    "index": document[0],
+                    "filename": document[1],
+                    "status": document[2],
+                    "error": document[3],
+                    "duration_seconds": round(document[5] - document[4], 2) if document[4] and document[5] else None,
+                }
+                for document in documents
+            ],
+        }
+
+    def get_results(self, job_id: str):
+        """
+        Returns the analysis result of every finished document, or None if the job is unknown.
+        """
+        with self._connect() as db:
+            if db.execute("SELECT 1 FROM batch_jobs WHERE id = ?", (job_id,)).fetchone() is None:
+                return None
+            documents = db.execute(
+                "SELECT doc_index, filename, status, result, error FROM batch_documents "
+                "WHERE job_id = ? AND status IN ('completed', 'failed', 'skipped') ORDER BY doc_index",
+                (job_id,)
+            ).fetchall()
+        return [
+            {
+                "index": document[0],
+                "filename": document[1],
+                "status": document[2],
+                "result": json.loads(document[3]) if document[3] else None,
+                "error": document[4],
+            }
+            for document in documents
+        ]
+
+    def list_jobs(self, limit: int = 50) -> list:
+        """
+        Returns the most recent jobs with their document counts.
+        """
+        with self._connect() as db:
+            rows = db.execute(
+                "SELECT j.id, j.created_at, COUNT(d.doc_index), "
+                "SUM(d.status IN ('completed', 'failed', 'skipped')) FROM batch_jobs j "
+                "LEFT JOIN batch_documents d ON d.job_id = j.id "
+                "GROUP BY j.id ORDER BY j.created_at DESC LIMIT ?",
+                (limit,)
+            ).fetchall()
+        return [
+            {"job_id": row[0], "created_at": row[1], "total": row[2], "finished": row[3] or 0}
+            for row in rows
+        ]
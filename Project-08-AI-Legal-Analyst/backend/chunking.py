@@ -0,0 +1,234 @@
+# backend/chunking.py
+
+import re
+
+# A line that opens a new section or clause, e.g. "ARTICLE IV", "Section 2.1", "12.3 Fees",
+# "(a) ...", "Termination: ...", or an ALL CAPS heading such as "CONFIDENTIALITY".
+HEADING_PATTERN = re.compile(
+    r"^\s*(?:"
+    r"(?:ARTICLE|Article|SECTION|Section|§)\s+[\dIVXLC]+(?:\.\d+)*\b"
+    r"|\d+(?:\.\d+)*[.)]\s+\S"
+    r"|\d+\.\d+(?:\.\d+)*\s+\S"
+    r"|\([a-zA-Z0-9]{1,4}\)\s+\S"
+    r"|[A-Z][A-Za-z&/,' -]{1,60}:(?:\s|$)"
+    r"|[A-Z][A-Z0-9&/,' -]{3,}$"
+    r")"
+)
+
+# Numbered or labelled headings that may stand alone on a line ("ARTICLE IV", "12.3 Fees")
+NUMBERED_HEADING_PATTERN = re.compile(r"^(?:ARTICLE|Article|SECTION|Section|§|\d+(?:\.\d+)*[.)]?)\s")
+
+CHUNK_PROMPT = (
+    "The following is part {index} of {total} of a longer legal document. "
+    "Analyze only this part and respond with a single JSON object containing these keys:\n"
+    "{schema}\n"
+    "Respond with JSON only, no commentary. "
+    "Document part:\n\n---\n{text}\n---"
+)
+
+# Used when chunks are produced while a file is still being read, so the total is not known yet
+PAGE_CHUNK_PROMPT = (
+    "The following is part {index} of a longer legal document. "
+    "Analyze only this part and respond with a single JSON object containing these keys:\n"
+    "{schema}\n"
+    "Respond with JSON only, no commentary. "
+    "Document part:\n\n---\n{text}\n---"
+)
+
+REDUCE_SUMMARY_PROMPT = (
+    "The following are summaries of consecutive parts of one legal document. "
+    "Combine them into a single concise summary of the whole document, highlighting the main purpose, "
+    "parties involved, and key agreements. Focus on brevity and clarity. "
+    "Part summaries:\n\n---\n{text}\n---"
+)
+
+def is_heading_only(line: str) -> bool:
+    """
+    True if the line is a bare heading ("CONFIDENTIALITY", "Termination:", "Section 7 Term")
+    rather than a heading followed by clause text on the same line.
+    """
+    stripped = line.strip()
+    if not stripped or len(stripped) > 80 or stripped[-1] in ".;,":
+        return False
+    if stripped.endswith(":") or (stripped.isupper() and any(ch.isalpha() for ch in stripped)):
+        return True
+    return bool(NUMBERED_HEADING_PATTERN.match(stripped)) and ":" not in stripped and len(stripped.split()) <= 8
+
+def split_into_segments(text: str) -> list:
+    """
+    Splits a legal document into section/clause segments.
+
+    A new segment starts at every blank line and at every heading-like line.
+    A heading that stands alone on its line is kept together with the body that follows it.
+    Returns a list of {"start", "end", "text"} dicts with character offsets into text.
+    """
+    segments = []
+    seg_start = None
+    heading_only = False
+    offset = 0
+
+    def close(end):
+        if seg_start is not None and text[seg_start:end].strip():
+            segments.append({"start": seg_start, "end": end, "text": text[seg_start:end].strip()})
+
+    for line in text.splitlines(keepends=True):
+        stripped = line.strip()
+        if not stripped:
+            # Blank lines end a segment unless we are still waiting for a heading's body
+            if not heading_only:
+                close(offset)
+                seg_start = None
+        elif seg_start is None:
+            seg_start = offset
+            heading_only = is_heading_only(line)
+        elif HEADING_PATTERN.match(line) and not heading_only:
+            close(offset)
+            seg_start = offset
+            heading_only = is_heading_only(line)
+        else:
+            heading_only = False
+        offset += len(line)
+    close(len(text))
+    return segments
+
+def _split_oversized(segment: dict, chunk_size: int) -> list:
+    """
+    Splits a single segment longer than chunk_size at sentence (or, failing that, word) boundaries.
+    """
+    pieces, seg_text, base = [], segment["text"], segment["start"]
+    position = 0
+    while len(seg_text) - position > chunk_size:
+        window = seg_text[position:position + chunk_size]
+        cut = max(window.rfind(". "), window.rfind("; "))
+        if cut < chunk_size // 2:
+            cut = window.rfind(" ")
+        cut = cut + 1 if cut > 0 else chunk_size
+        pieces.append({"start": base + position, "end": base + position + cut, "text": window[:cut].strip()})
+        position += cut
+    pieces.append({"start": base + position, "end": segment["end"], "text": seg_text[position:].strip()})
+    return [piece for piece in pieces if piece["text"]]
+
+def build_chunks(text: str, chunk_size: int, overlap: int) -> list:
+    """
+    Packs consecutive segments into chunks of at most roughly chunk_size characters.
+    Each chunk after the first repeats trailing segments of the previous chunk, up to
+    overlap characters, so clauses that straddle a boundary are seen whole at least once.
+    Returns a list of chunk strings.
+    """
+    segments = []
+    for segment in split_into_segments(text):
+        segments.extend(_split_oversized(segment, chunk_size) if len(segment["text"]) > chunk_size else [segment])
+
+    chunks, current, current_len = [], [], 0
+    for segment in segments:
+        seg_len = len(segment["text"]) + 2
+        if current and current_len + seg_len > chunk_size:
+            chunks.append(current)
+            # Carry trailing segments forward as overlap
+            carried, carried_len = [], 0
+            for previous in reversed(current):
+                previous_len = len(previous["text"]) + 2
+                if carried_len + previous_len > overlap or carried_len + previous_len + seg_len > chunk_size:
+                    break
+                carried.insert(0, previous)
+                carried_len += previous_len
+            current, current_len = carried, carried_len
+        current.append(segment)
+        current_len += seg_len
+    if current:
+        chunks.append(current)
+
+    return ["\n\n".join(segment["text"] for segment in chunk) for chunk in chunks]
+
+def iter_page_chunks(pages, chunk_size: int, overlap: int):
+    """
+    Incremental build_chunks over an iterator of page texts. Yields each chunk as soon as it
+    is complete, so only about two chunks of text are held in memory at a time.
+    Pages are joined with a single newline, since page breaks usually fall mid-paragraph.
+    """
+    buffer = ""
+    for page_text in pages:
+        if not page_text.strip():
+            continue
+        buffer = f"{buffer}\n{page_text}" if buffer else page_text
+        if len(buffer) < 2 * chunk_size:
+            continue
+        # Emit every chunk but the last, which may still grow with the next page
+        chunks = build_chunks(buffer, chunk_size, overlap)
+        yield from chunks[:-1]
+        buffer = chunks[-1]
+    if buffer.strip():
+        yield from build_chunks(buffer, chunk_size, overlap)
+
+def _lookup(mapping, name):
+    """
+    Case-insensitive key lookup, since models often change the capitalisation of keys.
+    """
+    if not isinstance(mapping, dict):
+        return None
+    for key, value in mapping.items():
+        if str(key).strip().lower() == name.lower():
+            return value
+    return None
+
+def merge_clauses(chunk_clauses: list, clause_names: list) -> dict:
+    """
+    Merges per-chunk clause maps. Distinct texts found for the same clause in several
+    chunks are concatenated in document order; clauses absent everywhere are 'Not found'.
+    """
+    merged = {}
+    for name in clause_names:
+        texts = []
+        for clauses in chunk_clauses:
+            clause_text = _lookup(clauses, name)
+            if not isinstance(clause_text, str):
+                continue
+            clause_text = clause_text.strip()
+            if not clause_text or clause_text.lower().startswith("not found"):
+                continue
+            # Overlapping chunks can return the same clause twice, or one a substring of the other
+            if any(clause_text in existing for existing in texts):
+                continue
+            texts = [existing for existing in texts if existing not in clause_text]
+            texts.append(clause_text)
+        merged[name] = "\n\n".join(texts) if texts else "Not found"
+    return merged
+
+def merge_entities(chunk_entities: list, categories: list) -> dict:
+    """
+    Merges per-chunk entity lists, de-duplicating case-insensitively while keeping first-seen order.
+    """
+    merged = {}
+    for category in categories:
+        seen, items = set(), []
+        for entities in chunk_entities:
+            found = _lookup(entities, category)
+            if isinstance(found, str):
+                found = [found]
+            for item in found if isinstance(found, list) else []:
+                item = str(item).strip()
+                key = " ".join(item.lower().split())
+                if key and key not in seen:
+                    seen.add(key)
+                    items.append(item)
+        merged[category] = items
+    return merged
+
+def group_for_reduce(summaries: list, max_chars: int) -> list:
+    """
+    Groups consecutive summaries so each reduce prompt stays under max_chars.
+    Every group holds at least two summaries, so repeated reduction always converges.
+    """
+    groups, current, current_len = [], [], 0
+    for summary in summaries:
+        if len(current) >= 2 and current_len + len(summary) > max_chars:
+            groups.append(current)
+            current, current_len = [], 0
+        current.append(summary)
+        current_len += len(summary)
+    if current:
+        if len(current) == 1 and groups:
+            groups[-1].append(current[0])
+        else:
+            groups.append(current)
+    return groups
@@ -0,0 +1,131 @@
+# backend/clause_locator.py
+
+from collections import deque
+from backend.chunking import split_into_segments, is_heading_only
+
+# Keyword stems that signal each clause type. Stems match at a word start, so
+# "terminat" covers "terminate", "terminated", and "termination".
+CLAUSE_KEYWORDS = {
+    "Termination": ["terminat", "expiration", "cancellation", "term and termination"],
+    "Liability": ["liabilit", "liable", "indemnif", "consequential damages", "hold harmless"],
+    "Jurisdiction": ["jurisdiction", "governing law", "governed by", "venue", "arbitration", "dispute resolution", "choice of law"],
+    "Confidentiality": ["confidential", "non-disclosure", "nondisclosure", "proprietary information", "trade secret"],
+}
+
+# Scoring: a keyword in a segment's heading is a strong signal, one in its body a weak one.
+HEADING_WEIGHT = 3
+BODY_WEIGHT = 1
+# A segment without a heading hit needs at least this many body hits to become a candidate
+MIN_BODY_HITS = 2
+# Keep only the best few spans per clause so the per-clause prompt stays small
+MAX_SPANS_PER_CLAUSE = 3
+
+CLAUSE_SPAN_PROMPT = (
+    "The following excerpts were taken from a legal document because they may contain its {clause} clause. "
+    "Provide the full text of the {clause} clause exactly as written. "
+    "If none of the excerpts contains a {clause} clause, state 'Not found'. "
+    "Excerpts:\n\n---\n{text}\n---"
+)
+
+class KeywordAutomaton:
+    """
+    Aho-Corasick automaton: finds every occurrence of many keywords in one pass over the text.
+    """
+
+    def __init__(self, keywords: dict):
+        # keywords maps a label (clause name) to the list of patterns that signal it
+        self.goto = [{}]
+        self.fail = [0]
+        self.output = [[]]
+        for label, patterns in keywords.items():
+            for pattern in patterns:
+                self._add(pattern.lower(), label)
+        self._build_failure_links()
+
+    def _add(self, pattern: str, label: str):
+        state = 0
+        for ch in pattern:
+            if ch not in self.goto[state]:
+                self.goto.append({})
+                self.fail.append(0)
+                self.output.append([])
+                self.goto[state][ch] = len(self.goto) - 1
+            state = self.goto[state][ch]
+        self.output[state].append((label, len(pattern)))
+
+    def _build_failure_links(self):
+        queue = deque(self.goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for ch, next_state in self.goto[state].items():
+                queue.append(next_state)
+                fallback = self.fail[state]
+                while fallback and ch not in self.goto[fallback]:
+                    fallback = self.fail[fallback]
+                self.fail[next_state] = self.goto[fallback].get(ch, 0)
+                self.output[next_state] = self.output[next_state] + self.output[self.fail[next_state]]
+
+    def find(self, text: str) -> list:
+        """
+        Returns (label, start_offset) for every keyword match that begins at a word boundary.
+        """
+        matches, state = [], 0
+        lowered = text.lower()
+        for position, ch in enumerate(lowered):
+            while state and ch not in self.goto[state]:
+                state = self.fail[state]
+            state = self.goto[state].get(ch, 0)
+            for label, length in self.output[state]:
+                start = position - length + 1
+                if start == 0 or not lowered[start - 1].isalnum():
+                    matches.append((label, start))
+        return matches
+
+_AUTOMATON = KeywordAutomaton(CLAUSE_KEYWORDS)
+
+def _heading_length(segment_text: str) -> int:
+    """
+    Length of the heading part of a segment: leading bare heading lines
+    ("ARTICLE 7" / "TERMINATION"), or a "Label:" prefix on the first line.
+    """
+    length = 0
+    for line in segment_text.split("\n"):
+        if not is_heading_only(line):
+            break
+        length += len(line) + 1
+    if length:
+        return length
+    colon = segment_text.split("\n", 1)[0].find(":")
+    if 0 < colon <= 60:
+        return colon
+    return 0
+
+def build_clause_index(text: str) -> dict:
+    """
+    Builds an index of candidate spans for each clause in CLAUSE_KEYWORDS.
+    Returns {clause: [{"start", "end", "text", "score"}, ...]} sorted by document position;
+    an empty list means the clause is clearly absent.
+    """
+    candidates = {clause: [] for clause in CLAUSE_KEYWORDS}
+    for segment in split_into_segments(text):
+        heading_len = _heading_length(segment["text"])
+        heading_hits, body_hits = {}, {}
+        for label, start in _AUTOMATON.find(segment["text"]):
+            hits = heading_hits if start < heading_len else body_hits
+            hits[label] = hits.get(label, 0) + 1
+        for clause in CLAUSE_KEYWORDS:
+            heading, body = heading_hits.get(clause, 0), body_hits.get(clause, 0)
+            if heading or body >= MIN_BODY_HITS:
+                candidates[clause].append({**segment, "score": heading * HEADING_WEIGHT + body * BODY_WEIGHT})
+
+    index = {}
+    for clause, spans in candidates.items():
+        best = sorted(spans, key=lambda span: span["score"], reverse=True)[:MAX_SPANS_PER_CLAUSE]
+        index[clause] = sorted(best, key=lambda span: span["start"])
+    return index
+
+def format_spans(spans: list) -> str:
+    """
+    Joins candidate spans into the excerpt block sent to the LLM.
+    """
+    return "\n\n[...]\n\n".join(span["text"] for span in spans)
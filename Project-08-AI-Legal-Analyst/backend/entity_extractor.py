@@ -0,0 +1,211 @@
+# backend/entity_extractor.py
+
+import re
+from backend.structured_extraction import ENTITY_CATEGORIES
+
+MONTHS = (
+    "January|February|March|April|May|June|July|August|September|October|November|December"
+    "|Jan|Feb|Mar|Apr|Jun|Jul|Aug|Sep|Sept|Oct|Nov|Dec"
+)
+
+# "June 15, 2025", "15 June 2025", "15th day of June, 2025", "2025-06-15", "06/15/2025"
+DATE_PATTERN = re.compile(
+    rf"\b(?:"
+    rf"(?:{MONTHS})\.?\s+\d{{1,2}}(?:st|nd|rd|th)?,?\s+\d{{4}}"
+    rf"|\d{{1,2}}(?:st|nd|rd|th)?\s+(?:day\s+of\s+)?(?:{MONTHS})\.?,?\s+\d{{4}}"
+    rf"|\d{{4}}-\d{{2}}-\d{{2}}"
+    rf"|\d{{1,2}}/\d{{1,2}}/\d{{2,4}}"
+    rf")\b"
+)
+
+# A capitalized name, allowing connectors and corporate punctuation: "Global Solutions Inc.", "Smith & Sons, LLC"
+NAME = r"[A-Z][\w&.,'-]*(?:\s+(?:of|and|&|the|de|[A-Z][\w&.,'-]*))*"
+
+# Opening recitals naming the contracting parties: "by and between X and Y", "entered into by X and Y"
+PARTIES_PATTERN = re.compile(
+    r"\b(?:by\s+and\s+between|by\s+and\s+among|entered\s+into\s+by|between)\s+(.{3,400}?)"
+    r"(?:\s+(?:on|as\s+of|dated|effective)\b|[;:]|\.\s|\n\n|$)",
+    re.IGNORECASE | re.DOTALL
+)
+
+# Defined terms: ("LexCorp"), (the "Company"), (hereinafter "Supplier"), with straight or curly quotes
+DEFINED_TERM_PATTERN = re.compile(
+    r"\(\s*(?:hereinafter\s+(?:referred\s+to\s+as\s+)?|the\s+)?[\"“]([^\"”]{1,60})[\"”]\s*\)",
+    re.IGNORECASE
+)
+
+# Placeholder labels that are not names on their own ("Party A", "the Parties")
+GENERIC_PARTY_PATTERN = re.compile(r"^(?:the\s+)?(?:Party|Parties)(?:\s+[A-Z0-9])?$", re.IGNORECASE)
+
+# Signature blocks and labelled lines: "Party A: LexCorp", "By: John Doe", "Title: CEO"
+PARTY_LABEL_PATTERN = re.compile(r"^\s*(?:Party\s+[A-Z0-9]+|Licensor|Licensee|Buyer|Seller|Client|Vendor|Company)\s*:\s*(.+?)\s*$", re.MULTILINE)
+SIGNATORY_PATTERN = re.compile(r"^\s*By\s*:\s*(.+?)\s*$", re.MULTILINE)
+TITLE_LABEL_PATTERN = re.compile(r"^\s*(?:Title|Its)\s*:\s*(.+?)\s*$", re.MULTILINE)
+
+ENTITY_SUFFIXES = r"(?:Inc|Incorporated|LLC|L\.L\.C|LLP|Ltd|Limited|Corp|Corporation|Co|Company|GmbH|AG|S\.A|PLC|LP|N\.A)\.?"
+COMPANY_PATTERN = re.compile(rf"\b((?:[A-Z][\w&'-]*\s+){{0,5}}[A-Z][\w&'-]*,?\s+{ENTITY_SUFFIXES})(?![\w])")
+
+JOB_TITLES = (
+    r"Chief\s+[A-Z][a-z]+(?:\s+[A-Z][a-z]+)?\s+Officer|CEO|CFO|CTO|COO|CIO|CMO|General\s+Counsel"
+    r"|(?:Executive\s+|Senior\s+)?Vice\s+President|President|Managing\s+Director|Director|Secretary|Treasurer"
+    r"|Authorized\s+Signatory|Managing\s+Member|General\s+Partner"
+)
+JOB_TITLE_PATTERN = re.compile(rf"\b(?:{JOB_TITLES})\b")
+
+US_STATES = (
+    "Alabama|Alaska|Arizona|Arkansas|California|Colorado|Connecticut|Delaware|Florida|Georgia|Hawaii|Idaho"
+    "|Illinois|Indiana|Iowa|Kansas|Kentucky|Louisiana|Maine|Maryland|Massachusetts|Michigan|Minnesota"
+    "|Mississippi|Missouri|Montana|Nebraska|Nevada|New\\s+Hampshire|New\\s+Jersey|New\\s+Mexico|New\\s+York"
+    "|North\\s+Carolina|North\\s+Dakota|Ohio|Oklahoma|Oregon|Pennsylvania|Rhode\\s+Island|South\\s+Carolina"
+    "|South\\s+Dakota|Tennessee|Texas|Utah|Vermont|Virginia|Washington|West\\s+Virginia|Wisconsin|Wyoming"
+)
+COUNTRIES = (
+    "United\\s+States(?:\\s+of\\s+America)?|United\\s+Kingdom|England\\s+and\\s+Wales|England|Scotland|Ireland"
+    "|Canada|Australia|India|Singapore|Germany|France|Netherlands|Switzerland|Japan|China|Hong\\s+Kong"
+)
+PLACE = r"[A-Z][a-z]+(?:\s+[A-Z][a-z]+){0,2}"
+
+# "State of California", "County of Santa Clara", "San Francisco, California", "laws of England and Wales"
+LOCATION_PATTERNS = [
+    re.compile(rf"\b(?:State|Commonwealth|County|City|Province|Republic|Kingdom)\s+of\s+{PLACE}"),
+    re.compile(rf"\b{PLACE},\s+(?:{US_STATES}|{COUNTRIES})\b"),
+    re.compile(rf"\b(?:{US_STATES}|{COUNTRIES})\b"),
+]
+
+# Hybrid mode asks the LLM to fill categories that have fewer local results than this
+MIN_LOCAL_ITEMS = {"Parties": 2, "Dates": 1, "Locations": 1, "Titles": 1}
+
+ENTITY_GAP_PROMPT = (
+    "Extract the following categories of named entities from the legal document: {categories}. "
+    "Already found (do not repeat unless they belong to a requested category): {found}. "
+    "Present the output as the category name followed by a colon on its own line, then one entity per line. "
+    "Document:\n\n---\n{text}\n---"
+)
+
+def _add_unique(items: list, value: str):
+    # "Bar Inc" and "Bar Inc." are the same entity
+    value = " ".join(value.split()).strip(" ,;")
+    key = value.lower().rstrip(".")
+    if key and key not in (item.lower().rstrip(".") for item in items):
+        items.append(value)
+
+def _split_party_list(fragment: str) -> list:
+    """
+    Splits the text after "by and between" into individual party names, dropping
+    addresses, descriptions, and defined-term parentheses.
+    """
+    fragment = DEFINED_TERM_PATTERN.sub("", fragment)
+    fragment = re.sub(r"\([^)]*\)", "", fragment)
+    parties = []
+    for part in re.split(r"\s*;\s*|,?\s+and\s+(?=[A-Z])", fragment):
+        # Keep only the leading name: "Acme Corp., a Delaware corporation" -> "Acme Corp."
+        part = re.split(r",\s+(?:a|an|the|with|having|located|whose)\b", part)[0]
+        match = re.match(NAME, part.strip())
+        if match and not GENERIC_PARTY_PATTERN.match(match.group(0).rstrip(",")):
+            parties.append(match.group(0).rstrip(","))
+    return parties
+
+def extract_parties(text: str) -> list:
+    parties = []
+    match = PARTIES_PATTERN.search(text)
+    if match:
+        for party in _split_party_list(match.group(1)):
+            _add_unique(parties, party)
+        # Aliases defined next to the parties: Party A ("LexCorp")
+        for alias in DEFINED_TERM_PATTERN.findall(match.group(0)):
+            _add_unique(parties, alias)
+    for name in PARTY_LABEL_PATTERN.findall(text):
+        _add_unique(parties, name)
+    for name in COMPANY_PATTERN.findall(text):
+        _add_unique(parties, name)
+    return parties
+
+def extract_dates(text: str) -> list:
+    dates = []
+    for match in DATE_PATTERN.finditer(text):
+        _add_unique(dates, match.group(0))
+    return dates
+
+def extract_locations(text: str) -> list:
+    locations, spans = [], []
+    for pattern in LOCATION_PATTERNS:
+        for match in pattern.finditer(text):
+            # Skip bare state/country names already covered by a longer match ("San Francisco, California")
+            if any(start <= match.start() and match.end() <= end for start, end in spans):
+                continue
+            spans.append((match.start(), match.end()))
+            _add_unique(locations, match.group(0))
+    return locations
+
+def extract_titles(text: str) -> list:
+    """
+    Job titles, paired with the signatory when a "By:" line precedes a "Title:" line.
+    """
+    titles = []
+    signatories = {match.end(): match.group(1) for match in SIGNATORY_PATTERN.finditer(text)}
+    for match in TITLE_LABEL_PATTERN.finditer(text):
+        preceding = [end for end in signatories if end < match.start() and not text[end:match.start()].strip()]
+        title = match.group(1)
+        _add_unique(titles, f"{title} ({signatories[preceding[-1]]})" if preceding else title)
+    if not titles:
+        for match in JOB_TITLE_PATTERN.finditer(text):
+            _add_unique(titles, match.group(0))
+    return titles
+
+def extract_entities(text: str) -> dict:
+    """
+    Deterministic entity extraction with regular expressions and contract conventions
+    (recitals, defined terms, signature blocks). Returns {category: [entities]} for ENTITY_CATEGORIES.
+    """
+    return {
+        "Parties": extract_parties(text),
+        "Dates": extract_dates(text),
+        "Locations": extract_locations(text),
+        "Titles": extract_titles(text),
+    }
+
+def find_gaps(entities: dict) -> list:
+    """
+    Categories the local extractor could not fill well enough (see MIN_LOCAL_ITEMS).
+    """
+    return [category for category in ENTITY_CATEGORIES if len(entities.get(category, [])) < MIN_LOCAL_ITEMS[category]]
+
+def parse_entity_lines(raw: str) -> dict:
+    """
+    Parses the 'Category:' followed by one entity per line layout into {category: [entities]}.
+    Bullets, numbering, and markdown emphasis are stripped; unknown headings are ignored.
+    """
+    by_lower = {category.lower(): category for category in ENTITY_CATEGORIES}
+    entities, current = {}, None
+    for line in (raw or "").splitlines():
+        cleaned = re.sub(r"^\s*(?:[-*•]|\d+[.)])\s*", "", line.replace("**", "")).strip()
+        if not cleaned:
+            continue
+        heading, _, rest = cleaned.partition(":")
+        if heading.strip().lower() in by_lower:
+            current = by_lower[heading.strip().lower()]
+            entities.setdefault(current, [])
+            # "Dates: June 15, 2025; July 1, 2025" on one line
+            for item in re.split(r"\s*;\s*", rest):
+                _add_unique(entities[current], item)
+        elif current is not None:
+            _add_unique(entities[current], cleaned)
+    return entities
+
+def merge_gap_entities(local: dict, llm: dict, gaps: list) -> tuple:
+    """
+    Fills the gap categories with LLM results. Returns (entities, sources) where
+    sources maps each category to "local", "llm", or "local+llm".
+    """
+    entities, sources = {}, {}
+    for category in ENTITY_CATEGORIES:
+        items = list(local.get(category, []))
+        sources[category] = "local"
+        if category in gaps:
+            before = len(items)
+            for item in llm.get(category, []):
+                _add_unique(items, item)
+            if len(items) > before:
+                sources[category] = "local+llm" if before else "llm"
+        entities[category] = items
+    return entities, sources
@@ -0,0 +1,166 @@
+# backend/ingestion.py
+
+import os
+import tempfile
+import zipfile
+import xml.etree.ElementTree as ET
+
+try:
+    from pypdf import PdfReader # Optional: only needed for PDF uploads
+    from pypdf.errors import PdfReadError
+except ImportError:
+    PdfReader = None
+    PdfReadError = None
+
+# File types accepted by /analyze/upload, detected from the extension or the Content-Type header
+DOCUMENT_TYPES = {
+    ".pdf": "pdf", "application/pdf": "pdf",
+    ".docx": "docx", "application/vnd.openxmlformats-officedocument.wordprocessingml.document": "docx",
+    ".txt": "txt", "text/plain": "txt",
+}
+
+WORD_NAMESPACE = "{http://schemas.openxmlformats.org/wordprocessingml/2006/main}"
+
+class UploadTooLarge(Exception):
+    """
+    Raised while streaming an upload to disk once it exceeds the size limit.
+    """
+
+class UnreadableDocument(Exception):
+    """
+    Raised while extracting pages from a corrupt or truncated PDF or DOCX upload.
+    """
+
+def detect_document_type(filename: str, content_type: str):
+    """
+    Returns "pdf", "docx", or "txt" for a supported upload, otherwise None.
+    """
+    extension = os.path.splitext(filename or "")[1].lower()
+    media_type = (content_type or "").split(";")[0].strip().lower()
+    return DOCUMENT_TYPES.get(extension) or DOCUMENT_TYPES.get(media_type)
+
+async def save_upload_stream(chunks, directory: str, suffix: str, max_bytes: int) -> tuple:
+    """
+    Writes an async iterator of byte chunks (e.g. request.stream()) to a temporary file
+    without holding the upload in memory. Returns (path, size); the caller deletes the file.
+    Raises UploadTooLarge as soon as more than max_bytes have been received.
+    """
+    os.makedirs(directory, exist_ok=True)
+    handle = tempfile.NamedTemporaryFile(dir=directory, suffix=suffix, delete=False)
+    size = 0
+    try:
+        with handle:
+            async for chunk in chunks:
+                size += len(chunk)
+                if size > max_bytes:
+                    raise UploadTooLarge(f"Upload exceeds the {max_bytes // (1024 * 1024)} MB limit.")
+                handle.write(chunk)
+    except BaseException:
+        os.remove(handle.name)
+        raise
+    return handle.name, size
+
+def iter_pdf_pages(path: str):
+    """
+    Yields the text of each PDF page in order. Pages are parsed lazily, one at a time.
+    """
+    if PdfReader is None:
+        raise RuntimeError("PDF support requires the 'pypdf' package (pip install pypdf).")
+    try:
+        reader = PdfReader(path)
+        for page in reader.pages:
+            yield page.extract_text() or ""
+    except PdfReadError as e:
+        raise UnreadableDocument(f"Invalid PDF: {e}") from e
+
+def iter_docx_pages(path: str, page_chars: int):
+    """
+    Yields the text of a .docx file page by page by stream-parsing word/document.xml.
+    Pages end at explicit or last-rendered page breaks, or after about page_chars characters
+    for documents saved without page information. A file that is not a valid .docx archive raises
+    UnreadableDocument.
+    """
+    try:
+        yield from _iter_docx_pages(path, page_chars)
+    except (zipfile.BadZipFile, KeyError, ET.ParseError) as e:
+        raise UnreadableDocument(f"Invalid DOCX: {e}") from e
+
+def _iter_docx_pages(path: str, page_chars: int):
+    with zipfile.ZipFile(path) as archive:
+        with archive.open("word/document.xml") as document:
+            paragraphs, paragraph, length = [], [], 0
+            for event, element in ET.iterparse(document, events=("start", "end")):
+                tag = element.tag
+                page_break = event == "start" and (
+                    tag == f"{WORD_NAMESPACE}lastRenderedPageBreak"
+                    or (tag == f"{WORD_NAMESPACE}br" and element.get(f"{WORD_NAMESPACE}type") == "page")
+                )
+                if page_break and (paragraphs or paragraph):
+                    yield "\n".join(paragraphs + (["".join(paragraph)] if paragraph else []))
+                    paragraphs, paragraph, length = [], [], 0
+                if event != "end":
+                    continue
+                if tag == f"{WORD_NAMESPACE}t" and element.text:
+                    paragraph.append(element.text)
+                    length += len(element.text)
+                elif tag == f"{WORD_NAMESPACE}tab":
+                    paragraph.append("\t")
+                elif tag == f"{WORD_NAMESPACE}p":
+                    paragraphs.append("".join(paragraph))
+                    paragraph = []
+                    if length >= page_chars:
+                        yield "\n".join(paragraphs)
+                        paragraphs, length = [], 0
+                    # Free parsed paragraphs so memory stays flat on long documents
+                    element.clear()
+            if paragraphs or paragraph:
+                yield "\n".join(paragraphs + (["".join(paragraph)] if paragraph else []))
+
+def iter_text_pages(path: str, page_chars: int):
+    """
+    Yields a plain-text file in pages split at form feeds or after about page_chars characters.
+    """
+    with open(path, encoding="utf-8", errors="replace") as handle:
+        lines, length = [], 0
+        for line in handle:
+            *finished, rest = line.split("\f")
+            for part in finished:
+                yield "".join(lines) + part
+                lines, length = [], 0
+            lines.append(rest)
+            length += len(rest)
+            if length >= page_chars:
+                yield "".join(lines)
+                lines, length = [], 0
+        if lines:
+            yield "".join(lines)
+
+def extract_document_text(data: bytes, document_type: str, directory: str, page_chars: int, max_pages: int) -> str:
+    """
+    Extracts the text of an in-memory PDF, DOCX, or plain-text document (e.g. a batch upload or
+    zip member) with the same page extractors as uploads; pages are joined with blank lines.
+    Raises UnreadableDocument for a corrupt file or one with more than max_pages pages.
+    """
+    os.makedirs(directory, exist_ok=True)
+    handle = tempfile.NamedTemporaryFile(dir=directory, suffix=f".{document_type}", delete=False)
+    try:
+        with handle:
+            handle.write(data)
+        pages = []
+        for page_text in iter_pages(handle.name, document_type, page_chars):
+            pages.append(page_text)
+            if len(pages) > max_pages:
+                raise UnreadableDocument(f"Document has more than {max_pages} pages.")
+        return "\n\n".join(pages)
+    finally:
+        os.remove(handle.name)
+
+def iter_pages(path: str, document_type: str, page_chars: int):
+    """
+    Generator over the pages of a stored upload, dispatching on document type.
+    """
+    if document_type == "pdf":
+        return iter_pdf_pages(path)
+    if document_type == "docx":
+        return iter_docx_pages(path, page_chars)
+    return iter_text_pages(path, page_chars)
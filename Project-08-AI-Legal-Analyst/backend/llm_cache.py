@@ -0,0 +1,174 @@
+# backend/llm_cache.py
+
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+
+def normalize_text(text: str) -> str:
+    """
+    Normalizes text before hashing so trivial differences (Unicode form, line endings,
+    repeated whitespace, surrounding blanks) still hit the same cache entry.
+    """
+    return " ".join(unicodedata.normalize("NFC", text).split())
+
+def make_cache_key(prompt: str, model: str, template_version: str, response_format: str = None) -> str:
+    """
+    Content-addressed cache key: SHA-256 of the normalized prompt (which embeds the
+    input text), the model name, the prompt-template version, and the response format.
+    """
+    digest = hashlib.sha256()
+    for part in (template_version, model, response_format or "", normalize_text(prompt)):
+        digest.update(part.encode("utf-8"))
+        digest.update(b"\x00")
+    return digest.hexdigest()
+
+class LLMCache:
+    """
+    Two-tier cache for LLM responses.
+
+    - Memory tier: LRU bounded by total response size in bytes.
+    - Disk tier: SQLite table bounded by total size in bytes; least recently used rows are evicted first.
+    Entries older than ttl_seconds are treated as misses and removed from both tiers.
+    """
+
+    def __init__(self, db_path: str, max_memory_bytes: int, max_disk_bytes: int, ttl_seconds: int):
+        self.db_path = db_path
+        self.max_memory_bytes = max_memory_bytes
+        self.max_disk_bytes = max_disk_bytes
+        self.ttl_seconds = ttl_seconds
+
+        self._lock = threading.Lock()
+        self._memory = OrderedDict() # key -> (value, created_at)
+        self._memory_bytes = 0
+        self._counters = {"memory_hits": 0, "disk_hits": 0, "misses": 0, "writes": 0,
+                          "memory_evictions": 0, "disk_evictions": 0, "expired": 0}
+
+        os.makedirs(os.path.dirname(db_path) or ".", exist_ok=True)
+        self._db = sqlite3.connect(db_path, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS llm_cache ("
+            "key TEXT PRIMARY KEY, value TEXT NOT NULL, size INTEGER NOT NULL, "
+            "created_at REAL NOT NULL, last_access REAL NOT NULL)"
+        )
+        self._db.execute("CREATE INDEX IF NOT EXISTS idx_llm_cache_last_access ON llm_cache(last_access)")
+        self._db.commit()
+        self._disk_bytes = self._db.execute("SELECT COALESCE(SUM(size), 0) FROM llm_cache").fetchone()[0]
+
+    def _is_expired(self, created_at: float, now: float) -> bool:
+        return self.ttl_seconds > 0 and now - created_at > self.ttl_seconds
+
+    def _remember(self, key: str, value: str, created_at: float):
+        # Caller holds the lock
+        if key in self._memory:
+            self._memory_bytes -= len(self._memory.pop(key)[0].encode("utf-8"))
+        size = len(value.encode("utf-8"))
+        if size > self.max_memory_bytes:
+            return
+        self._memory[key] = (value, created_at)
+        self._memory_bytes += size
+        while self._memory_bytes > self.max_memory_bytes:
+            _, (old_value, _) = self._memory.popitem(last=False)
+            self._memory_bytes -= len(old_value.encode("utf-8"))
+            self._counters["memory_evictions"] += 1
+
+    def get(self, key: str):
+        """
+        Returns the cached response for key, or None on a miss.
+        """
+        now = time.time()
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                if not self._is_expired(entry[1], now):
+                    self._memory.move_to_end(key)
+                    self._counters["memory_hits"] += 1
+                    return entry[0]
+                self._memory_bytes -= len(self._memory.pop(key)[0].encode("utf-8"))
+
+            row = self._db.execute("SELECT value, size, created_at FROM llm_cache WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                self._counters["misses"] += 1
+                return None
+            value, size, created_at = row
+            if self._is_expired(created_at, now):
+                self._db.execute("DELETE FROM llm_cache WHERE key = ?", (key,))
+                self._db.commit()
+                self._disk_bytes -= size
+                self._counters["expired"] += 1
+                self._counters["misses"] += 1
+                return None
+
+            self._db.execute("UPDATE llm_cache SET last_access = ? WHERE key = ?", (now, key))
+            self._db.commit()
+            # Promote to the memory tier so the next hit skips SQLite
+            self._remember(key, value, created_at)
+            self._counters["disk_hits"] += 1
+            return value
+
+    def set(self, key: str, value: str):
+        """
+        Stores a response in both tiers, evicting least recently used disk rows if over budget.
+        """
+        now = time.time()
+        size = len(value.encode("utf-8"))
+        with self._lock:
+            self._remember(key, value, now)
+            previous = self._db.execute("SELECT size FROM llm_cache WHERE key = ?", (key,)).fetchone()
+            self._db.execute(
+                "INSERT OR REPLACE INTO llm_cache (key, value, size, created_at, last_access) VALUES (?, ?, ?, ?, ?)",
+                (key, value, size, now, now)
+            )
+            self._disk_bytes += size - (previous[0] if previous else 0)
+            self._counters["writes"] += 1
+            if self._disk_bytes > self.max_disk_bytes:
+                self._evict_disk()
+            self._db.commit()
+
+    def _evict_disk(self):
+        # Caller holds the lock. Drop expired rows first, then the least recently used ones.
+        if self.ttl_seconds > 0:
+            self._db.execute("DELETE FROM llm_cache WHERE created_at < ?", (time.time() - self.ttl_seconds,))
+        self._disk_bytes = self._db.execute("SELECT COALESCE(SUM(size), 0) FROM llm_cache").fetchone()[0]
+        rows = self._db.execute("SELECT key, size FROM llm_cache ORDER BY last_access ASC").fetchall()
+        for key, size in rows:
+            if self._disk_bytes <= self.max_disk_bytes:
+                break
+            self._db.execute("DELETE FROM llm_cache WHERE key = ?", (key,))
+            self._disk_bytes -= size
+            self._counters["disk_evictions"] += 1
+
+    def clear(self):
+        """
+        Removes every entry from both tiers. Counters are kept.
+        """
+        with self._lock:
+            self._memory.clear()
+            self._memory_bytes = 0
+            self._db.execute("DELETE FROM llm_cache")
+            self._db.commit()
+            self._disk_bytes = 0
+
+    def stats(self) -> dict:
+        """
+        Returns hit/miss counters and current tier sizes.
+        """
+        with self._lock:
+            disk_entries = self._db.execute("SELECT COUNT(*) FROM llm_cache").fetchone()[0]
+            lookups = self._counters["memory_hits"] + self._counters["disk_hits"] + self._counters["misses"]
+            hits = self._counters["memory_hits"] + self._counters["disk_hits"]
+            return {
+                **self._counters,
+                "hit_rate": round(hits / lookups, 4) if lookups else 0.0,
+                "memory_entries": len(self._memory),
+                "memory_bytes": self._memory_bytes,
+                "disk_entries": disk_entries,
+                "disk_bytes": self._disk_bytes,
+                "max_memory_bytes": self.max_memory_bytes,
+                "max_disk_bytes": self.max_disk_bytes,
+                "ttl_seconds": self.ttl_seconds,
+            }
@@ -1,10 +1,35 @@
 # backend/main.py
 
-from fastapi import FastAPI, Form, HTTPException
+from fastapi import FastAPI, Form, HTTPException, File, UploadFile, Request
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import StreamingResponse
 import requests
+import httpx # Async HTTP client used by the concurrent analysis mode
+import asyncio
 import json
 import os
+import time
+import zipfile
+from typing import List
+from backend.structured_extraction import (
+    run_single_pass, build_schema_text, parse_json_object, render_clauses, render_entities,
+    SECTION_SCHEMAS, KEY_CLAUSES, ENTITY_CATEGORIES
+)
+from backend.entity_extractor import (
+    extract_entities, find_gaps, parse_entity_lines, merge_gap_entities, ENTITY_GAP_PROMPT
+)
+from backend.clause_locator import build_clause_index, format_spans, CLAUSE_SPAN_PROMPT
+from backend.llm_cache import LLMCache, make_cache_key
+from backend.batch_jobs import BatchJobManager
+from backend.streaming import stream_sections
+from backend.versioning import VersionStore, segment_contract, diff_segments, diff_clauses, SEGMENT_PROMPT
+from backend.ingestion import (
+    detect_document_type, save_upload_stream, iter_pages, extract_document_text, UploadTooLarge, UnreadableDocument
+)
+from backend.chunking import (
+    build_chunks, iter_page_chunks, merge_clauses, merge_entities, group_for_reduce,
+    CHUNK_PROMPT, PAGE_CHUNK_PROMPT, REDUCE_SUMMARY_PROMPT
+)
 
 # Initialize FastAPI app
 app = FastAPI(
@@ -37,15 +62,107 @@ LLM_MODEL = os.getenv("LLM_MODEL", "llama3") # Default to llama3, as per your Ol
 # --- IMPORTANT FIX: Increase timeout for Ollama call to 480 seconds (8 minutes) ---
 OLLAMA_REQUEST_TIMEOUT_SECONDS = 1000
 
-def call_llm(prompt: str) -> str:
+# Maximum number of prompts sent to Ollama at the same time in "concurrent" mode.
+# Match this to OLLAMA_NUM_PARALLEL on the Ollama host; extra requests just queue there.
+MAX_CONCURRENT_LLM_REQUESTS = int(os.getenv("MAX_CONCURRENT_LLM_REQUESTS", "3"))
+
+# Supported execution modes for /analyze/
+# - sequential: run each prompt one after another (original behaviour)
+# - concurrent: fan all prompts out at once through an async HTTP client
+# - single_pass: one JSON-mode generation returning summary, clauses, and entities together
+# - chunked: map-reduce over section-aligned chunks for documents larger than the model context
+ANALYSIS_MODES = ["sequential", "concurrent", "single_pass", "chunked"]
+
+# How the entities section is produced in sequential and concurrent modes
+# - llm: the whole-document entities prompt (original behaviour)
+# - local: rule-based extractor only, no LLM call
+# - hybrid: rule-based extractor, plus one LLM prompt for the categories it could not fill
+ENTITY_MODES = ["llm", "local", "hybrid"]
+
+# How many times single_pass mode re-asks for keys that were missing or invalid
+# before falling back to the per-section prompt for just those keys
+SINGLE_PASS_MAX_REPAIRS = int(os.getenv("SINGLE_PASS_MAX_REPAIRS", "1"))
+
+# Chunked mode: target chunk size and overlap in characters (roughly 4 characters per token).
+# The default keeps each chunk plus prompt well inside a 4096-token context window.
+CHUNK_SIZE_CHARS = int(os.getenv("CHUNK_SIZE_CHARS", "8000"))
+CHUNK_OVERLAP_CHARS = int(os.getenv("CHUNK_OVERLAP_CHARS", "400"))
+
+# File uploads (/analyze/upload): the request body is streamed to UPLOAD_DIR and read back page by page.
+# Files without page information (plain text, DOCX saved without rendered page breaks) are cut into
+# pages of about UPLOAD_PAGE_CHARS characters.
+UPLOAD_DIR = os.getenv("UPLOAD_DIR", "uploads")
+MAX_UPLOAD_MB = int(os.getenv("MAX_UPLOAD_MB", "50"))
+MAX_UPLOAD_PAGES = int(os.getenv("MAX_UPLOAD_PAGES", "2000"))
+UPLOAD_PAGE_CHARS = int(os.getenv("UPLOAD_PAGE_CHARS", "3000"))
+
+# Response cache in front of call_llm, keyed by the normalized prompt, LLM_MODEL, and PROMPT_TEMPLATE_VERSION.
+# Bump PROMPT_TEMPLATE_VERSION whenever prompts or their post-processing change so old answers are not reused.
+PROMPT_TEMPLATE_VERSION = "1"
+LLM_CACHE_ENABLED = os.getenv("LLM_CACHE_ENABLED", "true").lower() == "true"
+LLM_CACHE_PATH = os.getenv("LLM_CACHE_PATH", "cache/llm_cache.sqlite3")
+LLM_CACHE_MEMORY_MB = int(os.getenv("LLM_CACHE_MEMORY_MB", "64"))
+LLM_CACHE_DISK_MB = int(os.getenv("LLM_CACHE_DISK_MB", "512"))
+LLM_CACHE_TTL_SECONDS = int(os.getenv("LLM_CACHE_TTL_SECONDS", str(7 * 24 * 3600))) # 0 disables expiry
+
+llm_cache = LLMCache(
+    LLM_CACHE_PATH,
+    max_memory_bytes=LLM_CACHE_MEMORY_MB * 1024 * 1024,
+    max_disk_bytes=LLM_CACHE_DISK_MB * 1024 * 1024,
+    ttl_seconds=LLM_CACHE_TTL_SECONDS
+) if LLM_CACHE_ENABLED else None
+
+# Batch analysis: documents are persisted in SQLite and processed by a bounded worker pool.
+# Each worker runs one document at a time, so total Ollama load is BATCH_MAX_WORKERS x the mode's own concurrency.
+BATCH_DB_PATH = os.getenv("BATCH_DB_PATH", "jobs/batch_jobs.sqlite3")
+BATCH_MAX_WORKERS = int(os.getenv("BATCH_MAX_WORKERS", "2"))
+BATCH_MAX_DOCUMENTS = int(os.getenv("BATCH_MAX_DOCUMENTS", "1000"))
+
+# Versioned analysis: per-segment results and contract version history
+VERSION_DB_PATH = os.getenv("VERSION_DB_PATH", "versions/contract_versions.sqlite3")
+version_store = VersionStore(VERSION_DB_PATH)
+
+# Define prompts for different extraction tasks
+# Using clear instructions and delimiters for better LLM performance
+PROMPTS = {
+    "summary": (
+        "Summarize the following legal document concisely, highlighting the main purpose, "
+        "parties involved, and key agreements. Focus on brevity and clarity. "
+        "Document:\n\n---\n{text}\n---"
+    ),
+    "clauses": (
+        "Extract the following key clauses from the legal text (e.g., Termination, Liability, Jurisdiction, Confidentiality), "
+        "providing the full text of each clause if present. If a clause is not found, state 'Not found'. "
+        "Present each clause clearly labeled. "
+        "Document:\n\n---\n{text}\n---"
+    ),
+    "entities": (
+        "Extract all named entities (e.g., parties, locations, dates, titles) from the legal document. "
+        "Categorize them into 'Parties', 'Dates', 'Locations', and 'Titles'. "
+        "Present the output as a list for each category. "
+        "Document:\n\n---\n{text}\n---"
+    )
+}
+
+def call_llm(prompt: str, response_format: str = None) -> str:
     """
     Calls the Ollama LLM API to generate a response based on the given prompt.
+    Pass response_format="json" to use Ollama's JSON mode.
     Handles potential connection errors.
     """
+    cache_key = make_cache_key(prompt, LLM_MODEL, PROMPT_TEMPLATE_VERSION, response_format)
+    if llm_cache is not None:
+        cached = llm_cache.get(cache_key)
+        if cached is not None:
+            return cached
+
+    payload = {"model": LLM_MODEL, "prompt": prompt, "stream": False}
+    if response_format:
+        payload["format"] = response_format
     try:
         response = requests.post(
             f"{OLLAMA_API_BASE_URL}/api/generate",
-            json={"model": LLM_MODEL, "prompt": prompt, "stream": False},
+            json=payload,
             timeout=OLLAMA_REQUEST_TIMEOUT_SECONDS # Use the increased timeout
         )
         response.raise_for_status() # Raise an HTTPError for bad responses (4xx or 5xx)
@@ -54,7 +171,10 @@ def call_llm(prompt: str) -> str:
         # If the response structure is different, this might need adjustment.
         response_data = response.json()
         if "response" in response_data:
-            return response_data["response"].strip()
+            result = response_data["response"].strip()
+            if llm_cache is not None:
+                llm_cache.set(cache_key, result)
+            return result
         else:
             raise ValueError(f"Unexpected response format from Ollama: {response_data}")
 
@@ -86,51 +206,710 @@ def call_llm(prompt: str) -> str:
             detail=str(e)
         )
 
-@app.post("/analyze/")
-def analyze_legal(text: str = Form(...)):
+async def call_llm_async(client: httpx.AsyncClient, semaphore: asyncio.Semaphore, prompt: str,
+                         response_format: str = None) -> str:
     """
-    Analyzes the provided legal text to extract a summary, key clauses, and named entities.
+    Async counterpart of call_llm used by the concurrent and chunked analysis modes.
+    The semaphore caps how many generations are in flight at once.
     """
-    if not text.strip():
-        raise HTTPException(status_code=400, detail="Legal text cannot be empty.")
+    cache_key = make_cache_key(prompt, LLM_MODEL, PROMPT_TEMPLATE_VERSION, response_format)
+    if llm_cache is not None:
+        cached = llm_cache.get(cache_key)
+        if cached is not None:
+            return cached
+
+    payload = {"model": LLM_MODEL, "prompt": prompt, "stream": False}
+    if response_format:
+        payload["format"] = response_format
+    async with semaphore:
+        try:
+            response = await client.post(f"{OLLAMA_API_BASE_URL}/api/generate", json=payload)
+            response.raise_for_status()
+
+            response_data = response.json()
+            if "response" in response_data:
+                result = response_data["response"].strip()
+                if llm_cache is not None:
+                    llm_cache.set(cache_key, result)
+                return result
+            else:
+                raise ValueError(f"Unexpected response format from Ollama: {response_data}")
+
+        except httpx.ConnectError:
+            raise HTTPException(
+                status_code=503,
+                detail=f"Could not connect to Ollama server at {OLLAMA_API_BASE_URL}. "
+                       f"Please ensure Ollama is running and the model '{LLM_MODEL}' is pulled."
+            )
+        except httpx.TimeoutException:
+            raise HTTPException(
+                status_code=504,
+                detail=f"Ollama server timed out after {OLLAMA_REQUEST_TIMEOUT_SECONDS} seconds. "
+                       "The LLM might be taking too long to respond. Consider a smaller model or more powerful hardware."
+            )
+        except httpx.HTTPError as e:
+            raise HTTPException(
+                status_code=500,
+                detail=f"An error occurred while calling the Ollama LLM: {e}"
+            )
+        except json.JSONDecodeError:
+            raise HTTPException(
+                status_code=500,
+                detail="Failed to decode JSON response from Ollama. Check Ollama server logs."
+            )
+        except ValueError as e:
+            raise HTTPException(
+                status_code=500,
+                detail=str(e)
+            )
+
+async def run_prompts_concurrently(formatted_prompts: dict, max_concurrency: int, response_format: str = None) -> dict:
+    """
+    Sends all formatted prompts to Ollama at the same time (at most max_concurrency in flight)
+    and returns the responses keyed like the input dict, in the same order.
+    """
+    semaphore = asyncio.Semaphore(max_concurrency)
+    async with httpx.AsyncClient(timeout=OLLAMA_REQUEST_TIMEOUT_SECONDS) as client:
+        tasks = {
+            key: asyncio.create_task(call_llm_async(client, semaphore, prompt, response_format))
+            for key, prompt in formatted_prompts.items()
+        }
+        try:
+            await asyncio.gather(*tasks.values())
+        except Exception:
+            # One section failed: cancel the others instead of waiting for their generations
+            for task in tasks.values():
+                task.cancel()
+            raise
+    return {key: task.result() for key, task in tasks.items()}
+
+async def run_chunked_analysis(text: str, chunk_size: int, chunk_overlap: int, max_concurrency: int) -> dict:
+    """
+    Map-reduce analysis for long documents.
+
+    Map: every section-aligned chunk is sent (in parallel, bounded by max_concurrency) to a
+    JSON-mode prompt extracting that chunk's summary, clauses, and entities.
+    Reduce: clauses and entities are merged locally; chunk summaries are combined by the LLM,
+    in as many rounds as needed to keep each reduce prompt within chunk_size.
+    """
+    chunks = build_chunks(text, chunk_size, chunk_overlap)
+    print(f"INFO: Chunked analysis: {len(text)} characters split into {len(chunks)} chunk(s)")
+
+    schema = build_schema_text(SECTION_SCHEMAS)
+    map_prompts = {
+        index: CHUNK_PROMPT.format(index=index + 1, total=len(chunks), schema=schema, text=chunk)
+        for index, chunk in enumerate(chunks)
+    }
+    raw_outputs = await run_prompts_concurrently(map_prompts, max_concurrency, response_format="json")
+    combined = await combine_chunk_outputs(
+        [raw_outputs[index] for index in range(len(chunks))], chunk_size, max_concurrency
+    )
+    return {**combined, "chunks": len(chunks)}
+
+async def combine_chunk_outputs(raw_outputs: list, chunk_size: int, max_concurrency: int) -> dict:
+    """
+    Reduce step shared by the chunked and upload pipelines: merges the per-chunk JSON
+    outputs (in document order) into the usual summary/clauses/entities response.
+    """
+    partials = [parse_json_object(raw) for raw in raw_outputs]
+    clauses = merge_clauses([partial.get("clauses") for partial in partials], KEY_CLAUSES)
+    entities = merge_entities([partial.get("entities") for partial in partials], ENTITY_CATEGORIES)
+    summary = await reduce_summaries(
+        [partial.get("summary") for partial in partials], chunk_size, max_concurrency
+    )
+    return {
+        "summary": summary or "No summary could be extracted from the document.",
+        "clauses": render_clauses(clauses),
+        "entities": render_entities(entities),
+        "structured": {"summary": summary, "clauses": clauses, "entities": entities}
+    }
+
+async def run_paged_analysis(pages, chunk_size: int, chunk_overlap: int, max_concurrency: int) -> dict:
+    """
+    Map-reduce analysis fed by a page generator, for uploaded files.
+
+    Pages are read and packed into chunks off the event loop, and each chunk's map prompt is
+    sent as soon as the chunk is complete, so extraction overlaps with generation. At most
+    2 x max_concurrency chunks wait for the LLM at once, which keeps memory flat on long files.
+    """
+    stats = {"pages": 0, "empty_pages": 0, "characters": 0}
+
+    def counted(page_iterator):
+        for page_text in page_iterator:
+            stats["pages"] += 1
+            if stats["pages"] > MAX_UPLOAD_PAGES:
+                raise HTTPException(status_code=413, detail=f"Document has more than {MAX_UPLOAD_PAGES} pages (MAX_UPLOAD_PAGES).")
+            stats["characters"] += len(page_text)
+            if not page_text.strip():
+                stats["empty_pages"] += 1
+            yield page_text
+
+    loop = asyncio.get_running_loop()
+    chunk_iterator = iter_page_chunks(counted(pages), chunk_size, chunk_overlap)
+    schema = build_schema_text(SECTION_SCHEMAS)
+    semaphore = asyncio.Semaphore(max_concurrency)
+    tasks, extraction_seconds = [], 0.0
+    async with httpx.AsyncClient(timeout=OLLAMA_REQUEST_TIMEOUT_SECONDS) as client:
+        try:
+            while True:
+                pending = [task for task in tasks if not task.done()]
+                if len(pending) >= 2 * max_concurrency:
+                    await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                started = time.perf_counter()
+                # Page extraction is blocking work; run it in a thread so in-flight map calls keep going
+                chunk = await loop.run_in_executor(None, next, chunk_iterator, None)
+                extraction_seconds += time.perf_counter() - started
+                if chunk is None:
+                    break
+                prompt = PAGE_CHUNK_PROMPT.format(index=len(tasks) + 1, schema=schema, text=chunk)
+                tasks.append(asyncio.create_task(call_llm_async(client, semaphore, prompt, "json")))
+            raw_outputs = await asyncio.gather(*tasks)
+        except BaseException:
+            for task in tasks:
+                task.cancel()
+            raise
+
+    print(f"INFO: Upload analysis: {stats['pages']} page(s), {len(tasks)} chunk(s), extraction {extraction_seconds:.2f}s")
+    if not tasks:
+        return {"chunks": 0, "ingestion": {**stats, "extraction_seconds": round(extraction_seconds, 3)}}
+    combined = await combine_chunk_outputs(raw_outputs, chunk_size, max_concurrency)
+    return {
+        **combined,
+        "chunks": len(tasks),
+        "ingestion": {**stats, "extraction_seconds": round(extraction_seconds, 3)}
+    }
+
+async def reduce_summaries(summaries: list, max_chars: int, max_concurrency: int) -> str:
+    """
+    Combines partial summaries into one, in as many LLM rounds as needed to keep
+    each reduce prompt within max_chars. Returns "" if there is nothing to combine.
+    """
+    summaries = [summary.strip() for summary in summaries if isinstance(summary, str) and summary.strip()]
+    while len(summaries) > 1:
+        groups = group_for_reduce(summaries, max_chars)
+        reduce_prompts = {
+            index: REDUCE_SUMMARY_PROMPT.format(text="\n\n".join(group))
+            for index, group in enumerate(groups)
+        }
+        reduced = await run_prompts_concurrently(reduce_prompts, max_concurrency)
+        summaries = [reduced[index] for index in range(len(groups))]
+    return summaries[0] if summaries else ""
+
+async def run_versioned_analysis(contract_id: str, text: str, max_concurrency: int) -> dict:
+    """
+    Incremental analysis of a new version of a contract.
 
-    # Define prompts for different extraction tasks
-    # Using clear instructions and delimiters for better LLM performance
-    prompts = {
-        "summary": (
-            "Summarize the following legal document concisely, highlighting the main purpose, "
-            "parties involved, and key agreements. Focus on brevity and clarity. "
-            "Document:\n\n---\n{text}\n---"
-        ),
-        "clauses": (
-            "Extract the following key clauses from the legal text (e.g., Termination, Liability, Jurisdiction, Confidentiality), "
-            "providing the full text of each clause if present. If a clause is not found, state 'Not found'. "
-            "Present each clause clearly labeled. "
-            "Document:\n\n---\n{text}\n---"
-        ),
-        "entities": (
-            "Extract all named entities (e.g., parties, locations, dates, titles) from the legal document. "
-            "Categorize them into 'Parties', 'Dates', 'Locations', and 'Titles'. "
-            "Present the output as a list for each category. "
-            "Document:\n\n---\n{text}\n---"
+    The contract is split into clause-level segments and each segment is fingerprinted.
+    Only segments whose fingerprint has no stored result go to the LLM (in parallel);
+    clauses and entities are merged from per-segment results, and the document summary
+    is recomputed from the per-segment summaries. Returns the analysis plus a clause-level
+    diff against the previous version.
+    """
+    segments = segment_contract(text)
+    previous = version_store.latest_version(contract_id)
+    known = version_store.get_segment_results([segment["hash"] for segment in segments])
+
+    # The same clause can appear twice in one document; analyze each new fingerprint once
+    new_segments = list({segment["hash"]: segment for segment in segments if segment["hash"] not in known}.values())
+    schema = build_schema_text(SECTION_SCHEMAS)
+    segment_prompts = {
+        segment["hash"]: SEGMENT_PROMPT.format(schema=schema, text=segment["text"]) for segment in new_segments
+    }
+    print(f"INFO: Versioned analysis of '{contract_id}': {len(segments)} segment(s), {len(segment_prompts)} to (re)analyze")
+    raw_outputs = await run_prompts_concurrently(segment_prompts, max_concurrency, response_format="json") if segment_prompts else {}
+    new_results = {key: parse_json_object(raw) for key, raw in raw_outputs.items()}
+    if new_results:
+        version_store.save_segment_results(new_segments, new_results)
+
+    segment_results = [{**known, **new_results}[segment["hash"]] for segment in segments]
+    clauses = merge_clauses([result.get("clauses") for result in segment_results], KEY_CLAUSES)
+    entities = merge_entities([result.get("entities") for result in segment_results], ENTITY_CATEGORIES)
+
+    unchanged = previous is not None and [s["hash"] for s in previous["segments"]] == [s["hash"] for s in segments]
+    if unchanged:
+        summary = previous["analysis"]["summary"]
+    else:
+        summary = await reduce_summaries(
+            [result.get("summary") for result in segment_results], CHUNK_SIZE_CHARS, max_concurrency
         )
+
+    analysis = {"summary": summary, "clauses": clauses, "entities": entities}
+    version = version_store.save_version(contract_id, segments, analysis)
+
+    return {
+        "contract_id": contract_id,
+        "version": version,
+        "summary": summary or "No summary could be extracted from the document.",
+        "clauses": render_clauses(clauses),
+        "entities": render_entities(entities),
+        "structured": analysis,
+        "changes": {
+            "previous_version": previous["version"] if previous else None,
+            "segments": diff_segments(previous["segments"], segments) if previous else [],
+            "clauses": diff_clauses(previous["analysis"]["clauses"], clauses) if previous else None
+        },
+        "stats": {
+            "segments": len(segments),
+            "reanalyzed": len(segment_prompts),
+            "reused": len(segments) - sum(1 for segment in segments if segment["hash"] in new_results)
+        }
     }
 
+def build_located_clause_prompts(text: str) -> tuple:
+    """
+    Replaces the whole-document clauses prompt with one small prompt per clause,
+    built only from the candidate spans found by the rule-based clause locator.
+    Returns (clause_prompts, not_found, clause_index); clauses without any candidate
+    span are answered 'Not found' locally and get no prompt.
+    """
+    clause_index = build_clause_index(text)
+    clause_prompts, not_found = {}, {}
+    for clause in KEY_CLAUSES:
+        spans = clause_index.get(clause, [])
+        if spans:
+            clause_prompts[f"clause:{clause}"] = CLAUSE_SPAN_PROMPT.format(clause=clause, text=format_spans(spans))
+        else:
+            not_found[clause] = "Not found"
+    print(f"INFO: Clause locator: {len(clause_prompts)} clause prompt(s), {len(not_found)} clause(s) answered locally")
+    return clause_prompts, not_found, clause_index
+
+def assemble_located_clauses(results: dict, not_found: dict, clause_index: dict) -> dict:
+    """
+    Folds the per-clause responses back into the usual summary/clauses/entities response.
+    """
+    clauses = {
+        clause: results.pop(f"clause:{clause}", not_found.get(clause, "Not found"))
+        for clause in KEY_CLAUSES
+    }
+    return {
+        "summary": results.pop("summary", None),
+        "clauses": render_clauses(clauses),
+        "entities": results.pop("entities", None),
+        **results,
+        "clause_spans": {
+            clause: [{"start": span["start"], "end": span["end"]} for span in clause_index.get(clause, [])]
+            for clause in KEY_CLAUSES
+        }
+    }
+
+def build_local_entities(text: str, entity_mode: str) -> tuple:
+    """
+    Runs the rule-based entity extractor. In hybrid mode also returns a gap prompt asking
+    the LLM only for the categories the extractor left (nearly) empty.
+    Returns (local_entities, gaps, gap_prompt); gap_prompt is None when no LLM call is needed.
+    """
+    local = extract_entities(text)
+    gaps = find_gaps(local) if entity_mode == "hybrid" else []
+    gap_prompt = None
+    if gaps:
+        found = "; ".join(item for category in ENTITY_CATEGORIES for item in local[category]) or "nothing yet"
+        gap_prompt = ENTITY_GAP_PROMPT.format(categories=", ".join(gaps), found=found, text=text)
+    print(f"INFO: Local entity extraction ({entity_mode}): {sum(len(items) for items in local.values())} entities, "
+          f"LLM gap categories: {gaps or 'none'}")
+    return local, gaps, gap_prompt
+
+def assemble_local_entities(results: dict, local: dict, gaps: list) -> dict:
+    """
+    Replaces the entities section with the locally extracted entities, merged with
+    the LLM's answer for the gap categories in hybrid mode.
+    """
+    llm_entities = parse_entity_lines(results.pop("entities:gaps", ""))
+    entities, sources = merge_gap_entities(local, llm_entities, gaps)
+    results["entities"] = render_entities(entities)
+    results["entity_sources"] = sources
+    return results
+
+def run_prompts_sequentially(formatted_prompts: dict) -> dict:
+    """
+    Sends the formatted prompts to Ollama one after another (original behaviour).
+    """
     results = {}
-    for key, prompt_template in prompts.items():
+    for key, prompt in formatted_prompts.items():
         try:
-            # Format the prompt with the actual legal text
-            formatted_prompt = prompt_template.format(text=text)
-            results[key] = call_llm(formatted_prompt)
+            results[key] = call_llm(prompt)
         except HTTPException as e:
             # Re-raise HTTPException for specific error messages from call_llm
             raise e
         except Exception as e:
             # Catch any other unexpected errors during LLM call
             raise HTTPException(status_code=500, detail=f"An unexpected error occurred during {key} extraction: {e}")
+    return results
 
+def validate_analysis_options(mode: str, max_concurrency: int, chunk_size: int, chunk_overlap: int,
+                              entity_mode: str = "llm"):
+    """
+    Raises a 400 HTTPException if the analysis options are out of range.
+    """
+    if mode not in ANALYSIS_MODES:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Unsupported analysis mode: '{mode}'. Supported modes are: {', '.join(ANALYSIS_MODES)}"
+        )
+    if entity_mode not in ENTITY_MODES:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Unsupported entity mode: '{entity_mode}'. Supported modes are: {', '.join(ENTITY_MODES)}"
+        )
+    if max_concurrency < 1:
+        raise HTTPException(status_code=400, detail="max_concurrency must be at least 1.")
+    if chunk_size < 500 or not 0 <= chunk_overlap < chunk_size // 2:
+        raise HTTPException(
+            status_code=400,
+            detail="chunk_size must be at least 500 characters and chunk_overlap between 0 and half of chunk_size."
+        )
+
+def run_analysis(text: str, mode: str, max_concurrency: int, chunk_size: int, chunk_overlap: int,
+                 locate_clauses: bool, entity_mode: str = "llm") -> dict:
+    """
+    Runs one document through the selected analysis mode. Shared by /analyze/ and the batch workers.
+    """
+    if mode == "single_pass":
+        try:
+            return run_single_pass(text, call_llm, PROMPTS, max_repairs=SINGLE_PASS_MAX_REPAIRS)
+        except HTTPException as e:
+            raise e
+        except Exception as e:
+            raise HTTPException(status_code=500, detail=f"An unexpected error occurred during single-pass extraction: {e}")
+
+    if mode == "chunked":
+        try:
+            return asyncio.run(run_chunked_analysis(text, chunk_size, chunk_overlap, max_concurrency))
+        except HTTPException as e:
+            raise e
+        except Exception as e:
+            raise HTTPException(status_code=500, detail=f"An unexpected error occurred during chunked analysis: {e}")
+
+    # Format each prompt with the actual legal text
+    formatted_prompts = {key: template.format(text=text) for key, template in PROMPTS.items()}
+    if locate_clauses:
+        clause_prompts, not_found, clause_index = build_located_clause_prompts(text)
+        del formatted_prompts["clauses"]
+        formatted_prompts.update(clause_prompts)
+    if entity_mode != "llm":
+        local_entities, entity_gaps, gap_prompt = build_local_entities(text, entity_mode)
+        del formatted_prompts["entities"]
+        if gap_prompt:
+            formatted_prompts["entities:gaps"] = gap_prompt
+
+    if mode == "concurrent":
+        try:
+            # Callers run in a worker thread (FastAPI's threadpool or the batch pool), so this can drive its own event loop
+            results = asyncio.run(run_prompts_concurrently(formatted_prompts, max_concurrency))
+        except HTTPException as e:
+            raise e
+        except Exception as e:
+            raise HTTPException(status_code=500, detail=f"An unexpected error occurred during concurrent extraction: {e}")
+    else:
+        results = run_prompts_sequentially(formatted_prompts)
+
+    if entity_mode != "llm":
+        results = assemble_local_entities(results, local_entities, entity_gaps)
+    if locate_clauses:
+        return assemble_located_clauses(results, not_found, clause_index)
     return results
 
+# Background batch processing shares run_analysis with the interactive endpoint
+batch_jobs = BatchJobManager(
+    BATCH_DB_PATH,
+    max_workers=BATCH_MAX_WORKERS,
+    analyze_fn=lambda text, options: run_analysis(text, **options)
+)
+
+@app.post("/analyze/")
+def analyze_legal(
+    text: str = Form(...),
+    mode: str = Form("sequential"),
+    max_concurrency: int = Form(MAX_CONCURRENT_LLM_REQUESTS),
+    chunk_size: int = Form(CHUNK_SIZE_CHARS),
+    chunk_overlap: int = Form(CHUNK_OVERLAP_CHARS),
+    locate_clauses: bool = Form(False),
+    entity_mode: str = Form("llm")
+):
+    """
+    Analyzes the provided legal text to extract a summary, key clauses, and named entities.
+
+    mode selects how the prompts are executed (see ANALYSIS_MODES). In "concurrent" and
+    "chunked" modes max_concurrency caps how many prompts are sent to Ollama at the same time.
+    chunk_size and chunk_overlap (in characters) only apply to "chunked" mode.
+    locate_clauses (sequential and concurrent modes) pre-slices the document with the
+    rule-based clause locator so only candidate clause spans are sent to the LLM.
+    entity_mode (sequential and concurrent modes, see ENTITY_MODES) replaces the entities
+    prompt with the rule-based extractor, optionally asking the LLM only to fill gaps.
+    """
+    if not text.strip():
+        raise HTTPException(status_code=400, detail="Legal text cannot be empty.")
+    validate_analysis_options(mode, max_concurrency, chunk_size, chunk_overlap, entity_mode)
+
+    return run_analysis(text, mode, max_concurrency, chunk_size, chunk_overlap, locate_clauses, entity_mode)
+
+@app.post("/analyze/upload")
+async def analyze_upload(
+    request: Request,
+    filename: str = "",
+    max_concurrency: int = MAX_CONCURRENT_LLM_REQUESTS,
+    chunk_size: int = CHUNK_SIZE_CHARS,
+    chunk_overlap: int = CHUNK_OVERLAP_CHARS
+):
+    """
+    Analyzes a PDF, DOCX, or plain-text contract sent as the raw request body.
+
+    The body is streamed to disk (never buffered whole in memory), text is extracted page by page,
+    and pages are fed straight into the chunked map-reduce pipeline. The file type comes from the
+    filename query parameter or the Content-Type header. Options are query parameters, as for
+    "chunked" mode. The response adds an "ingestion" block with page counts and timings.
+    """
+    document_type = detect_document_type(filename, request.headers.get("content-type"))
+    if document_type is None:
+        raise HTTPException(
+            status_code=415,
+            detail="Unsupported file type. Upload a .pdf, .docx, or .txt file (set ?filename= or the Content-Type header)."
+        )
+    validate_analysis_options("chunked", max_concurrency, chunk_size, chunk_overlap)
+    max_bytes = MAX_UPLOAD_MB * 1024 * 1024
+    declared_size = request.headers.get("content-length", "")
+    if declared_size.isdigit() and int(declared_size) > max_bytes:
+        raise HTTPException(status_code=413, detail=f"Upload exceeds the {MAX_UPLOAD_MB} MB limit (MAX_UPLOAD_MB).")
+
+    started = time.perf_counter()
+    try:
+        path, size = await save_upload_stream(request.stream(), UPLOAD_DIR, f".{document_type}", max_bytes)
+    except UploadTooLarge:
+        raise HTTPException(status_code=413, detail=f"Upload exceeds the {MAX_UPLOAD_MB} MB limit (MAX_UPLOAD_MB).")
+    upload_seconds = time.perf_counter() - started
+
+    try:
+        result = await run_paged_analysis(
+            iter_pages(path, document_type, UPLOAD_PAGE_CHARS), chunk_size, chunk_overlap, max_concurrency
+        )
+    except HTTPException as e:
+        raise e
+    except UnreadableDocument as e:
+        raise HTTPException(status_code=400, detail=f"Could not read the uploaded document. {e}")
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"An unexpected error occurred while analyzing the uploaded {document_type} file: {e}")
+    finally:
+        os.remove(path)
+
+    if not result["chunks"]:
+        raise HTTPException(
+            status_code=422,
+            detail="No text could be extracted from the uploaded file. Scanned PDFs need OCR before analysis."
+        )
+    result["ingestion"].update({
+        "document_type": document_type,
+        "bytes": size,
+        "upload_seconds": round(upload_seconds, 3),
+        "total_seconds": round(time.perf_counter() - started, 3)
+    })
+    return result
+
+@app.post("/analyze/versioned")
+def analyze_legal_versioned(
+    text: str = Form(...),
+    contract_id: str = Form(...),
+    max_concurrency: int = Form(MAX_CONCURRENT_LLM_REQUESTS)
+):
+    """
+    Analyzes a new version of the contract identified by contract_id, re-running the LLM
+    only for clauses that changed since earlier versions, and returns a clause-level diff.
+    """
+    if not text.strip():
+        raise HTTPException(status_code=400, detail="Legal text cannot be empty.")
+    if not contract_id.strip():
+        raise HTTPException(status_code=400, detail="contract_id cannot be empty.")
+    if max_concurrency < 1:
+        raise HTTPException(status_code=400, detail="max_concurrency must be at least 1.")
+    try:
+        return asyncio.run(run_versioned_analysis(contract_id.strip(), text, max_concurrency))
+    except HTTPException as e:
+        raise e
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"An unexpected error occurred during versioned analysis: {e}")
+
+@app.get("/contracts/{contract_id}/versions")
+def list_contract_versions(contract_id: str):
+    """
+    Lists the stored versions of a contract.
+    """
+    versions = version_store.list_versions(contract_id)
+    if not versions:
+        raise HTTPException(status_code=404, detail=f"No versions stored for contract '{contract_id}'.")
+    return {"contract_id": contract_id, "versions": versions}
+
+@app.post("/analyze/stream")
+async def analyze_legal_stream(
+    text: str = Form(...),
+    max_concurrency: int = Form(MAX_CONCURRENT_LLM_REQUESTS)
+):
+    """
+    Server-Sent Events variant of /analyze/: streams tokens for the summary, clauses, and
+    entities sections as Ollama produces them, each event tagged with its section,
+    followed by a final "done" event with timings.
+    """
+    if not text.strip():
+        raise HTTPException(status_code=400, detail="Legal text cannot be empty.")
+    if max_concurrency < 1:
+        raise HTTPException(status_code=400, detail="max_concurrency must be at least 1.")
+
+    formatted_prompts = {key: template.format(text=text) for key, template in PROMPTS.items()}
+    events = stream_sections(
+        formatted_prompts,
+        base_url=OLLAMA_API_BASE_URL,
+        model=LLM_MODEL,
+        timeout=OLLAMA_REQUEST_TIMEOUT_SECONDS,
+        max_concurrency=max_concurrency,
+        cache=llm_cache,
+        cache_key_fn=lambda prompt: make_cache_key(prompt, LLM_MODEL, PROMPT_TEMPLATE_VERSION)
+    )
+    # X-Accel-Buffering stops reverse proxies such as nginx from holding back the stream
+    return StreamingResponse(
+        events,
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+def read_batch_uploads(files: List[UploadFile], archive: UploadFile) -> tuple:
+    """
+    Collects (filename, text) pairs from PDF, DOCX, and plain-text uploads and/or a zip archive of them,
+    extracting text with the same page extractors as /analyze/upload. Returns (documents, skipped)
+    where skipped lists (filename, reason) for unsupported, unreadable, or empty files.
+    """
+    documents, skipped = [], []
+
+    def add(name: str, data: bytes, content_type: str = None):
+        document_type = detect_document_type(name, content_type)
+        if document_type is None:
+            skipped.append((name, "Unsupported file type; upload .pdf, .docx, or .txt files."))
+            return
+        try:
+            text = extract_document_text(data, document_type, UPLOAD_DIR, UPLOAD_PAGE_CHARS, MAX_UPLOAD_PAGES)
+        except UnreadableDocument as e:
+            skipped.append((name, f"Could not read the document. {e}"))
+            return
+        if text.strip():
+            documents.append((name, text))
+        else:
+            skipped.append((name, "No text could be extracted; scanned PDFs need OCR before analysis."))
+
+    for upload in files or []:
+        add(upload.filename, upload.file.read(), upload.content_type)
+
+    if archive is not None:
+        try:
+            with zipfile.ZipFile(archive.file) as zipped:
+                for member in zipped.infolist():
+                    # Skip folders and macOS resource-fork entries
+                    if member.is_dir() or member.filename.startswith("__MACOSX/"):
+                        continue
+                    add(member.filename, zipped.read(member))
+        except zipfile.BadZipFile:
+            raise HTTPException(status_code=400, detail=f"'{archive.filename}' is not a valid zip archive.")
+
+    return documents, skipped
+
+@app.post("/analyze/batch")
+def analyze_batch(
+    files: List[UploadFile] = File(None),
+    archive: UploadFile = File(None),
+    mode: str = Form("sequential"),
+    max_concurrency: int = Form(MAX_CONCURRENT_LLM_REQUESTS),
+    chunk_size: int = Form(CHUNK_SIZE_CHARS),
+    chunk_overlap: int = Form(CHUNK_OVERLAP_CHARS),
+    locate_clauses: bool = Form(False),
+    entity_mode: str = Form("llm")
+):
+    """
+    Queues many contracts (PDF, DOCX, and text files and/or a zip of them) for background analysis.
+    Files that cannot be read are listed in the job as skipped documents instead of being analyzed.
+    Returns a job id immediately; poll /analyze/batch/{job_id} for progress and
+    /analyze/batch/{job_id}/results for the analyses.
+    """
+    validate_analysis_options(mode, max_concurrency, chunk_size, chunk_overlap, entity_mode)
+    documents, skipped = read_batch_uploads(files, archive)
+    if not documents:
+        reasons = "; ".join(f"{name}: {reason}" for name, reason in skipped)
+        raise HTTPException(
+            status_code=400,
+            detail="No readable .pdf, .docx, or .txt documents were uploaded." + (f" Skipped: {reasons}" if reasons else "")
+        )
+    if len(documents) > BATCH_MAX_DOCUMENTS:
+        raise HTTPException(
+            status_code=413,
+            detail=f"Batch contains {len(documents)} documents; the limit is {BATCH_MAX_DOCUMENTS} (BATCH_MAX_DOCUMENTS)."
+        )
+
+    options = {
+        "mode": mode,
+        "max_concurrency": max_concurrency,
+        "chunk_size": chunk_size,
+        "chunk_overlap": chunk_overlap,
+        "locate_clauses": locate_clauses,
+        "entity_mode": entity_mode
+    }
+    job_id = batch_jobs.create_job(documents, options, skipped)
+    print(f"INFO: Queued batch job {job_id} with {len(documents)} document(s), {len(skipped)} skipped")
+    return {
+        "job_id": job_id,
+        "status": "queued",
+        "total": len(documents),
+        "skipped": [{"filename": name, "reason": reason} for name, reason in skipped]
+    }
+
+@app.get("/analyze/batch")
+def list_batch_jobs(limit: int = 50):
+    """
+    Lists the most recent batch jobs.
+    """
+    return {"jobs": batch_jobs.list_jobs(limit)}
+
+@app.get("/analyze/batch/{job_id}")
+def get_batch_status(job_id: str):
+    """
+    Returns the status and progress of a batch job, including per-document status.
+    """
+    status = batch_jobs.get_status(job_id)
+    if status is None:
+        raise HTTPException(status_code=404, detail=f"Batch job '{job_id}' not found.")
+    return status
+
+@app.get("/analyze/batch/{job_id}/results")
+def get_batch_results(job_id: str):
+    """
+    Returns the analyses of every finished document in a batch job.
+    """
+    results = batch_jobs.get_results(job_id)
+    if results is None:
+        raise HTTPException(status_code=404, detail=f"Batch job '{job_id}' not found.")
+    return {"job_id": job_id, "results": results}
+
+@app.on_event("startup")
+def resume_batch_jobs():
+    """
+    Re-queues batch documents left unfinished by a previous run of the server.
+    """
+    resumed = batch_jobs.resume_unfinished()
+    if resumed:
+        print(f"INFO: Resumed {resumed} unfinished batch document(s)")
+
+@app.get("/cache/stats")
+def cache_stats():
+    """
+    Returns hit/miss counters and tier sizes of the LLM response cache.
+    """
+    if llm_cache is None:
+        return {"enabled": False}
+    return {"enabled": True, "model": LLM_MODEL, "prompt_template_version": PROMPT_TEMPLATE_VERSION, **llm_cache.stats()}
+
+@app.delete("/cache/")
+def clear_cache():
+    """
+    Empties both tiers of the LLM response cache.
+    """
+    if llm_cache is None:
+        raise HTTPException(status_code=404, detail="LLM response cache is disabled (LLM_CACHE_ENABLED=false).")
+    llm_cache.clear()
+    return {"cleared": True}
+
 # Example of how to run this backend:
 # Make sure you have uvicorn installed: pip install uvicorn
 # Run from the 'legal-analyzer-lexpro' directory:
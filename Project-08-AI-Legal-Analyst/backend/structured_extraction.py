@@ -0,0 +1,170 @@
+# backend/structured_extraction.py
+
+import json
+import re
+
+# Clause types and entity categories LexPro reports on.
+# Kept in one place so every analysis mode produces the same sections.
+KEY_CLAUSES = ["Termination", "Liability", "Jurisdiction", "Confidentiality"]
+ENTITY_CATEGORIES = ["Parties", "Dates", "Locations", "Titles"]
+
+# Human-readable description of each top-level key, reused by the initial and repair prompts
+SECTION_SCHEMAS = {
+    "summary": '"summary": a concise string summarizing the main purpose, parties involved, and key agreements',
+    "clauses": (
+        '"clauses": an object with exactly the keys '
+        + ", ".join(f'"{c}"' for c in KEY_CLAUSES)
+        + ', each holding the full text of that clause, or "Not found" if it is absent'
+    ),
+    "entities": (
+        '"entities": an object with exactly the keys '
+        + ", ".join(f'"{c}"' for c in ENTITY_CATEGORIES)
+        + ", each holding a list of strings (use an empty list if none are present)"
+    ),
+}
+
+SINGLE_PASS_PROMPT = (
+    "Analyze the following legal document and respond with a single JSON object containing these keys:\n"
+    "{schema}\n"
+    "Respond with JSON only, no commentary. "
+    "Document:\n\n---\n{text}\n---"
+)
+
+REPAIR_PROMPT = (
+    "Your previous analysis of the following legal document was missing or had invalid values for some keys. "
+    "Respond with a single JSON object containing only these keys:\n"
+    "{schema}\n"
+    "Respond with JSON only, no commentary. "
+    "Document:\n\n---\n{text}\n---"
+)
+
+def build_schema_text(keys) -> str:
+    """
+    Returns the bulleted schema description for the given top-level keys.
+    """
+    return "\n".join(f"- {SECTION_SCHEMAS[key]}" for key in keys)
+
+def parse_json_object(raw: str) -> dict:
+    """
+    Tolerantly parses a JSON object out of an LLM response.
+    Handles markdown code fences, leading/trailing chatter, and trailing commas.
+    Returns an empty dict if nothing usable is found.
+    """
+    if not raw:
+        return {}
+    cleaned = re.sub(r"^```(?:json)?\s*|\s*```$", "", raw.strip(), flags=re.IGNORECASE)
+    start, end = cleaned.find("{"), cleaned.rfind("}")
+    if start == -1 or end <= start:
+        return {}
+    candidate = cleaned[start:end + 1]
+    for attempt in (candidate, re.sub(r",\s*([}\]])", r"\1", candidate)):
+        try:
+            parsed = json.loads(attempt)
+            return parsed if isinstance(parsed, dict) else {}
+        except json.JSONDecodeError:
+            continue
+    return {}
+
+def _normalize_clauses(value):
+    if not isinstance(value, dict):
+        return None
+    # Match clause names case-insensitively, since models often change capitalisation
+    by_lower = {str(k).strip().lower(): v for k, v in value.items()}
+    clauses = {}
+    for clause in KEY_CLAUSES:
+        clause_text = by_lower.get(clause.lower())
+        if not isinstance(clause_text, str) or not clause_text.strip():
+            return None
+        clauses[clause] = clause_text.strip()
+    return clauses
+
+def _normalize_entities(value):
+    if not isinstance(value, dict):
+        return None
+    by_lower = {str(k).strip().lower(): v for k, v in value.items()}
+    entities = {}
+    for category in ENTITY_CATEGORIES:
+        items = by_lower.get(category.lower())
+        if isinstance(items, str):
+            items = [items] if items.strip() else []
+        if not isinstance(items, list):
+            return None
+        entities[category] = [str(item).strip() for item in items if str(item).strip()]
+    return entities
+
+def validate_sections(data: dict) -> tuple:
+    """
+    Validates and normalizes the parsed JSON object.
+    Returns (valid_sections, invalid_keys) where invalid_keys lists the top-level
+    keys that are missing or malformed and need to be re-requested.
+    """
+    valid, invalid = {}, []
+
+    summary = data.get("summary")
+    if isinstance(summary, str) and summary.strip():
+        valid["summary"] = summary.strip()
+    else:
+        invalid.append("summary")
+
+    clauses = _normalize_clauses(data.get("clauses"))
+    if clauses is not None:
+        valid["clauses"] = clauses
+    else:
+        invalid.append("clauses")
+
+    entities = _normalize_entities(data.get("entities"))
+    if entities is not None:
+        valid["entities"] = entities
+    else:
+        invalid.append("entities")
+
+    return valid, invalid
+
+def render_clauses(clauses: dict) -> str:
+    """
+    Renders structured clauses as the labeled markdown text the frontend displays.
+    """
+    return "\n\n".join(f"**{name}:** {clause_text}" for name, clause_text in clauses.items())
+
+def render_entities(entities: dict) -> str:
+    """
+    Renders structured entities in the 'Category:' followed by one entity per line
+    layout that the frontend's entity parser understands.
+    """
+    blocks = []
+    for category, items in entities.items():
+        blocks.append("\n".join([f"{category}:"] + items))
+    return "\n\n".join(blocks)
+
+def run_single_pass(text: str, call_llm, fallback_prompts: dict, max_repairs: int = 1) -> dict:
+    """
+    Extracts summary, clauses, and entities with one JSON-mode generation.
+
+    call_llm must accept (prompt, response_format) and return the raw response text.
+    Keys that are still missing or invalid after max_repairs targeted re-asks are
+    filled by the plain per-section prompts in fallback_prompts.
+    """
+    raw = call_llm(SINGLE_PASS_PROMPT.format(schema=build_schema_text(SECTION_SCHEMAS), text=text), "json")
+    sections, invalid = validate_sections(parse_json_object(raw))
+
+    repairs = 0
+    while invalid and repairs < max_repairs:
+        repairs += 1
+        print(f"INFO: Single-pass extraction: re-asking for invalid keys {invalid} (attempt {repairs})")
+        raw = call_llm(REPAIR_PROMPT.format(schema=build_schema_text(invalid), text=text), "json")
+        repaired, _ = validate_sections(parse_json_object(raw))
+        sections.update({key: repaired[key] for key in invalid if key in repaired})
+        invalid = [key for key in invalid if key not in sections]
+
+    results = {
+        "summary": sections.get("summary"),
+        "clauses": render_clauses(sections["clauses"]) if "clauses" in sections else None,
+        "entities": render_entities(sections["entities"]) if "entities" in sections else None,
+    }
+    # Anything the JSON pass could not produce falls back to the free-text prompt for that section only
+    for key in invalid:
+        print(f"INFO: Single-pass extraction: falling back to free-text prompt for '{key}'")
+        results[key] = call_llm(fallback_prompts[key].format(text=text), None)
+
+    results["structured"] = {key: sections[key] for key in ("summary", "clauses", "entities") if key in sections}
+    return results
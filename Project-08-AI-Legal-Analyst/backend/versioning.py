@@ -0,0 +1,205 @@
+# backend/versioning.py
+
+import difflib
+import hashlib
+import json
+import os
+import sqlite3
+import time
+from contextlib import contextmanager
+from backend.chunking import split_into_segments
+
+# Segments shorter than this (signature lines, "By: ...", stray headings) are attached to the
+# preceding unit, so each unit sent to the LLM is a meaningful clause. Whether a segment is
+# attached depends only on its own length, so an edit never shifts the boundaries of other units.
+MIN_UNIT_CHARS = 120
+
+SEGMENT_PROMPT = (
+    "The following is one clause or section of a legal document. "
+    "Analyze only this section and respond with a single JSON object containing these keys:\n"
+    "{schema}\n"
+    "For \"summary\", write one sentence describing this section. "
+    "Respond with JSON only, no commentary. "
+    "Section:\n\n---\n{text}\n---"
+)
+
+def segment_contract(text: str) -> list:
+    """
+    Splits a contract into clause-level units (see MIN_UNIT_CHARS) and fingerprints each one.
+    Returns a list of {"hash", "text"} dicts in document order.
+    """
+    units = []
+    for segment in split_into_segments(text):
+        if units and len(segment["text"]) < MIN_UNIT_CHARS:
+            units[-1] += "\n\n" + segment["text"]
+        else:
+            units.append(segment["text"])
+    return [{"hash": fingerprint(unit), "text": unit} for unit in units]
+
+def fingerprint(segment_text: str) -> str:
+    """
+    Content hash of a segment, insensitive to whitespace and line-wrapping changes.
+    """
+    return hashlib.sha256(" ".join(segment_text.split()).encode("utf-8")).hexdigest()
+
+def _heading(segment_text: str) -> str:
+    first_line = segment_text.split("\n", 1)[0]
+    return first_line if len(first_line) <= 80 else first_line[:77] + "..."
+
+def diff_segments(old_segments: list, new_segments: list) -> list:
+    """
+    Clause-level diff between two segment lists ({"hash", "text"}), in new-document order.
+    Unchanged segments are omitted.
+    """
+    changes = []
+    matcher = difflib.SequenceMatcher(
+        a=[segment["hash"] for segment in old_segments],
+        b=[segment["hash"] for segment in new_segments],
+        autojunk=False
+    )
+    for op, old_start, old_end, new_start, new_end in matcher.get_opcodes():
+        if op == "equal":
+            continue
+        old_block, new_block = old_segments[old_start:old_end], new_segments[new_start:new_end]
+        # Pair replaced segments one-to-one as modifications; leftovers are additions or removals
+        for offset in range(max(len(old_block), len(new_block))):
+            old = old_block[offset] if offset < len(old_block) else None
+            new = new_block[offset] if offset < len(new_block) else None
+            changes.append({
+                "change": "modified" if old and new else ("added" if new else "removed"),
+                "old_index": old_start + offset if old else None,
+                "new_index": new_start + offset if new else None,
+                "heading": _heading((new or old)["text"]),
+                "old_text": old["text"] if old else None,
+                "new_text": new["text"] if new else None,
+            })
+    return changes
+
+def diff_clauses(old_clauses: dict, new_clauses: dict) -> dict:
+    """
+    Compares the merged key clauses of two versions: added, removed, modified, or unchanged.
+    """
+    status = {}
+    for name in new_clauses:
+        old_text, new_text = (old_clauses or {}).get(name, "Not found"), new_clauses[name]
+        if old_text == new_text:
+            status[name] = "unchanged"
+        elif old_text == "Not found":
+            status[name] = "added"
+        elif new_text == "Not found":
+            status[name] = "removed"
+        else:
+            status[name] = "modified"
+    return status
+
+class VersionStore:
+    """
+    SQLite store of contract versions and per-segment extraction results.
+    Segment results are keyed by fingerprint, so identical clauses are reused across
+    versions and even across contracts.
+    """
+
+    def __init__(self, db_path: str):
+        self.db_path = db_path
+        os.makedirs(os.path.dirname(db_path) or ".", exist_ok=True)
+        with self._connect() as db:
+            db.execute("PRAGMA journal_mode=WAL")
+            db.execute(
+                "CREATE TABLE IF NOT EXISTS segment_results ("
+                "hash TEXT PRIMARY KEY, text TEXT NOT NULL, result TEXT NOT NULL, created_at REAL NOT NULL)"
+            )
+            db.execute(
+                "CREATE TABLE IF NOT EXISTS contract_versions ("
+                "contract_id TEXT NOT NULL, version INTEGER NOT NULL, created_at REAL NOT NULL, "
+                "segment_hashes TEXT NOT NULL, analysis TEXT NOT NULL, PRIMARY KEY (contract_id, version))"
+            )
+
+    @contextmanager
+    def _connect(self):
+        db = sqlite3.connect(self.db_path, timeout=30)
+        try:
+            with db:
+                yield db
+        finally:
+            db.close()
+
+    @staticmethod
+    def _select_by_hash(db, column: str, hashes: list) -> dict:
+        # Query in batches to stay under SQLite's bound-parameter limit for very long contracts
+        unique, found = list(set(hashes)), {}
+        for start in range(0, len(unique), 500):
+            batch = unique[start:start + 500]
+            rows = db.execute(
+                f"SELECT hash, {column} FROM segment_results WHERE hash IN ({','.join('?' * len(batch))})",
+                batch
+            ).fetchall()
+            found.update(dict(rows))
+        return found
+
+    def get_segment_results(self, hashes: list) -> dict:
+        """
+        Returns {hash: result} for the fingerprints that already have stored results.
+        """
+        with self._connect() as db:
+            rows = self._select_by_hash(db, "result", hashes)
+        return {key: json.loads(value) for key, value in rows.items()}
+
+    def save_segment_results(self, segments: list, results: dict):
+        """
+        Stores extraction results for the given segments ({"hash", "text"}), keyed by fingerprint.
+        """
+        now = time.time()
+        with self._connect() as db:
+            db.executemany(
+                "INSERT OR REPLACE INTO segment_results (hash, text, result, created_at) VALUES (?, ?, ?, ?)",
+                [(segment["hash"], segment["text"], json.dumps(results[segment["hash"]]), now) for segment in segments]
+            )
+
+    def latest_version(self, contract_id: str):
+        """
+        Returns the latest stored version as {"version", "segments", "analysis"}, or None.
+        """
+        with self._connect() as db:
+            row = db.execute(
+                "SELECT version, segment_hashes, analysis FROM contract_versions "
+                "WHERE contract_id = ? ORDER BY version DESC LIMIT 1",
+                (contract_id,)
+            ).fetchone()
+            if row is None:
+                return None
+            hashes = json.loads(row[1])
+            texts = self._select_by_hash(db, "text", hashes)
+        return {
+            "version": row[0],
+            "segments": [{"hash": h, "text": texts.get(h, "")} for h in hashes],
+            "analysis": json.loads(row[2]),
+        }
+
+    def save_version(self, contract_id: str, segments: list, analysis: dict) -> int:
+        """
+        Records a new version of the contract and returns its version number.
+        """
+        with self._connect() as db:
+            # Take the write lock before reading MAX(version), so concurrent saves get distinct numbers
+            db.execute("BEGIN IMMEDIATE")
+            current = db.execute(
+                "SELECT COALESCE(MAX(version), 0) FROM contract_versions WHERE contract_id = ?", (contract_id,)
+            ).fetchone()[0]
+            db.execute(
+                "INSERT INTO contract_versions (contract_id, version, created_at, segment_hashes, analysis) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (contract_id, current + 1, time.time(), json.dumps([s["hash"] for s in segments]), json.dumps(analysis))
+            )
+        return current + 1
+
+    def list_versions(self, contract_id: str) -> list:
+        """
+        Returns [{"version", "created_at", "segments"}] for a contract, oldest first.
+        """
+        with self._connect() as db:
+            rows = db.execute(
+                "SELECT version, created_at, segment_hashes FROM contract_versions "
+                "WHERE contract_id = ? ORDER BY version",
+                (contract_id,)
+            ).fetchall()
+        return [{"version": row[0], "created_at": row[1], "segments": len(json.loads(row[2]))} for row in rows]
@@ -121,6 +121,41 @@ text_input = st.text_area(
     value=st.session_state.legal_text_input # Ensure the text area reflects the session state
 )
 
+# Execution mode forwarded to the backend's /analyze/ endpoint
+ANALYSIS_MODES = {
+    "Sequential": "sequential",
+    "Concurrent (all sections at once)": "concurrent",
+    "Single pass (one JSON generation)": "single_pass",
+    "Chunked (long documents)": "chunked",
+}
+analysis_mode_label = st.selectbox(
+    "Analysis mode",
+    list(ANALYSIS_MODES.keys()),
+    help="Concurrent mode sends the summary, clauses and entities prompts to Ollama at the same time. "
+         "Single pass reads the document once and returns all three sections as one JSON object. "
+         "Chunked splits long contracts on section boundaries and analyzes the pieces in parallel."
+)
+
+locate_clauses = st.checkbox(
+    "Pre-locate clauses (faster)",
+    value=False,
+    help="Finds candidate clause sections by heading and keyword matching, sends only those to the LLM, "
+         "and answers 'Not found' locally for clauses that are clearly absent. Applies to sequential and concurrent modes."
+)
+
+# How the entities section is produced, forwarded as the backend's entity_mode field
+ENTITY_MODES = {
+    "LLM": "llm",
+    "Local only (instant)": "local",
+    "Hybrid (local + LLM for gaps)": "hybrid",
+}
+entity_mode_label = st.selectbox(
+    "Entity extraction",
+    list(ENTITY_MODES.keys()),
+    help="Local extraction finds parties, dates, locations, and titles with rules in milliseconds. "
+         "Hybrid asks the LLM only for categories the rules could not fill. Applies to sequential and concurrent modes."
+)
+
 col1, col2 = st.columns([1, 1])
 
 with col1:
@@ -134,7 +169,16 @@ if analyze_button and text_input:
     with st.spinner("Analyzing document... This may take a moment."):
         try:
             # Make a POST request to the FastAPI backend with an explicit timeout
-            response = requests.post(BACKEND_URL, data={"text": text_input}, timeout=REQUEST_TIMEOUT_SECONDS)
+            response = requests.post(
+                BACKEND_URL,
+                data={
+                    "text": text_input,
+                    "mode": ANALYSIS_MODES[analysis_mode_label],
+                    "locate_clauses": str(locate_clauses).lower(),
+                    "entity_mode": ENTITY_MODES[entity_mode_label]
+                },
+                timeout=REQUEST_TIMEOUT_SECONDS
+            )
             response.raise_for_status() # Raise an HTTPError for bad responses (4xx or 5xx)
             st.session_state.results = response.json()
             st.success("Analysis complete!")
@@ -0,0 +1,385 @@
+# backend/backfill.py
+#
+# Bulk runner for backfilling a directory of transcripts, run from the project root:
+#   python -m backend.backfill data/transcripts --output backfill
+# Interrupted runs resume from the checkpoint; results are written as Parquet partitioned by year and quarter.
+
+import argparse
+import asyncio
+import hashlib
+import json
+import multiprocessing
+import os
+import re
+import sys
+import time
+from fnmatch import fnmatch
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timezone
+
+from backend.sentiment_lexicon import LexiconSentimentScorer
+from backend.kpi_extractor import extract_kpis
+from backend.transcript_segmenter import parse_turns, build_segments
+from backend.quarter_comparison import sentiment_label
+
+try:
+    import pyarrow as pa # Optional: only needed by the backfill CLI
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = None
+    pq = None
+
+# Ticker, quarter, and year from file names such as "tesla_q4_2024.txt" or "AAPL-2024-Q1.txt"
+TRANSCRIPT_NAME_PATTERNS = [
+    re.compile(r"^(?P<ticker>[A-Za-z][A-Za-z0-9.]*)[_\- ]+q(?P<quarter>[1-4])[_\- ]*(?:fy)?(?P<year>(?:19|20)\d{2})", re.IGNORECASE),
+    re.compile(r"^(?P<ticker>[A-Za-z][A-Za-z0-9.]*)[_\- ]+(?:fy)?(?P<year>(?:19|20)\d{2})[_\- ]*q(?P<quarter>[1-4])", re.IGNORECASE),
+]
+
+# Parquet partition columns; files that do not match TRANSCRIPT_NAME_PATTERNS land in year=unknown/quarter=unknown
+PARTITION_COLUMNS = ["year", "quarter"]
+
+_scorer = None
+
+class BackfillAborted(Exception):
+    """
+    Raised when a failure would affect every remaining document (Ollama unreachable).
+    """
+
+def parse_transcript_name(path: str) -> dict:
+    """
+    Returns {"ticker", "year", "quarter"} parsed from the file name, with "unknown" for missing parts.
+    """
+    stem = os.path.splitext(os.path.basename(path))[0]
+    for pattern in TRANSCRIPT_NAME_PATTERNS:
+        match = pattern.match(stem)
+        if match:
+            return {"ticker": match.group("ticker").upper(), "year": match.group("year"), "quarter": f"Q{match.group('quarter')}"}
+    return {"ticker": "unknown", "year": "unknown", "quarter": "unknown"}
+
+def preprocess_transcript(path: str, mode: str, sentiment_mode: str, segment_max_chars: int) -> dict:
+    """
+    CPU-bound preparation of one transcript, run in a worker process: reads and hashes the file,
+    extracts KPIs, scores lexicon sentiment (whole mode), and builds segments (segmented mode).
+    """
+    global _scorer
+    stat = os.stat(path)
+    with open(path, encoding="utf-8", errors="replace") as handle:
+        text = handle.read()
+    document = {
+        "path": path,
+        "size": stat.st_size,
+        "mtime": stat.st_mtime,
+        "text": text,
+        "sha256": hashlib.sha256(text.encode("utf-8")).hexdigest(),
+        "kpis": extract_kpis(text),
+        "lexicon_score": None,
+        "segments": None,
+        **parse_transcript_name(path),
+    }
+    if mode == "segmented":
+        document["segments"] = build_segments(parse_turns(text), segment_max_chars)
+    elif sentiment_mode != "llm":
+        # One scorer per worker process; building the vocabulary arrays is the expensive part
+        if _scorer is None:
+            _scorer = LexiconSentimentScorer()
+        document["lexicon_score"] = _scorer.score(text)
+    return document
+
+def discover_transcripts(input_dir: str, pattern: str) -> list:
+    """
+    Sorted list of transcript files under input_dir whose names match the glob pattern.
+    """
+    paths = []
+    for directory, _, filenames in os.walk(input_dir):
+        for filename in filenames:
+            if fnmatch(filename, pattern):
+                paths.append(os.path.join(directory, filename))
+    return sorted(paths)
+
+class Checkpoint:
+    """
+    Append-only JSONL log of finished documents. A document is skipped on resume when its path was
+    recorded as "done" with the same size and modification time; edited and "failed" documents are rerun.
+    Successes are recorded only after their Parquet batch has been written, so a crash between the two
+    can repeat a batch: deduplicate on (path, sha256) when reading.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.entries = {}
+        if os.path.exists(path):
+            with open(path, encoding="utf-8") as handle:
+                for line in handle:
+                    try:
+                        entry = json.loads(line)
+                    except json.JSONDecodeError:
+                        continue # Torn last line from an interrupted write
+                    self.entries[entry["path"]] = entry
+
+    def is_done(self, path: str) -> bool:
+        entry = self.entries.get(path)
+        if entry is None or entry["status"] != "done":
+            return False
+        try:
+            stat = os.stat(path)
+        except OSError:
+            return False
+        return entry.get("size") == stat.st_size and entry.get("mtime") == stat.st_mtime
+
+    def record(self, entries: list):
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        with open(self.path, "a", encoding="utf-8") as handle:
+            for entry in entries:
+                handle.write(json.dumps(entry) + "\n")
+                self.entries[entry["path"]] = entry
+            handle.flush()
+            os.fsync(handle.fileno())
+
+class ThroughputMeter:
+    """
+    Running documents-per-minute and tokens-per-second figures for progress lines.
+    """
+
+    def __init__(self, total: int):
+        self.total = total
+        self.started = time.perf_counter()
+        self.completed = 0
+        self.failed = 0
+        self.prompt_tokens = 0
+        self.completion_tokens = 0
+
+    def add(self, usage: dict = None, failed: bool = False):
+        if failed:
+            self.failed += 1
+            return
+        self.completed += 1
+        self.prompt_tokens += (usage or {}).get("prompt_tokens", 0)
+        self.completion_tokens += (usage or {}).get("completion_tokens", 0)
+
+    def stats(self) -> dict:
+        elapsed = time.perf_counter() - self.started
+        finished = self.completed + self.failed
+        docs_per_minute = self.completed / elapsed * 60 if elapsed else 0.0
+        remaining = self.total - finished
+        return {
+            "completed": self.completed,
+            "failed": self.failed,
+            "remaining": remaining,
+            "elapsed_seconds": round(elapsed, 1),
+            "docs_per_minute": round(docs_per_minute, 2),
+            "prompt_tokens": self.prompt_tokens,
+            "completion_tokens": self.completion_tokens,
+            "tokens_per_second": round(self.completion_tokens / elapsed, 1) if elapsed else 0.0,
+            "eta_seconds": round(remaining / docs_per_minute * 60) if docs_per_minute else None,
+        }
+
+    def report(self) -> str:
+        stats = self.stats()
+        eta = f"{stats['eta_seconds'] // 60}m{stats['eta_seconds'] % 60:02d}s" if stats["eta_seconds"] is not None else "n/a"
+        return (f"{stats['completed'] + stats['failed']}/{self.total} documents ({stats['failed']} failed) | "
+                f"{stats['docs_per_minute']} docs/min | {stats['tokens_per_second']} tokens/s | ETA {eta}")
+
+def build_record(document: dict, results: dict, usage: dict, options, model: str, template_version: str,
+                 seconds: float) -> dict:
+    """
+    Flattens one analysis into a Parquet row; nested KPIs and segments are stored as JSON strings.
+    """
+    return {
+        "doc_id": document["sha256"][:16],
+        "path": document["path"],
+        "ticker": document["ticker"],
+        "year": document["year"],
+        "quarter": document["quarter"],
+        "sha256": document["sha256"],
+        "chars": len(document["text"]),
+        "mode": options.mode,
+        "model": model,
+        "prompt_template_version": template_version,
+        "summary": results.get("summary", ""),
+        "sentiment_label": sentiment_label(results.get("sentiment", "")),
+        "sentiment": results.get("sentiment", ""),
+        "sentiment_source": results.get("sentiment_source", ""),
+        "insights": results.get("insights", ""),
+        "kpi_count": len(document["kpis"]),
+        "kpis_json": json.dumps(document["kpis"]),
+        "segments_json": json.dumps(results.get("segments", [])),
+        "prompt_tokens": usage.get("prompt_tokens", 0),
+        "completion_tokens": usage.get("completion_tokens", 0),
+        "seconds": round(seconds, 2),
+        "processed_at": datetime.now(timezone.utc).isoformat(),
+    }
+
+def write_parquet_batch(records: list, output_dir: str, batch_name: str):
+    """
+    Writes one batch of rows under output_dir, partitioned by PARTITION_COLUMNS (Hive layout:
+    year=2024/quarter=Q4/part-<batch>-0.parquet). Batch names are unique per run, so resumed runs add files.
+    """
+    table = pa.Table.from_pylist(records)
+    pq.write_to_dataset(
+        table,
+        root_path=output_dir,
+        partition_cols=PARTITION_COLUMNS,
+        basename_template=f"part-{batch_name}-{{i}}.parquet",
+        existing_data_behavior="overwrite_or_ignore"
+    )
+
+async def run_backfill(options) -> dict:
+    """
+    Pipelines the backfill: worker processes preprocess transcripts while a shared async client
+    (at most options.max_concurrency generations in flight) runs the LLM prompts. Finished rows are
+    buffered and flushed to Parquet every options.batch_size documents, then checkpointed.
+    """
+    # Imported here so spawned worker processes only load the lightweight helper modules
+    from fastapi import HTTPException
+    import httpx
+    from backend import main
+
+    checkpoint = Checkpoint(options.checkpoint)
+    paths = discover_transcripts(options.input_dir, options.pattern)
+    pending = [path for path in paths if not checkpoint.is_done(path)]
+    print(f"INFO: Backfill: {len(paths)} transcript(s) found, {len(paths) - len(pending)} already done, {len(pending)} to process")
+
+    meter = ThroughputMeter(len(pending))
+    run_id = datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%S")
+    # Rows waiting for the next Parquet flush, and the (size, mtime) each was read with
+    buffer, stats_buffer, batch_number = [], [], 0
+    # Bounds how many documents (with their text) are held in memory at once
+    window = max(options.workers, options.max_concurrency) * 2
+
+    def flush():
+        nonlocal buffer, stats_buffer, batch_number
+        if not buffer:
+            return
+        batch_number += 1
+        write_parquet_batch(buffer, options.output, f"{run_id}-{batch_number:05d}")
+        checkpoint.record([
+            {"path": record["path"], "size": size, "mtime": mtime, "sha256": record["sha256"], "status": "done",
+             "doc_id": record["doc_id"], "finished_at": record["processed_at"]}
+            for record, (size, mtime) in zip(buffer, stats_buffer)
+        ])
+        print(f"INFO: Wrote batch {batch_number} ({len(buffer)} document(s)) to {options.output}")
+        buffer, stats_buffer = [], []
+
+    async def process(path: str) -> dict:
+        loop = asyncio.get_running_loop()
+        started = time.perf_counter()
+        document = await loop.run_in_executor(
+            pool, preprocess_transcript, path, options.mode, options.sentiment_mode, main.SEGMENT_MAX_CHARS
+        )
+        if not document["text"].strip():
+            raise ValueError("Earnings call transcript is empty.")
+        usage = {}
+        if options.mode == "segmented":
+            results = await main.analyze_segments(client, semaphore, document["segments"], usage)
+            results["kpis"] = document["kpis"]
+        else:
+            plan = main.plan_whole_analysis(
+                document["text"], options.sentiment_mode, options.insights_mode,
+                kpis=document["kpis"], lexicon_score=document["lexicon_score"]
+            )
+            if options.insights_mode == "retrieval":
+                plan["local"]["insights"], plan["meta"]["retrieval"] = await main.retrieve_category_insights(
+                    client, semaphore, document["text"], usage
+                )
+            outputs = await main.gather_prompts(client, semaphore, plan["prompts"], usage=usage)
+            results = main.assemble_whole_results(plan, outputs)
+        if options.store and document["year"] != "unknown":
+            # Makes backfilled quarters available to /compare/{ticker}
+            main.quarter_store.save_analysis(document["ticker"], int(document["year"]), int(document["quarter"][1:]), results)
+        record = build_record(document, results, usage, options, main.LLM_MODEL, main.PROMPT_TEMPLATE_VERSION,
+                              time.perf_counter() - started)
+        return {"path": path, "record": record, "usage": usage, "stat": (document["size"], document["mtime"])}
+
+    def collect(task: asyncio.Task, path: str):
+        try:
+            outcome = task.result()
+        except HTTPException as e:
+            if e.status_code == 503:
+                raise BackfillAborted(e.detail) from e
+            outcome = {"path": path, "error": e.detail}
+        except Exception as e:
+            outcome = {"path": path, "error": str(e)}
+
+        if "error" in outcome:
+            meter.add(failed=True)
+            checkpoint.record([{"path": path, "sha256": None, "status": "failed", "error": outcome["error"],
+                                "finished_at": datetime.now(timezone.utc).isoformat()}])
+            print(f"INFO: Failed {path}: {outcome['error']} | {meter.report()}")
+            return
+        meter.add(outcome["usage"])
+        buffer.append(outcome["record"])
+        stats_buffer.append(outcome["stat"])
+        print(f"INFO: Done {path} in {outcome['record']['seconds']}s | {meter.report()}")
+        if len(buffer) >= options.batch_size:
+            flush()
+
+    # Spawned (not forked) workers: the parent holds the cache's SQLite connection and an event loop
+    pool = ProcessPoolExecutor(max_workers=options.workers, mp_context=multiprocessing.get_context("spawn"))
+    semaphore = asyncio.Semaphore(options.max_concurrency)
+    in_flight = {}
+    try:
+        async with httpx.AsyncClient(timeout=main.OLLAMA_REQUEST_TIMEOUT_SECONDS) as client:
+            for path in pending:
+                in_flight[asyncio.create_task(process(path))] = path
+                if len(in_flight) >= window:
+                    done, _ = await asyncio.wait(in_flight, return_when=asyncio.FIRST_COMPLETED)
+                    for task in done:
+                        collect(task, in_flight.pop(task))
+            while in_flight:
+                done, _ = await asyncio.wait(in_flight, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    collect(task, in_flight.pop(task))
+    finally:
+        for task in in_flight:
+            task.cancel()
+        if in_flight:
+            await asyncio.gather(*in_flight, return_exceptions=True)
+        # Keep everything that finished before an interruption
+        flush()
+        pool.shutdown(cancel_futures=True)
+
+    stats = meter.stats()
+    print(f"INFO: Backfill finished: {stats['completed']} done, {stats['failed']} failed in {stats['elapsed_seconds']}s "
+          f"({stats['docs_per_minute']} docs/min, {stats['tokens_per_second']} tokens/s, "
+          f"{stats['prompt_tokens']} prompt + {stats['completion_tokens']} completion tokens)")
+    return stats
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Backfill FinScope analyses for a directory of earnings call transcripts.")
+    parser.add_argument("input_dir", help="Directory searched recursively for transcripts")
+    parser.add_argument("--output", default="backfill", help="Parquet dataset directory (default: backfill)")
+    parser.add_argument("--checkpoint", default=None, help="Checkpoint file (default: <output>/_checkpoint.jsonl)")
+    parser.add_argument("--pattern", default="*.txt", help="File name glob (default: *.txt)")
+    parser.add_argument("--mode", choices=["whole", "segmented"], default="whole")
+    parser.add_argument("--sentiment-mode", choices=["auto", "llm", "lexicon"], default="auto")
+    parser.add_argument("--insights-mode", choices=["kpi", "full", "retrieval"], default="kpi")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="Preprocessing processes")
+    parser.add_argument("--max-concurrency", type=int, default=int(os.getenv("MAX_CONCURRENT_LLM_REQUESTS", "3")),
+                        help="LLM generations in flight (match OLLAMA_NUM_PARALLEL)")
+    parser.add_argument("--no-store", dest="store", action="store_false",
+                        help="Do not save analyses to the per-quarter store used by /compare/{ticker}")
+    parser.add_argument("--batch-size", type=int, default=50, help="Documents per Parquet flush")
+    options = parser.parse_args(argv)
+    if options.checkpoint is None:
+        # Underscore prefix: Parquet readers skip it when scanning the dataset directory
+        options.checkpoint = os.path.join(options.output, "_checkpoint.jsonl")
+    if options.workers < 1 or options.max_concurrency < 1 or options.batch_size < 1:
+        parser.error("--workers, --max-concurrency, and --batch-size must be at least 1")
+    return options
+
+def main(argv=None):
+    options = parse_args(argv)
+    if pa is None:
+        sys.exit("The backfill CLI requires the 'pyarrow' package (pip install pyarrow).")
+    if not os.path.isdir(options.input_dir):
+        sys.exit(f"Input directory not found: {options.input_dir}")
+    try:
+        stats = asyncio.run(run_backfill(options))
+    except BackfillAborted as e:
+        sys.exit(f"Backfill aborted: {e} Finished documents were saved; re-run the same command to resume.")
+    except KeyboardInterrupt:
+        sys.exit("Interrupted; finished documents were saved. Re-run the same command to resume.")
+    sys.exit(1 if stats["failed"] else 0)
+
+if __name__ == "__main__":
+    main()
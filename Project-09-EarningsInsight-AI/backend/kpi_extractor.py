@@ -0,0 +1,223 @@
+# backend/kpi_extractor.py
+
+import re
+
+# Canonical metric names and the phrases that introduce them. Longer phrases are listed first
+# so "operating margin" wins over "margin" and "free cash flow" over "cash".
+METRIC_KEYWORDS = [
+    ("eps", r"earnings per share|diluted eps|eps"),
+    ("free_cash_flow", r"free cash flow"),
+    ("operating_cash_flow", r"operating cash flow|cash from operations"),
+    ("gross_margin", r"gross margins?"),
+    ("operating_margin", r"operating margins?"),
+    ("net_margin", r"net margins?|profit margins?"),
+    ("margin", r"margins?"),
+    ("ebitda", r"adjusted ebitda|ebitda"),
+    ("operating_income", r"operating income|operating profit|income from operations"),
+    ("net_income", r"net income|net profit|net earnings"),
+    ("gross_profit", r"gross profit"),
+    ("capex", r"capital expenditures?|capex"),
+    ("opex", r"operating expenses|opex"),
+    ("revenue", r"total revenues?|revenues?|sales|top line"),
+    ("cash", r"cash position|cash and cash equivalents|cash balance|liquidity|cash"),
+    ("debt", r"total debt|net debt|debt"),
+    ("deliveries", r"deliveries|delivery|shipments|units shipped"),
+    ("deployments", r"deployments"),
+    ("customers", r"customers|subscribers|users"),
+    ("dividend", r"dividends?"),
+    ("buyback", r"buybacks?|share repurchases?"),
+]
+METRIC_PATTERN = re.compile(
+    "|".join(f"(?P<{name}>\\b(?:{phrases})\\b)" for name, phrases in METRIC_KEYWORDS), re.IGNORECASE
+)
+
+SCALES = {
+    "trillion": 1e12, "tn": 1e12, "t": 1e12,
+    "billion": 1e9, "bn": 1e9, "b": 1e9,
+    "million": 1e6, "mm": 1e6, "mn": 1e6, "m": 1e6,
+    "thousand": 1e3, "k": 1e3,
+}
+NUMBER = r"\d{1,3}(?:,\d{3})+(?:\.\d+)?|\d+(?:\.\d+)?"
+SCALE = r"(?:trillion|billion|million|thousand|tn|bn|mm|mn|[tbmk])\b"
+MONEY = rf"\$\s?(?:{NUMBER})(?:\s?{SCALE})?"
+
+# Order matters: ranges and per-share amounts are matched before the plain forms they contain
+KPI_PATTERNS = [
+    ("money_range", re.compile(rf"(?:between\s+)?(?P<low>{MONEY})\s*(?P<joiner>to|-|–|and)\s*(?P<high>{MONEY})", re.IGNORECASE)),
+    ("percent_range", re.compile(rf"(?:between\s+)?(?P<low>{NUMBER})\s?%?\s*(?P<joiner>to|-|–|and)\s*(?P<high>{NUMBER})\s?(?:%|percent\b|per cent\b)", re.IGNORECASE)),
+    ("eps", re.compile(rf"(?P<value>\$\s?\d+\.\d+)\s+(?:per\s+(?:diluted\s+)?share)", re.IGNORECASE)),
+    ("amount", re.compile(rf"(?P<value>{MONEY})", re.IGNORECASE)),
+    ("basis_points", re.compile(rf"(?P<value>{NUMBER})\s?(?:basis\s+points|bps)\b", re.IGNORECASE)),
+    ("percentage", re.compile(rf"(?P<value>{NUMBER})\s?(?:%|percent\b|per cent\b)", re.IGNORECASE)),
+    ("count", re.compile(rf"(?P<value>{NUMBER})(?:\s?(?P<scale>million|thousand))?\s+(?P<noun>units|vehicles|customers|subscribers|users|stores|employees)\b", re.IGNORECASE)),
+]
+
+COMPARISON_PATTERNS = [
+    ("YoY", re.compile(r"year[- ]over[- ]year|\byoy\b|from (?:a|the) year (?:ago|earlier)|(?:same|prior[- ]year) (?:quarter|period)|prior year|last year", re.IGNORECASE)),
+    ("QoQ", re.compile(r"quarter[- ]over[- ]quarter|\bqoq\b|sequential(?:ly)?|(?:previous|prior|last) quarter", re.IGNORECASE)),
+]
+UP_PATTERN = re.compile(r"\b(?:up|increase[sd]?|increasing|grew|grow(?:th|ing)?|rose|rise|improved?|higher|expanded|gain(?:ed)?)\b", re.IGNORECASE)
+DOWN_PATTERN = re.compile(r"\b(?:down|decrease[sd]?|decreasing|declined?|declining|fell|drop(?:ped)?|lower|contracted|reduced?)\b", re.IGNORECASE)
+GUIDANCE_PATTERN = re.compile(r"\b(?:expect(?:s|ed|ing)?|anticipate[sd]?|project(?:s|ed|ing)?|guidance|guide|outlook|forecast(?:s|ed)?|target(?:s|ing)?|plan(?:s|ned)? to|will)\b", re.IGNORECASE)
+PERIOD_PATTERN = re.compile(r"\b(?:Q[1-4]\s?(?:FY)?\s?'?\d{2,4}|(?:first|second|third|fourth) quarter(?: of)?(?: fiscal)?\s?\d{4}|(?:full[- ]year|fiscal(?: year)?|FY)\s?'?\d{2,4})\b", re.IGNORECASE)
+
+# Sentence boundaries: end punctuation followed by whitespace and a capital, quote, or speaker tag, or a blank line
+SENTENCE_BOUNDARY = re.compile(r"(?<=[.!?])\s+(?=[\"'A-Z\[(])|\n\s*\n")
+
+# How far (in characters) before a figure to look for the metric it belongs to
+METRIC_LOOKBACK_CHARS = 80
+
+KPI_INSIGHTS_PROMPT = (
+    "Extract key financial signals and actionable insights from an earnings call. "
+    "You are given a table of figures extracted from the transcript, followed by the transcript sentences they come from. "
+    "Categorize the insights into 'Revenue & Growth Forecasts', 'Risk Warnings & Challenges', and 'Strategic Investments'. "
+    "Present each category as a bulleted list. If a category is not explicitly mentioned, state 'N/A'. "
+    "Extracted figures:\n{table}\n\n"
+    "Source sentences:\n\n---\n{text}\n---"
+)
+
+def split_sentences(text: str) -> list:
+    """
+    Returns [{"start", "end", "text"}] sentence spans with character offsets into text.
+    """
+    sentences, start = [], 0
+    for boundary in list(SENTENCE_BOUNDARY.finditer(text)) + [None]:
+        end = boundary.start() if boundary else len(text)
+        if text[start:end].strip():
+            leading = len(text[start:end]) - len(text[start:end].lstrip())
+            sentences.append({"start": start + leading, "end": end, "text": text[start:end].strip()})
+        if boundary:
+            start = boundary.end()
+    return sentences
+
+def parse_number(raw: str) -> float:
+    """
+    Parses "$28 billion", "$1.5bn", "500,000", "12.5" into a float in base units.
+    """
+    match = re.search(rf"({NUMBER})\s?({SCALE})?", raw.replace("$", ""), re.IGNORECASE)
+    value = float(match.group(1).replace(",", ""))
+    if match.group(2):
+        value *= SCALES[match.group(2).lower()]
+    return value
+
+def _nearest_metric(text: str, start: int, clause_start: int, clause_end: int):
+    """
+    The metric phrase closest before a figure, within the same sentence and METRIC_LOOKBACK_CHARS.
+    Falls back to the first metric phrase after the figure in the same sentence ("$28 billion in revenue").
+    """
+    window_start = max(clause_start, start - METRIC_LOOKBACK_CHARS)
+    before = list(METRIC_PATTERN.finditer(text, window_start, start))
+    if before:
+        return before[-1].lastgroup
+    after = METRIC_PATTERN.search(text, start, min(clause_end, start + 40))
+    return after.lastgroup if after else None
+
+def extract_kpis(text: str) -> list:
+    """
+    Deterministically extracts financial figures from a transcript.
+
+    Returns JSON-ready records in document order:
+    {"kind", "metric", "value", "unit", "low", "high", "comparison", "direction",
+     "forward_looking", "period", "text", "start", "end", "sentence"}
+    where kind is amount, eps, percentage, margin, basis_points, count, or guidance (a range),
+    and sentence indexes into split_sentences(text).
+    """
+    sentences = split_sentences(text)
+    records, taken = [], []
+    for index, sentence in enumerate(sentences):
+        s_start, s_end = sentence["start"], sentence["end"]
+        forward_looking = bool(GUIDANCE_PATTERN.search(sentence["text"]))
+        period_match = PERIOD_PATTERN.search(sentence["text"])
+        for kind, pattern in KPI_PATTERNS:
+            for match in pattern.finditer(text, s_start, s_end):
+                if any(match.start() < end and start < match.end() for start, end in taken):
+                    continue
+                # "X and Y" is only a range after "between" ("$5 billion and $3 billion" are two figures)
+                if (match.groupdict().get("joiner") or "").lower() == "and" and not match.group(0).lower().startswith("between"):
+                    continue
+                taken.append((match.start(), match.end()))
+
+                metric = _nearest_metric(text, match.start(), s_start, s_end)
+                prefix = text[max(s_start, match.start() - 40):match.start()]
+                suffix = text[match.end():min(s_end, match.end() + 50)]
+                # Stop at the next figure so "500,000 units, a 12% increase year-over-year" tags only the 12%
+                next_figure = re.search(r"[$\d]", suffix)
+                suffix = suffix[:next_figure.start()] if next_figure else suffix
+                comparison = next((name for name, comp in COMPARISON_PATTERNS if comp.search(suffix)), None)
+                direction = (
+                    "up" if UP_PATTERN.search(prefix) or UP_PATTERN.match(suffix.strip())
+                    else "down" if DOWN_PATTERN.search(prefix) or DOWN_PATTERN.match(suffix.strip())
+                    else None
+                )
+
+                record = {
+                    "kind": kind, "metric": metric, "value": None, "unit": None, "low": None, "high": None,
+                    "comparison": comparison, "direction": direction, "forward_looking": forward_looking,
+                    "period": period_match.group(0) if period_match else None,
+                    "text": match.group(0).strip(), "start": match.start(), "end": match.end(), "sentence": index,
+                }
+                if kind in ("money_range", "percent_range"):
+                    low, high = parse_number(match.group("low")), parse_number(match.group("high"))
+                    record.update(kind="guidance", low=low, high=high, value=(low + high) / 2,
+                                  unit="USD" if kind == "money_range" else "%")
+                elif kind == "count":
+                    scale = SCALES.get((match.group("scale") or "").lower(), 1)
+                    record.update(value=parse_number(match.group("value")) * scale, unit=match.group("noun").lower())
+                else:
+                    record["value"] = parse_number(match.group("value"))
+                    record["unit"] = {"amount": "USD", "eps": "USD/share", "basis_points": "bps"}.get(kind, "%")
+                    if kind == "amount" and metric == "eps" and record["value"] < 100:
+                        record["kind"], record["unit"] = "eps", "USD/share"
+                    if kind == "percentage" and metric and metric.endswith("margin") and not comparison:
+                        record["kind"] = "margin"
+                records.append(record)
+    records.sort(key=lambda record: record["start"])
+    return records
+
+def select_context(text: str, records: list, window: int = 0) -> str:
+    """
+    Returns the sentences that contain a figure, plus `window` neighbouring sentences on each side,
+    in document order. Gaps between non-adjacent sentences are marked with "[...]".
+    """
+    sentences = split_sentences(text)
+    wanted = set()
+    for record in records:
+        wanted.update(range(max(0, record["sentence"] - window), min(len(sentences), record["sentence"] + window + 1)))
+    parts, previous = [], None
+    for index in sorted(wanted):
+        if previous is not None and index != previous + 1:
+            parts.append("[...]")
+        parts.append(sentences[index]["text"])
+        previous = index
+    return "\n".join(parts)
+
+def format_value(value: float, unit: str) -> str:
+    """
+    Human-readable figure: "$28.00B", "$0.73/share", "12.5%", "40 bps", "500,000 units".
+    """
+    if unit == "USD":
+        for suffix, scale in (("T", 1e12), ("B", 1e9), ("M", 1e6), ("K", 1e3)):
+            if abs(value) >= scale:
+                return f"${value / scale:,.2f}{suffix}"
+        return f"${value:,.2f}"
+    if unit == "USD/share":
+        return f"${value:,.2f}/share"
+    if unit in ("%", "bps"):
+        return f"{value:g}{'%' if unit == '%' else ' bps'}"
+    return f"{value:,.0f} {unit}"
+
+def render_kpi_table(records: list) -> str:
+    """
+    Compact one-line-per-figure table used in the insights prompt.
+    """
+    lines = []
+    for record in records:
+        if record["kind"] == "guidance":
+            value = f"{format_value(record['low'], record['unit'])} to {format_value(record['high'], record['unit'])}"
+        else:
+            value = format_value(record["value"], record["unit"])
+        details = [d for d in (record["direction"], record["comparison"], record["period"],
+                               "forward-looking" if record["forward_looking"] else None) if d]
+        lines.append(f"- {record['metric'] or 'unlabelled'} ({record['kind']}): {value}"
+                     + (f" [{', '.join(details)}]" if details else ""))
+    return "\n".join(lines)
@@ -2,9 +2,31 @@
 
 from fastapi import FastAPI, Form, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import StreamingResponse
 import requests
+import httpx # Async HTTP client used by the streaming and segmented analysis modes
+import asyncio
 import json
 import os
+import time
+import datetime
+import numpy as np
+from backend.llm_cache import LLMCache, make_cache_key
+from backend.streaming import stream_sections
+from backend.sentiment_lexicon import LexiconSentimentScorer, format_sentiment
+from backend.kpi_extractor import extract_kpis, select_context, render_kpi_table, KPI_INSIGHTS_PROMPT
+from backend.transcript_segmenter import (
+    parse_turns, build_segments, parse_json_object, normalize_segment_result, aggregate_sentiment,
+    merge_insights, render_insights, group_for_reduce, SEGMENT_PROMPT, REDUCE_SUMMARY_PROMPT
+)
+from backend.retrieval import (
+    EmbeddingCache, VectorIndex, chunk_transcript, embedding_key, format_excerpts, render_category_insights,
+    CATEGORY_QUERIES, CATEGORY_INSIGHTS_PROMPT
+)
+from backend.quarter_comparison import (
+    QuarterStore, parse_period, format_period, compare_quarters, render_comparison, COMPARISON_PROMPT
+)
+from backend.metrics_store import MetricsStore, quarter_end, duckdb, GUIDANCE_CHANGES, KPI_DIRECTIONS
 
 # Initialize FastAPI app
 app = FastAPI(
@@ -37,22 +59,125 @@ LLM_MODEL = os.getenv("LLM_MODEL", "qwen3:4b") # Default to mistral, can be chan
 # Set a generous timeout for Ollama call (e.g., 8 minutes)
 OLLAMA_REQUEST_TIMEOUT_SECONDS = 1000
 
-def call_llm(prompt: str) -> str:
+# Maximum number of sections generated at the same time by the streaming endpoint.
+# Match this to OLLAMA_NUM_PARALLEL on the Ollama host; extra requests just queue there.
+MAX_CONCURRENT_LLM_REQUESTS = int(os.getenv("MAX_CONCURRENT_LLM_REQUESTS", "3"))
+
+# Supported execution modes for /analyze/
+# - whole: the summary, sentiment, and insights prompts each read the whole transcript (original behaviour)
+# - segmented: the transcript is split into speaker turns and sections (prepared remarks, Q&A); segments are
+#   analyzed concurrently and reduced in order, with per-segment sentiment in the response
+ANALYSIS_MODES = ["whole", "segmented"]
+# Segmented mode: segments are closed once they exceed this many characters (roughly 4 characters per token)
+SEGMENT_MAX_CHARS = int(os.getenv("SEGMENT_MAX_CHARS", "6000"))
+
+# How /analyze/ produces the sentiment section
+# - auto: local finance-lexicon scorer, falling back to the LLM prompt when its confidence is below the threshold
+# - llm: always use the LLM prompt (original behaviour)
+# - lexicon: always use the local scorer, never the LLM
+SENTIMENT_MODES = ["auto", "llm", "lexicon"]
+SENTIMENT_CONFIDENCE_THRESHOLD = float(os.getenv("SENTIMENT_CONFIDENCE_THRESHOLD", "0.6"))
+
+sentiment_scorer = LexiconSentimentScorer()
+
+# How /analyze/ builds the insights prompt
+# - kpi: send only the locally extracted KPI table plus the sentences the figures came from
+#   (falls back to the full transcript when no figures are found)
+# - full: send the whole transcript (original behaviour)
+# - retrieval: embed transcript chunks and give each insight category only its most similar chunks,
+#   with the categories generated concurrently
+INSIGHTS_MODES = ["kpi", "full", "retrieval"]
+# Neighbouring sentences kept around each KPI sentence in "kpi" mode
+KPI_CONTEXT_SENTENCES = int(os.getenv("KPI_CONTEXT_SENTENCES", "1"))
+
+# Retrieval insights: Ollama embedding model, chunking, and how many chunks each category sees
+EMBEDDING_MODEL = os.getenv("EMBEDDING_MODEL", "nomic-embed-text")
+EMBEDDING_CACHE_PATH = os.getenv("EMBEDDING_CACHE_PATH", "cache/embeddings.sqlite3")
+EMBEDDING_BATCH_SIZE = int(os.getenv("EMBEDDING_BATCH_SIZE", "32")) # Chunks per /api/embed request
+RETRIEVAL_CHUNK_CHARS = int(os.getenv("RETRIEVAL_CHUNK_CHARS", "1000"))
+RETRIEVAL_TOP_K = int(os.getenv("RETRIEVAL_TOP_K", "4"))
+
+embedding_cache = EmbeddingCache(EMBEDDING_CACHE_PATH)
+
+# Response cache in front of call_llm, keyed by the normalized prompt, LLM_MODEL, and PROMPT_TEMPLATE_VERSION.
+# Bump PROMPT_TEMPLATE_VERSION whenever prompts or their post-processing change so old answers are not reused.
+PROMPT_TEMPLATE_VERSION = "1"
+LLM_CACHE_ENABLED = os.getenv("LLM_CACHE_ENABLED", "true").lower() == "true"
+LLM_CACHE_PATH = os.getenv("LLM_CACHE_PATH", "cache/llm_cache.sqlite3")
+LLM_CACHE_MEMORY_MB = int(os.getenv("LLM_CACHE_MEMORY_MB", "64"))
+LLM_CACHE_DISK_MB = int(os.getenv("LLM_CACHE_DISK_MB", "512"))
+LLM_CACHE_TTL_SECONDS = int(os.getenv("LLM_CACHE_TTL_SECONDS", str(7 * 24 * 3600))) # 0 disables expiry
+
+llm_cache = LLMCache(
+    LLM_CACHE_PATH,
+    max_memory_bytes=LLM_CACHE_MEMORY_MB * 1024 * 1024,
+    max_disk_bytes=LLM_CACHE_DISK_MB * 1024 * 1024,
+    ttl_seconds=LLM_CACHE_TTL_SECONDS
+) if LLM_CACHE_ENABLED else None
+
+# Per-quarter analyses saved by /analyze/ when ticker and quarter are given, read by /compare/{ticker}
+QUARTER_DB_PATH = os.getenv("QUARTER_DB_PATH", "analyses/quarterly_analyses.sqlite3")
+quarter_store = QuarterStore(QUARTER_DB_PATH)
+# Columnar copy of stored analyses (sentiment and headline KPIs) for /metrics time series and screens.
+# It is synced from the quarter store, so quarters stored by the backfill CLI show up on the next query.
+METRICS_DB_PATH = os.getenv("METRICS_DB_PATH", "analyses/metrics.duckdb")
+metrics_store = MetricsStore(METRICS_DB_PATH) if duckdb is not None else None
+# Upper bound for the number of quarters in one comparison
+MAX_COMPARE_QUARTERS = int(os.getenv("MAX_COMPARE_QUARTERS", "8"))
+
+# Define prompts for different analysis tasks
+# Using clear instructions, specific formats, and delimiters for better LLM performance
+PROMPTS = {
+    "summary": (
+        "Summarize the following earnings call transcript concisely in one paragraph, "
+        "highlighting key financial performance, strategic updates, and future outlook. "
+        "Focus on the most important information for an investor. "
+        "Transcript:\n\n---\n{text}\n---"
+    ),
+    "sentiment": (
+        "Analyze the overall sentiment of the following earnings call transcript regarding the company's future outlook. "
+        "Respond with only one word: 'Positive', 'Neutral', or 'Negative'. "
+        "After the word, provide a brief, one-sentence justification. "
+        "Transcript:\n\n---\n{text}\n---"
+    ),
+    "insights": (
+        "Extract key financial signals and actionable insights from the following earnings call transcript. "
+        "Categorize them into 'Revenue & Growth Forecasts', 'Risk Warnings & Challenges', and 'Strategic Investments'. "
+        "Present each category as a bulleted list. If a category is not explicitly mentioned, state 'N/A'. "
+        "Transcript:\n\n---\n{text}\n---"
+    )
+}
+
+def call_llm(prompt: str, response_format: str = None) -> str:
     """
     Calls the Ollama LLM API to generate a response based on the given prompt.
+    Pass response_format="json" to use Ollama's JSON mode.
     Handles potential connection errors and unexpected responses.
+    Responses are served from / stored in llm_cache when it is enabled.
     """
+    cache_key = make_cache_key(prompt, LLM_MODEL, PROMPT_TEMPLATE_VERSION, response_format)
+    if llm_cache is not None:
+        cached = llm_cache.get(cache_key)
+        if cached is not None:
+            return cached
+
+    payload = {"model": LLM_MODEL, "prompt": prompt, "stream": False}
+    if response_format:
+        payload["format"] = response_format
     try:
         response = requests.post(
             f"{OLLAMA_API_BASE_URL}/api/generate",
-            json={"model": LLM_MODEL, "prompt": prompt, "stream": False},
+            json=payload,
             timeout=OLLAMA_REQUEST_TIMEOUT_SECONDS # Use the increased timeout
         )
         response.raise_for_status() # Raise an HTTPError for bad responses (4xx or 5xx)
         
         response_data = response.json()
         if "response" in response_data:
-            return response_data["response"].strip()
+            result = response_data["response"].strip()
+            if llm_cache is not None:
+                llm_cache.set(cache_key, result)
+            return result
         else:
             raise ValueError(f"Unexpected response format from Ollama: 'response' key missing. Response: {response_data}")
 
@@ -92,43 +217,387 @@ def call_llm(prompt: str) -> str:
             detail=f"An unexpected error occurred during LLM interaction: {e}"
         )
 
+async def call_llm_async(client: httpx.AsyncClient, semaphore: asyncio.Semaphore, prompt: str,
+                         response_format: str = None, usage: dict = None) -> str:
+    """
+    Async counterpart of call_llm used by the segmented analysis mode and the backfill CLI.
+    The semaphore caps how many generations are in flight at once.
+    When a usage dict is passed, Ollama's prompt/completion token counts are added to it
+    (cache hits add nothing).
+    """
+    cache_key = make_cache_key(prompt, LLM_MODEL, PROMPT_TEMPLATE_VERSION, response_format)
+    if llm_cache is not None:
+        cached = llm_cache.get(cache_key)
+        if cached is not None:
+            return cached
+
+    payload = {"model": LLM_MODEL, "prompt": prompt, "stream": False}
+    if response_format:
+        payload["format"] = response_format
+    async with semaphore:
+        try:
+            response = await client.post(f"{OLLAMA_API_BASE_URL}/api/generate", json=payload)
+            response.raise_for_status()
+
+            response_data = response.json()
+            if "response" in response_data:
+                result = response_data["response"].strip()
+                if llm_cache is not None:
+                    llm_cache.set(cache_key, result)
+                if usage is not None:
+                    usage["prompt_tokens"] = usage.get("prompt_tokens", 0) + response_data.get("prompt_eval_count", 0)
+                    usage["completion_tokens"] = usage.get("completion_tokens", 0) + response_data.get("eval_count", 0)
+                return result
+            else:
+                raise ValueError(f"Unexpected response format from Ollama: 'response' key missing. Response: {response_data}")
+
+        except httpx.ConnectError:
+            raise HTTPException(
+                status_code=503,
+                detail=f"Could not connect to Ollama server at {OLLAMA_API_BASE_URL}. "
+                       f"Please ensure Ollama is running and the model '{LLM_MODEL}' is pulled."
+            )
+        except httpx.TimeoutException:
+            raise HTTPException(
+                status_code=504,
+                detail=f"Ollama server timed out after {OLLAMA_REQUEST_TIMEOUT_SECONDS} seconds. "
+                       "The LLM might be taking too long to respond. Consider a smaller model or more powerful hardware."
+            )
+        except httpx.HTTPError as e:
+            raise HTTPException(
+                status_code=500,
+                detail=f"An error occurred while calling the Ollama LLM API: {e}"
+            )
+        except json.JSONDecodeError:
+            raise HTTPException(
+                status_code=500,
+                detail="Failed to decode JSON response from Ollama. Check Ollama server logs for malformed output."
+            )
+        except ValueError as e:
+            raise HTTPException(
+                status_code=500,
+                detail=str(e)
+            )
+
+async def gather_prompts(client: httpx.AsyncClient, semaphore: asyncio.Semaphore, formatted_prompts: dict,
+                         response_format: str = None, usage: dict = None) -> dict:
+    """
+    Sends all formatted prompts through a shared client and semaphore and returns the
+    responses keyed like the input dict, in the same order.
+    """
+    tasks = {
+        key: asyncio.create_task(call_llm_async(client, semaphore, prompt, response_format, usage))
+        for key, prompt in formatted_prompts.items()
+    }
+    try:
+        await asyncio.gather(*tasks.values())
+    except Exception:
+        # One prompt failed: cancel the others instead of waiting for their generations
+        for task in tasks.values():
+            task.cancel()
+        raise
+    return {key: task.result() for key, task in tasks.items()}
+
+async def run_prompts_concurrently(formatted_prompts: dict, max_concurrency: int, response_format: str = None) -> dict:
+    """
+    Sends all formatted prompts to Ollama at the same time (at most max_concurrency in flight)
+    and returns the responses keyed like the input dict, in the same order.
+    """
+    semaphore = asyncio.Semaphore(max_concurrency)
+    async with httpx.AsyncClient(timeout=OLLAMA_REQUEST_TIMEOUT_SECONDS) as client:
+        return await gather_prompts(client, semaphore, formatted_prompts, response_format)
+
+async def call_embeddings_async(client: httpx.AsyncClient, semaphore: asyncio.Semaphore, texts: list) -> list:
+    """
+    Embeds texts with EMBEDDING_MODEL through Ollama's /api/embed, EMBEDDING_BATCH_SIZE texts per request.
+    Returns one vector per text, in order.
+    """
+    async def embed_batch(batch):
+        async with semaphore:
+            try:
+                response = await client.post(
+                    f"{OLLAMA_API_BASE_URL}/api/embed", json={"model": EMBEDDING_MODEL, "input": batch}
+                )
+                response.raise_for_status()
+                embeddings = response.json().get("embeddings")
+                if not embeddings or len(embeddings) != len(batch):
+                    raise ValueError(f"Unexpected response format from Ollama: expected {len(batch)} embeddings.")
+                return embeddings
+            except httpx.ConnectError:
+                raise HTTPException(
+                    status_code=503,
+                    detail=f"Could not connect to Ollama server at {OLLAMA_API_BASE_URL}. "
+                           f"Please ensure Ollama is running and the model '{EMBEDDING_MODEL}' is pulled."
+                )
+            except httpx.TimeoutException:
+                raise HTTPException(
+                    status_code=504,
+                    detail=f"Ollama server timed out after {OLLAMA_REQUEST_TIMEOUT_SECONDS} seconds while embedding."
+                )
+            except httpx.HTTPError as e:
+                raise HTTPException(
+                    status_code=500,
+                    detail=f"An error occurred while calling the Ollama embeddings API "
+                           f"(is '{EMBEDDING_MODEL}' pulled? run: ollama pull {EMBEDDING_MODEL}): {e}"
+                )
+            except (json.JSONDecodeError, ValueError) as e:
+                raise HTTPException(status_code=500, detail=f"Failed to read embeddings from Ollama: {e}")
+
+    batches = [texts[start:start + EMBEDDING_BATCH_SIZE] for start in range(0, len(texts), EMBEDDING_BATCH_SIZE)]
+    results = await asyncio.gather(*(embed_batch(batch) for batch in batches))
+    return [vector for batch in results for vector in batch]
+
+async def embed_with_cache(client: httpx.AsyncClient, semaphore: asyncio.Semaphore, texts: list) -> tuple:
+    """
+    Embeddings for texts, reusing cached vectors by content hash and embedding only the rest.
+    Returns (vectors, number of texts that had to be embedded).
+    """
+    keys = [embedding_key(text, EMBEDDING_MODEL) for text in texts]
+    known = embedding_cache.get_many(keys)
+    missing = {key: text for key, text in zip(keys, texts) if key not in known}
+    if missing:
+        vectors = await call_embeddings_async(client, semaphore, list(missing.values()))
+        new = dict(zip(missing, vectors))
+        embedding_cache.set_many(new)
+        known.update({key: np.asarray(vector, dtype=np.float32) for key, vector in new.items()})
+    return [known[key] for key in keys], len(missing)
+
+async def retrieve_category_insights(client: httpx.AsyncClient, semaphore: asyncio.Semaphore, text: str,
+                                     usage: dict = None) -> tuple:
+    """
+    Retrieval-based insights: the transcript is chunked and embedded (cached per chunk), each insight
+    category retrieves its RETRIEVAL_TOP_K most similar chunks from a cosine index, and the per-category
+    prompts are generated concurrently. Returns (insights markdown, retrieval details).
+    """
+    chunks = chunk_transcript(text, RETRIEVAL_CHUNK_CHARS)
+    categories = list(CATEGORY_QUERIES)
+    vectors, embedded = await embed_with_cache(
+        client, semaphore, [chunk["text"] for chunk in chunks] + [CATEGORY_QUERIES[category] for category in categories]
+    )
+    index = VectorIndex(vectors[:len(chunks)])
+
+    prompts, selected = {}, {}
+    for category, query in zip(categories, vectors[len(chunks):]):
+        hits = index.search(query, RETRIEVAL_TOP_K)
+        selected[category] = [{"chunk": row, "score": round(score, 4)} for row, score in hits]
+        prompts[category] = CATEGORY_INSIGHTS_PROMPT.format(
+            category=category, text=format_excerpts(chunks, [row for row, _ in hits])
+        )
+    print(f"INFO: Retrieval insights: {len(chunks)} chunk(s), {embedded} embedded, "
+          f"{len(chunks) + len(categories) - embedded} from the embedding cache")
+
+    outputs = await gather_prompts(client, semaphore, prompts, usage=usage)
+    details = {
+        "embedding_model": EMBEDDING_MODEL,
+        "chunks": [{"index": chunk["index"], "start": chunk["start"], "end": chunk["end"]} for chunk in chunks],
+        "embedded": embedded,
+        "cached": len(chunks) + len(categories) - embedded,
+        "categories": selected,
+    }
+    return render_category_insights(outputs), details
+
+async def run_retrieval_insights(text: str, max_concurrency: int) -> tuple:
+    semaphore = asyncio.Semaphore(max_concurrency)
+    async with httpx.AsyncClient(timeout=OLLAMA_REQUEST_TIMEOUT_SECONDS) as client:
+        return await retrieve_category_insights(client, semaphore, text)
+
+def plan_whole_analysis(text: str, sentiment_mode: str = "auto", insights_mode: str = "kpi",
+                        kpis: list = None, lexicon_score: dict = None) -> dict:
+    """
+    Local part of the whole-transcript pipeline: scores sentiment with the lexicon, extracts KPIs,
+    and builds the prompts that still need the LLM.
+    Returns {"prompts": {section: prompt}, "local": {section: text}, "meta": {...}}; precomputed
+    kpis and lexicon_score (e.g. from the backfill worker processes) are used as given.
+    In "retrieval" insights mode the insights section is left to the caller.
+    """
+    if lexicon_score is None and sentiment_mode != "llm":
+        lexicon_score = sentiment_scorer.score(text)
+    use_lexicon = lexicon_score is not None and (
+        sentiment_mode == "lexicon" or lexicon_score["confidence"] >= SENTIMENT_CONFIDENCE_THRESHOLD
+    )
+    if lexicon_score is not None:
+        print(f"INFO: Lexicon sentiment {lexicon_score['label']} (confidence {lexicon_score['confidence']}), "
+              f"{'using it' if use_lexicon else 'falling back to the LLM'}")
+
+    formatted_prompts = {key: template.format(text=text) for key, template in PROMPTS.items()}
+    if kpis is None:
+        kpis = extract_kpis(text)
+    insights_source = "full"
+    if insights_mode == "retrieval":
+        # The caller fills local["insights"] (see retrieve_category_insights)
+        del formatted_prompts["insights"]
+        insights_source = "retrieval"
+    elif insights_mode == "kpi" and kpis:
+        context = select_context(text, kpis, KPI_CONTEXT_SENTENCES)
+        formatted_prompts["insights"] = KPI_INSIGHTS_PROMPT.format(table=render_kpi_table(kpis), text=context)
+        insights_source = "kpi"
+        print(f"INFO: Insights prompt built from {len(kpis)} KPI(s): {len(context)} of {len(text)} transcript characters")
+
+    local = {}
+    if use_lexicon:
+        local["sentiment"] = format_sentiment(lexicon_score)
+        del formatted_prompts["sentiment"]
+
+    meta = {"sentiment_source": "lexicon" if use_lexicon else "llm"}
+    if lexicon_score is not None:
+        meta["sentiment_score"] = lexicon_score
+    meta["insights_source"] = insights_source
+    meta["kpis"] = kpis
+    return {"prompts": formatted_prompts, "local": local, "meta": meta}
+
+def assemble_whole_results(plan: dict, llm_outputs: dict) -> dict:
+    """
+    Combines LLM outputs with the locally produced sections of a plan, in PROMPTS order.
+    """
+    results = {key: llm_outputs[key] if key in plan["prompts"] else plan["local"][key] for key in PROMPTS}
+    results.update(plan["meta"])
+    return results
+
+async def run_segmented_analysis(text: str, max_concurrency: int) -> dict:
+    """
+    Speaker- and section-aware analysis for long transcripts (see analyze_segments).
+    """
+    segments = build_segments(parse_turns(text), SEGMENT_MAX_CHARS)
+    print(f"INFO: Segmented analysis: {len(text)} characters split into {len(segments)} segment(s)")
+    semaphore = asyncio.Semaphore(max_concurrency)
+    async with httpx.AsyncClient(timeout=OLLAMA_REQUEST_TIMEOUT_SECONDS) as client:
+        return await analyze_segments(client, semaphore, segments)
+
+async def analyze_segments(client: httpx.AsyncClient, semaphore: asyncio.Semaphore, segments: list,
+                           usage: dict = None) -> dict:
+    """
+    Map: each segment (a speaker's prepared remarks, or one Q&A exchange) is analyzed concurrently,
+    bounded by the semaphore, with a JSON-mode prompt returning its summary, sentiment, and insights.
+    Reduce, in transcript order: segment summaries are combined by the LLM (in as many rounds as
+    needed to stay within SEGMENT_MAX_CHARS), sentiment is a length-weighted vote over segments,
+    and insights are merged locally.
+    """
+    segment_prompts = {
+        segment["index"]: SEGMENT_PROMPT.format(
+            section="prepared remarks" if segment["section"] == "prepared_remarks" else "Q&A",
+            speakers=", ".join(segment["speakers"]),
+            text=segment["text"]
+        )
+        for segment in segments
+    }
+    raw_outputs = await gather_prompts(client, semaphore, segment_prompts, response_format="json", usage=usage)
+    results = [normalize_segment_result(parse_json_object(raw_outputs[segment["index"]])) for segment in segments]
+
+    summaries = [result["summary"] for result in results if result["summary"]]
+    while len(summaries) > 1:
+        groups = group_for_reduce(summaries, SEGMENT_MAX_CHARS)
+        reduced = await gather_prompts(
+            client,
+            semaphore,
+            {index: REDUCE_SUMMARY_PROMPT.format(text="\n\n".join(group)) for index, group in enumerate(groups)},
+            usage=usage
+        )
+        summaries = [reduced[index] for index in range(len(groups))]
+
+    sentiment = aggregate_sentiment(segments, results)
+    return {
+        "summary": summaries[0] if summaries else "No summary could be extracted from the transcript.",
+        "sentiment": sentiment["text"],
+        "insights": render_insights(merge_insights(results)),
+        "sentiment_source": "segments",
+        "section_sentiment": sentiment["sections"],
+        "segments": [
+            {
+                "index": segment["index"],
+                "section": segment["section"],
+                "speakers": segment["speakers"],
+                "start": segment["start"],
+                "end": segment["end"],
+                "summary": result["summary"],
+                "sentiment": result["sentiment"],
+                "sentiment_reason": result["sentiment_reason"],
+            }
+            for segment, result in zip(segments, results)
+        ]
+    }
+
 @app.post("/analyze/")
-def analyze_call(text: str = Form(...)):
+def analyze_call(
+    text: str = Form(...),
+    mode: str = Form("whole"),
+    max_concurrency: int = Form(MAX_CONCURRENT_LLM_REQUESTS),
+    sentiment_mode: str = Form("auto"),
+    insights_mode: str = Form("kpi"),
+    ticker: str = Form(None),
+    quarter: str = Form(None)
+):
     """
     Analyzes the provided earnings call transcript to extract a summary,
     overall sentiment, and key financial insights.
+
+    mode selects the pipeline (see ANALYSIS_MODES); in "segmented" mode max_concurrency caps
+    how many segments are sent to Ollama at the same time, and sentiment_mode and insights_mode
+    do not apply. max_concurrency also caps the concurrent category prompts of "retrieval" insights.
+
+    sentiment_mode (see SENTIMENT_MODES) decides whether sentiment comes from the local
+    lexicon scorer or the LLM; "sentiment_source" in the response says which one was used.
+    insights_mode (see INSIGHTS_MODES) decides whether the insights prompt sees the whole
+    transcript, only the extracted KPIs and their sentences, or per-category retrieved chunks
+    ("retrieval" adds the selected chunks under "retrieval"). Extracted KPIs are always
+    returned under "kpis".
+
+    When ticker and quarter (e.g. "Q4 2024") are given, the result is stored for /compare/{ticker};
+    re-analyzing the same quarter replaces the stored result.
     """
     if not text.strip():
         raise HTTPException(status_code=400, detail="Earnings call transcript cannot be empty.")
+    if mode not in ANALYSIS_MODES:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Unsupported analysis mode: '{mode}'. Supported modes are: {', '.join(ANALYSIS_MODES)}"
+        )
+    if max_concurrency < 1:
+        raise HTTPException(status_code=400, detail="max_concurrency must be at least 1.")
+    if sentiment_mode not in SENTIMENT_MODES:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Unsupported sentiment mode: '{sentiment_mode}'. Supported modes are: {', '.join(SENTIMENT_MODES)}"
+        )
 
-    # Define prompts for different analysis tasks
-    # Using clear instructions, specific formats, and delimiters for better LLM performance
-    prompts = {
-        "summary": (
-            "Summarize the following earnings call transcript concisely in one paragraph, "
-            "highlighting key financial performance, strategic updates, and future outlook. "
-            "Focus on the most important information for an investor. "
-            "Transcript:\n\n---\n{text}\n---"
-        ),
-        "sentiment": (
-            "Analyze the overall sentiment of the following earnings call transcript regarding the company's future outlook. "
-            "Respond with only one word: 'Positive', 'Neutral', or 'Negative'. "
-            "After the word, provide a brief, one-sentence justification. "
-            "Transcript:\n\n---\n{text}\n---"
-        ),
-        "insights": (
-            "Extract key financial signals and actionable insights from the following earnings call transcript. "
-            "Categorize them into 'Revenue & Growth Forecasts', 'Risk Warnings & Challenges', and 'Strategic Investments'. "
-            "Present each category as a bulleted list. If a category is not explicitly mentioned, state 'N/A'. "
-            "Transcript:\n\n---\n{text}\n---"
+    if insights_mode not in INSIGHTS_MODES:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Unsupported insights mode: '{insights_mode}'. Supported modes are: {', '.join(INSIGHTS_MODES)}"
         )
-    }
 
-    results = {}
-    for key, prompt_template in prompts.items():
+    period = None
+    if ticker or quarter:
+        period = parse_period(quarter) if quarter else None
+        if not (ticker or "").strip() or period is None:
+            raise HTTPException(
+                status_code=400,
+                detail="Storing an analysis needs both ticker and quarter (e.g. quarter='Q4 2024')."
+            )
+
+    if mode == "segmented":
+        try:
+            # Sync endpoints run in FastAPI's threadpool, so this can drive its own event loop
+            results = asyncio.run(run_segmented_analysis(text, max_concurrency))
+        except HTTPException as e:
+            raise e
+        except Exception as e:
+            raise HTTPException(status_code=500, detail=f"An unexpected error occurred during segmented analysis: {e}")
+        results["kpis"] = extract_kpis(text)
+        return store_quarter_analysis(ticker, period, results)
+
+    plan = plan_whole_analysis(text, sentiment_mode, insights_mode)
+    if insights_mode == "retrieval":
         try:
-            formatted_prompt = prompt_template.format(text=text)
-            results[key] = call_llm(formatted_prompt)
+            plan["local"]["insights"], plan["meta"]["retrieval"] = asyncio.run(run_retrieval_insights(text, max_concurrency))
+        except HTTPException as e:
+            raise e
+        except Exception as e:
+            raise HTTPException(status_code=500, detail=f"An unexpected error occurred during retrieval insights: {e}")
+
+    llm_outputs = {}
+    for key, formatted_prompt in plan["prompts"].items():
+        try:
+            llm_outputs[key] = call_llm(formatted_prompt)
         except HTTPException as e:
             # Re-raise HTTPException for specific error messages from call_llm
             raise e
@@ -136,8 +605,239 @@ def analyze_call(text: str = Form(...)):
             # Catch any other unexpected errors during LLM call
             raise HTTPException(status_code=500, detail=f"An unexpected error occurred during {key} extraction: {e}")
 
+    return store_quarter_analysis(ticker, period, assemble_whole_results(plan, llm_outputs))
+
+def store_quarter_analysis(ticker: str, period: tuple, results: dict) -> dict:
+    """
+    Saves results under (ticker, period) when a period was given and reports where they were stored.
+    """
+    if period is None:
+        return results
+    quarter_store.save_analysis(ticker.strip(), period[0], period[1], results)
+    if metrics_store is not None:
+        sync_metrics_store()
+    results["stored"] = {"ticker": ticker.strip().upper(), "period": format_period(*period)}
+    print(f"INFO: Stored analysis for {results['stored']['ticker']} {results['stored']['period']}")
     return results
 
+def sync_metrics_store() -> int:
+    """
+    Copies analyses stored since the metrics store's watermark into it. Returns how many were copied.
+    """
+    rows = quarter_store.analyses_since(metrics_store.last_stored_at())
+    metrics_store.upsert_calls(rows)
+    if rows:
+        print(f"INFO: Synced {len(rows)} stored analysis(es) into the metrics store")
+    return len(rows)
+
+def require_metrics_store():
+    if metrics_store is None:
+        raise HTTPException(status_code=503, detail="The metrics store requires the 'duckdb' package (pip install duckdb).")
+    sync_metrics_store()
+
+def parse_period_bound(value: str, name: str):
+    """
+    Accepts a quarter label ("Q4 2024", compared by quarter end) or an ISO date ("2024-12-31").
+    """
+    period = parse_period(value)
+    if period is not None:
+        return quarter_end(*period)
+    try:
+        return datetime.date.fromisoformat(value)
+    except ValueError:
+        raise HTTPException(status_code=400, detail=f"Unrecognised {name}: '{value}'. Use a quarter such as 'Q4 2024' or a date such as '2024-12-31'.")
+
+@app.get("/metrics/timeseries/{ticker}")
+def metrics_timeseries(ticker: str, start: str = None, end: str = None, kpis: str = None):
+    """
+    Sentiment and headline KPI time series for a ticker from the metrics store (no LLM calls).
+    start / end bound the quarter end dates; kpis is a comma-separated list of KPI names
+    (e.g. "revenue,eps,revenue_guidance").
+    """
+    require_metrics_store()
+    started = time.perf_counter()
+    result = metrics_store.timeseries(
+        ticker,
+        start=parse_period_bound(start, "start") if start else None,
+        end=parse_period_bound(end, "end") if end else None,
+        kpis=[kpi.strip() for kpi in kpis.split(",") if kpi.strip()] if kpis else None
+    )
+    if not result["calls"]:
+        raise HTTPException(status_code=404, detail=f"No stored calls for ticker '{ticker.upper()}' in that range.")
+    result["query_ms"] = round((time.perf_counter() - started) * 1000, 2)
+    return result
+
+@app.get("/metrics/screen")
+def metrics_screen(
+    period: str = "latest",
+    sentiment: str = None,
+    min_confidence: float = None,
+    guidance: str = None,
+    kpi: str = None,
+    kpi_direction: str = None,
+    min_value: float = None,
+    max_value: float = None,
+    limit: int = 100
+):
+    """
+    Cross-sectional screen over all stored calls of one fiscal quarter (no LLM calls), e.g.
+    /metrics/screen?sentiment=Negative&guidance=lowered for negative calls that lowered guidance
+    in the latest stored quarter. sentiment is a comma-separated list of labels; guidance is one of
+    GUIDANCE_CHANGES; kpi with kpi_direction ("up" / "down") and min_value / max_value filters one KPI.
+    """
+    require_metrics_store()
+    if guidance and guidance not in GUIDANCE_CHANGES:
+        raise HTTPException(status_code=400, detail=f"Unsupported guidance filter: '{guidance}'. Supported values are: {', '.join(GUIDANCE_CHANGES)}")
+    if kpi_direction and kpi_direction not in KPI_DIRECTIONS:
+        raise HTTPException(status_code=400, detail=f"Unsupported kpi_direction: '{kpi_direction}'. Supported values are: {', '.join(KPI_DIRECTIONS)}")
+    if (kpi_direction or min_value is not None or max_value is not None) and not kpi:
+        raise HTTPException(status_code=400, detail="kpi_direction, min_value, and max_value need a kpi.")
+    if not 1 <= limit <= 1000:
+        raise HTTPException(status_code=400, detail="limit must be between 1 and 1000.")
+
+    if period == "latest":
+        target = metrics_store.latest_period()
+        if target is None:
+            raise HTTPException(status_code=404, detail="The metrics store is empty. Store analyses with ticker and quarter first.")
+    else:
+        target = parse_period(period)
+        if target is None:
+            raise HTTPException(status_code=400, detail=f"Unrecognised quarter: '{period}'. Use a label such as 'Q4 2024' or 'latest'.")
+
+    started = time.perf_counter()
+    matches = metrics_store.screen(
+        target[0], target[1],
+        sentiments=[label.strip().capitalize() for label in sentiment.split(",") if label.strip()] if sentiment else None,
+        min_confidence=min_confidence,
+        guidance=guidance,
+        kpi=kpi,
+        kpi_direction=kpi_direction,
+        min_value=min_value,
+        max_value=max_value,
+        limit=limit
+    )
+    return {
+        "period": format_period(*target),
+        "matches": matches,
+        "count": len(matches),
+        "query_ms": round((time.perf_counter() - started) * 1000, 2),
+    }
+
+@app.get("/metrics/stats")
+def metrics_stats():
+    """
+    Row counts of the metrics store.
+    """
+    require_metrics_store()
+    return {"path": METRICS_DB_PATH, **metrics_store.stats()}
+
+@app.post("/metrics/rebuild")
+def metrics_rebuild():
+    """
+    Rebuilds the metrics store from every analysis in the quarter store.
+    """
+    if metrics_store is None:
+        raise HTTPException(status_code=503, detail="The metrics store requires the 'duckdb' package (pip install duckdb).")
+    metrics_store.clear()
+    return {"synced": sync_metrics_store()}
+
+@app.get("/companies/{ticker}/quarters")
+def list_company_quarters(ticker: str):
+    """
+    Lists the quarters with a stored analysis for a ticker.
+    """
+    quarters = quarter_store.list_quarters(ticker)
+    if not quarters:
+        raise HTTPException(status_code=404, detail=f"No analyses stored for ticker '{ticker.upper()}'.")
+    return {"ticker": ticker.upper(), "quarters": quarters}
+
+@app.get("/compare/{ticker}")
+def compare_company_quarters(ticker: str, quarters: int = 4, end: str = None, narrative: bool = True):
+    """
+    Compares the last `quarters` stored analyses of a ticker (ending at `end`, e.g. "Q4 2024",
+    or at the latest stored quarter): sentiment shifts, KPI deltas, and new or dropped risk themes
+    are computed from stored results. The LLM is only used for one short narrative of the
+    differences, and not at all with narrative=false.
+    """
+    if not 2 <= quarters <= MAX_COMPARE_QUARTERS:
+        raise HTTPException(status_code=400, detail=f"quarters must be between 2 and {MAX_COMPARE_QUARTERS}.")
+    end_period = None
+    if end:
+        end_period = parse_period(end)
+        if end_period is None:
+            raise HTTPException(status_code=400, detail=f"Unrecognised quarter: '{end}'. Use a label such as 'Q4 2024'.")
+
+    stored = quarter_store.recent_quarters(ticker, quarters, end_period)
+    if len(stored) < 2:
+        raise HTTPException(
+            status_code=404,
+            detail=f"At least two stored quarters are needed to compare '{ticker.upper()}'; found {len(stored)}."
+        )
+
+    comparison = compare_quarters(ticker.upper(), stored)
+    if narrative:
+        prompt = COMPARISON_PROMPT.format(
+            ticker=ticker.upper(), periods=", ".join(comparison["periods"]), facts=render_comparison(comparison)
+        )
+        try:
+            comparison["narrative"] = call_llm(prompt)
+        except HTTPException as e:
+            raise e
+        except Exception as e:
+            raise HTTPException(status_code=500, detail=f"An unexpected error occurred during comparison narrative: {e}")
+    return comparison
+
+@app.post("/analyze/stream")
+async def analyze_call_stream(
+    text: str = Form(...),
+    max_concurrency: int = Form(MAX_CONCURRENT_LLM_REQUESTS)
+):
+    """
+    Server-Sent Events variant of /analyze/: streams tokens for the summary, sentiment, and insights sections
+    as Ollama produces them, each event tagged with its section, followed by a final "done" event with timings.
+    """
+    if not text.strip():
+        raise HTTPException(status_code=400, detail="Earnings call transcript cannot be empty.")
+    if max_concurrency < 1:
+        raise HTTPException(status_code=400, detail="max_concurrency must be at least 1.")
+
+    formatted_prompts = {key: template.format(text=text) for key, template in PROMPTS.items()}
+    events = stream_sections(
+        formatted_prompts,
+        base_url=OLLAMA_API_BASE_URL,
+        model=LLM_MODEL,
+        timeout=OLLAMA_REQUEST_TIMEOUT_SECONDS,
+        max_concurrency=max_concurrency,
+        cache=llm_cache,
+        cache_key_fn=lambda prompt: make_cache_key(prompt, LLM_MODEL, PROMPT_TEMPLATE_VERSION)
+    )
+    # X-Accel-Buffering stops reverse proxies such as nginx from holding back the stream
+    return StreamingResponse(
+        events,
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+@app.get("/cache/stats")
+def cache_stats():
+    """
+    Returns hit/miss counters and tier sizes of the LLM response cache.
+    """
+    if llm_cache is None:
+        return {"enabled": False}
+    return {"enabled": True, "model": LLM_MODEL, "prompt_template_version": PROMPT_TEMPLATE_VERSION, **llm_cache.stats(),
+            "embeddings": {"model": EMBEDDING_MODEL, **embedding_cache.stats()}}
+
+@app.delete("/cache/")
+def clear_cache():
+    """
+    Empties both tiers of the LLM response cache.
+    """
+    if llm_cache is None:
+        raise HTTPException(status_code=404, detail="LLM response cache is disabled (LLM_CACHE_ENABLED=false).")
+    llm_cache.clear()
+    return {"cleared": True}
+
 # Example of how to run this backend:
 # Make sure you have uvicorn installed: pip install uvicorn
 # Run from the 'earnings-call-analyzer' directory:
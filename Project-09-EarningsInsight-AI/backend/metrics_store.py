@@ -0,0 +1,292 @@
+# backend/metrics_store.py
+
+import calendar
+import os
+import threading
+import time
+from datetime import date, datetime, timezone
+
+try:
+    import duckdb # Optional: only needed for the /metrics endpoints
+except ImportError:
+    duckdb = None
+
+try:
+    import pyarrow as pa # Optional: bulk-loads synced rows; falls back to executemany without it
+except ImportError:
+    pa = None
+
+from backend.quarter_comparison import headline_kpis, sentiment_label, format_period, SENTIMENT_VALUES
+
+GUIDANCE_CHANGES = ["lowered", "raised", "maintained"]
+KPI_DIRECTIONS = ["up", "down"]
+
+CALL_COLUMNS = [
+    "ticker", "fiscal_year", "fiscal_quarter", "period", "period_end", "sentiment_label", "sentiment_value",
+    "sentiment_net", "sentiment_confidence", "sentiment_source", "kpi_count", "stored_at",
+]
+KPI_COLUMNS = ["ticker", "fiscal_year", "fiscal_quarter", "period_end", "kpi", "value", "unit", "text"]
+
+SCHEMA = [
+    "CREATE TABLE IF NOT EXISTS calls ("
+    "ticker VARCHAR NOT NULL, fiscal_year INTEGER NOT NULL, fiscal_quarter INTEGER NOT NULL, "
+    "period VARCHAR NOT NULL, period_end DATE NOT NULL, "
+    "sentiment_label VARCHAR, sentiment_value DOUBLE, sentiment_net DOUBLE, sentiment_confidence DOUBLE, "
+    "sentiment_source VARCHAR, kpi_count INTEGER, stored_at TIMESTAMP NOT NULL, "
+    "PRIMARY KEY (ticker, fiscal_year, fiscal_quarter))",
+    "CREATE TABLE IF NOT EXISTS call_kpis ("
+    "ticker VARCHAR NOT NULL, fiscal_year INTEGER NOT NULL, fiscal_quarter INTEGER NOT NULL, "
+    "period_end DATE NOT NULL, kpi VARCHAR NOT NULL, value DOUBLE NOT NULL, unit VARCHAR, text VARCHAR, "
+    "PRIMARY KEY (ticker, fiscal_year, fiscal_quarter, kpi))",
+    # Each KPI next to the previous quarter that reported it, for change screens
+    "CREATE OR REPLACE VIEW kpi_changes AS SELECT *, "
+    "LAG(value) OVER (PARTITION BY ticker, kpi ORDER BY fiscal_year, fiscal_quarter) AS previous_value, "
+    "LAG(period_end) OVER (PARTITION BY ticker, kpi ORDER BY fiscal_year, fiscal_quarter) AS previous_period_end "
+    "FROM call_kpis",
+]
+
+def quarter_end(year: int, quarter: int) -> date:
+    """
+    Last calendar day of a fiscal quarter, treating the fiscal year as the calendar year.
+    """
+    month = quarter * 3
+    return date(year, month, calendar.monthrange(year, month)[1])
+
+def sentiment_fields(analysis: dict) -> dict:
+    """
+    Sentiment columns for one stored analysis. Confidence comes from the lexicon scorer when it produced
+    the label, or is the share of segments agreeing with the overall label in segmented mode.
+    """
+    label = sentiment_label(analysis.get("sentiment"))
+    score = analysis.get("sentiment_score") or {}
+    confidence = None
+    if analysis.get("sentiment_source") == "lexicon":
+        confidence = score.get("confidence")
+    elif analysis.get("segments"):
+        segments = analysis["segments"]
+        confidence = round(sum(1 for segment in segments if segment.get("sentiment") == label) / len(segments), 3)
+    return {
+        "sentiment_label": label,
+        "sentiment_value": SENTIMENT_VALUES.get(label),
+        "sentiment_net": score.get("net"),
+        "sentiment_confidence": confidence,
+        "sentiment_source": analysis.get("sentiment_source"),
+    }
+
+class MetricsStore:
+    """
+    DuckDB store of per-call sentiment and headline KPIs, one row per (ticker, fiscal quarter)
+    in "calls" and one row per KPI in "call_kpis", for time series and screening queries.
+
+    The connection is opened on first use: DuckDB allows a single writing process, so modules
+    that import backend.main without serving queries (the backfill CLI) never lock the file.
+    """
+
+    def __init__(self, db_path: str):
+        self.db_path = db_path
+        self._db = None
+        self._lock = threading.Lock()
+
+    def _connection(self):
+        # Caller holds the lock
+        if self._db is None:
+            os.makedirs(os.path.dirname(self.db_path) or ".", exist_ok=True)
+            self._db = duckdb.connect(self.db_path)
+            for statement in SCHEMA:
+                self._db.execute(statement)
+        return self._db
+
+    def _query(self, sql: str, params: list = None) -> list:
+        """
+        Runs a query and returns rows as dicts.
+        """
+        with self._lock:
+            cursor = self._connection().execute(sql, params or [])
+            columns = [column[0] for column in cursor.description]
+            return [dict(zip(columns, row)) for row in cursor.fetchall()]
+
+    def upsert_calls(self, rows: list):
+        """
+        Replaces the stored row and KPIs of each (ticker, year, quarter) with values from its analysis,
+        all in one transaction. rows: [{"ticker", "year", "quarter", "analysis", "created_at"}];
+        when a key repeats, the later row wins.
+        """
+        latest = {(row["ticker"].upper(), row["year"], row["quarter"]): row for row in rows}
+        if not latest:
+            return
+        calls, kpi_rows = [], []
+        for (ticker, year, quarter), row in latest.items():
+            period_end = quarter_end(year, quarter)
+            stored = datetime.fromtimestamp(row.get("created_at") or time.time(), tz=timezone.utc).replace(tzinfo=None)
+            sentiment = sentiment_fields(row["analysis"])
+            calls.append((ticker, year, quarter, format_period(year, quarter), period_end, sentiment["sentiment_label"],
+                          sentiment["sentiment_value"], sentiment["sentiment_net"], sentiment["sentiment_confidence"],
+                          sentiment["sentiment_source"], len(row["analysis"].get("kpis", [])), stored))
+            for kpi, values in headline_kpis(row["analysis"].get("kpis", [])).items():
+                kpi_rows.append((ticker, year, quarter, period_end, kpi, values["value"], values["unit"], values["text"]))
+
+        with self._lock:
+            db = self._connection()
+            db.execute("BEGIN TRANSACTION")
+            try:
+                db.execute("CREATE OR REPLACE TEMP TABLE staged_calls AS SELECT * FROM calls LIMIT 0")
+                self._insert_rows(db, "staged_calls", CALL_COLUMNS, calls)
+                for table in ("call_kpis", "calls"):
+                    db.execute(
+                        f"DELETE FROM {table} USING staged_calls s WHERE {table}.ticker = s.ticker "
+                        f"AND {table}.fiscal_year = s.fiscal_year AND {table}.fiscal_quarter = s.fiscal_quarter"
+                    )
+                db.execute("INSERT INTO calls SELECT * FROM staged_calls")
+                self._insert_rows(db, "call_kpis", KPI_COLUMNS, kpi_rows)
+                db.execute("DROP TABLE staged_calls")
+                db.execute("COMMIT")
+            except Exception:
+                db.execute("ROLLBACK")
+                raise
+
+    @staticmethod
+    def _insert_rows(db, table: str, columns: list, rows: list):
+        """
+        Appends row tuples to a table. With pyarrow the rows go in as one Arrow table, which is orders of
+        magnitude faster than executemany for the thousands of rows of a first sync.
+        """
+        if not rows:
+            return
+        if pa is None:
+            db.executemany(f"INSERT INTO {table} VALUES ({', '.join('?' * len(columns))})", rows)
+            return
+        staged = pa.table({name: list(values) for name, values in zip(columns, zip(*rows))})
+        db.register("staged_rows", staged)
+        try:
+            db.execute(f"INSERT INTO {table} SELECT * FROM staged_rows")
+        finally:
+            db.unregister("staged_rows")
+
+    def last_stored_at(self) -> float:
+        """
+        Epoch seconds of the newest row, or 0 for an empty store. Rows carry the creation time of their
+        source analysis, so this is the watermark for syncing from the quarter store.
+        """
+        rows = self._query("SELECT epoch_us(MAX(stored_at)) AS newest FROM calls")
+        # Timestamps have microsecond precision; the margin keeps the newest row from being re-synced
+        return (rows[0]["newest"] or 0) / 1e6 + 1e-6 if rows[0]["newest"] else 0.0
+
+    def clear(self):
+        with self._lock:
+            db = self._connection()
+            db.execute("DELETE FROM call_kpis")
+            db.execute("DELETE FROM calls")
+
+    def latest_period(self):
+        rows = self._query(
+            "SELECT fiscal_year, fiscal_quarter FROM calls ORDER BY fiscal_year DESC, fiscal_quarter DESC LIMIT 1"
+        )
+        return (rows[0]["fiscal_year"], rows[0]["fiscal_quarter"]) if rows else None
+
+    def timeseries(self, ticker: str, start: date = None, end: date = None, kpis: list = None) -> dict:
+        """
+        Sentiment per call and KPI values per quarter for one ticker, oldest first, optionally
+        limited to quarters ending between start and end and to the given KPI names.
+        """
+        conditions, params = ["ticker = ?"], [ticker.upper()]
+        if start:
+            conditions.append("period_end >= ?")
+            params.append(start)
+        if end:
+            conditions.append("period_end <= ?")
+            params.append(end)
+        where = " AND ".join(conditions)
+        calls = self._query(
+            "SELECT period, period_end, sentiment_label, sentiment_value, sentiment_net, sentiment_confidence, "
+            f"sentiment_source, kpi_count FROM calls WHERE {where} ORDER BY period_end",
+            params
+        )
+        kpi_params = list(params)
+        if kpis:
+            where += f" AND kpi IN ({','.join('?' * len(kpis))})"
+            kpi_params += kpis
+        series = {}
+        for row in self._query(
+            f"SELECT kpi, period_end, fiscal_year, fiscal_quarter, value, unit FROM call_kpis WHERE {where} "
+            "ORDER BY kpi, period_end",
+            kpi_params
+        ):
+            series.setdefault(row["kpi"], []).append({
+                "period": format_period(row["fiscal_year"], row["fiscal_quarter"]),
+                "period_end": row["period_end"].isoformat(),
+                "value": row["value"],
+                "unit": row["unit"],
+            })
+        for call in calls:
+            call["period_end"] = call["period_end"].isoformat()
+        return {"ticker": ticker.upper(), "calls": calls, "kpis": series}
+
+    def screen(self, year: int, quarter: int, sentiments: list = None, min_confidence: float = None,
+               guidance: str = None, kpi: str = None, kpi_direction: str = None,
+               min_value: float = None, max_value: float = None, limit: int = 100) -> list:
+        """
+        Cross-sectional screen over all calls of one fiscal quarter. Filters combine with AND:
+        sentiment labels, minimum sentiment confidence, guidance lowered / raised / maintained
+        against the previous reported quarter (any *_guidance KPI), and one KPI's direction of
+        change and value bounds. Returns matching calls with their KPI changes.
+        """
+        conditions = ["c.fiscal_year = ?", "c.fiscal_quarter = ?"]
+        params = [year, quarter]
+        if sentiments:
+            conditions.append(f"c.sentiment_label IN ({','.join('?' * len(sentiments))})")
+            params += sentiments
+        if min_confidence is not None:
+            conditions.append("c.sentiment_confidence >= ?")
+            params.append(min_confidence)
+        if guidance:
+            comparison = {"lowered": "<", "raised": ">", "maintained": "="}[guidance]
+            conditions.append(
+                "EXISTS (SELECT 1 FROM kpi_changes g WHERE g.ticker = c.ticker AND g.fiscal_year = c.fiscal_year "
+                "AND g.fiscal_quarter = c.fiscal_quarter AND ends_with(g.kpi, '_guidance') "
+                f"AND g.previous_value IS NOT NULL AND g.value {comparison} g.previous_value)"
+            )
+        if kpi:
+            kpi_conditions = ["k.kpi = ?"]
+            params_kpi = [kpi]
+            if kpi_direction:
+                kpi_conditions.append(f"k.previous_value IS NOT NULL AND k.value {'>' if kpi_direction == 'up' else '<'} k.previous_value")
+            if min_value is not None:
+                kpi_conditions.append("k.value >= ?")
+                params_kpi.append(min_value)
+            if max_value is not None:
+                kpi_conditions.append("k.value <= ?")
+                params_kpi.append(max_value)
+            conditions.append(
+                "EXISTS (SELECT 1 FROM kpi_changes k WHERE k.ticker = c.ticker AND k.fiscal_year = c.fiscal_year "
+                f"AND k.fiscal_quarter = c.fiscal_quarter AND {' AND '.join(kpi_conditions)})"
+            )
+            params += params_kpi
+        matches = self._query(
+            "SELECT c.ticker, c.period, c.period_end, c.sentiment_label, c.sentiment_confidence, c.sentiment_source "
+            f"FROM calls c WHERE {' AND '.join(conditions)} ORDER BY c.ticker LIMIT ?",
+            params + [limit]
+        )
+        if not matches:
+            return []
+
+        tickers = [match["ticker"] for match in matches]
+        changes = {}
+        for row in self._query(
+            "SELECT ticker, kpi, value, previous_value, unit FROM kpi_changes "
+            f"WHERE fiscal_year = ? AND fiscal_quarter = ? AND ticker IN ({','.join('?' * len(tickers))}) ORDER BY kpi",
+            [year, quarter] + tickers
+        ):
+            changes.setdefault(row["ticker"], []).append({
+                "kpi": row["kpi"], "value": row["value"], "previous_value": row["previous_value"], "unit": row["unit"]
+            })
+        for match in matches:
+            match["period_end"] = match["period_end"].isoformat()
+            match["kpis"] = changes.get(match["ticker"], [])
+        return matches
+
+    def stats(self) -> dict:
+        rows = self._query(
+            "SELECT (SELECT COUNT(*) FROM calls) AS calls, (SELECT COUNT(DISTINCT ticker) FROM calls) AS tickers, "
+            "(SELECT COUNT(*) FROM call_kpis) AS kpis"
+        )
+        return rows[0]
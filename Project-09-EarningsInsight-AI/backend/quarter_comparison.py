@@ -0,0 +1,308 @@
+# backend/quarter_comparison.py
+
+import json
+import os
+import re
+import sqlite3
+import time
+from contextlib import contextmanager
+from backend.kpi_extractor import format_value
+
+# "Q4 2024", "Q4-2024", "q4_fy2024", "2024 Q4", "2024-Q4", "2024Q4"
+PERIOD_PATTERNS = [
+    re.compile(r"^\s*Q(?P<quarter>[1-4])[\s_\-']*(?:FY)?\s*(?P<year>(?:19|20)\d{2})\s*$", re.IGNORECASE),
+    re.compile(r"^\s*(?:FY)?\s*(?P<year>(?:19|20)\d{2})[\s_\-]*Q(?P<quarter>[1-4])\s*$", re.IGNORECASE),
+]
+
+INSIGHT_CATEGORIES = ["Revenue & Growth Forecasts", "Risk Warnings & Challenges", "Strategic Investments"]
+RISK_CATEGORY = "Risk Warnings & Challenges"
+
+SENTIMENT_VALUES = {"Positive": 1.0, "Neutral": 0.0, "Negative": -1.0}
+# Between two quarters with the same label, a lexicon net-score move larger than this still counts as a shift
+NET_SHIFT_THRESHOLD = 0.1
+
+# Risk themes recognised in the "Risk Warnings & Challenges" bullets, so "chip shortages" one quarter
+# and "supply constraints" the next count as the same theme
+RISK_THEMES = [
+    ("supply_chain", r"supply|shortage|logistic|component|inventor|supplier|chip|semiconductor"),
+    ("demand", r"demand|\borders?\b|backlog|consumer spending|slowdown|softness"),
+    ("pricing_and_margins", r"pric|margin|discount|promotion"),
+    ("costs_and_inflation", r"cost|inflation|wage|raw material|commodit|expense"),
+    ("competition", r"compet|rival|market share|new entrant"),
+    ("macroeconomic", r"macro|econom|recession|interest rate|rates|credit|financing"),
+    ("currency", r"currency|foreign exchange|\bfx\b|exchange rate|dollar"),
+    ("regulation_and_legal", r"regulat|legal|litigation|lawsuit|investigation|compliance|government|policy|recall"),
+    ("trade_and_geopolitics", r"tariff|\btrade\b|geopolit|\bwars?\b|sanction|china|export"),
+    ("execution_and_operations", r"execution|ramp|production|capacity|delay|launch|operational|quality"),
+    ("technology_and_security", r"cyber|security|outage|technology risk|\bai\b|autonomous|software"),
+    ("labor", r"labor|labour|workforce|staff|union|hiring|talent"),
+    ("liquidity_and_debt", r"liquidity|debt|leverage|cash burn|refinanc|covenant"),
+]
+RISK_THEME_PATTERNS = [(name, re.compile(pattern, re.IGNORECASE)) for name, pattern in RISK_THEMES]
+
+# KPI changes smaller than this (relative change, or percentage points for % metrics) are reported as "flat"
+FLAT_CHANGE_THRESHOLD = 0.005
+
+COMPARISON_PROMPT = (
+    "You are given a computed comparison of {ticker}'s earnings calls for {periods}. "
+    "Write a short narrative (three to five sentences) for an investor describing what changed: "
+    "the sentiment shift, the most significant KPI moves, and new or dropped risk themes. "
+    "Use only the facts below and do not invent figures. "
+    "Comparison:\n\n---\n{facts}\n---"
+)
+
+def parse_period(value: str):
+    """
+    Parses a fiscal quarter label into (year, quarter), or returns None if it is not recognised.
+    """
+    for pattern in PERIOD_PATTERNS:
+        match = pattern.match(value or "")
+        if match:
+            return int(match.group("year")), int(match.group("quarter"))
+    return None
+
+def format_period(year: int, quarter: int) -> str:
+    return f"Q{quarter} {year}"
+
+def sentiment_label(sentiment: str) -> str:
+    """
+    Label from the "Label: justification" sentiment text, or "Unknown".
+    """
+    label = (sentiment or "").split(":", 1)[0].strip().strip("*").capitalize()
+    return label if label in SENTIMENT_VALUES else "Unknown"
+
+def parse_insight_sections(insights: str) -> dict:
+    """
+    Splits the insights markdown into {category: [bullet text]}; "N/A" entries are dropped.
+    Accepts "**Category**", "### Category", and "Category:" headings.
+    """
+    by_lower = {category.lower(): category for category in INSIGHT_CATEGORIES}
+    sections, current = {category: [] for category in INSIGHT_CATEGORIES}, None
+    for line in (insights or "").splitlines():
+        stripped = line.strip()
+        heading = re.sub(r"^[#*\s]+|[*:\s]+$", "", stripped).lower()
+        if heading in by_lower:
+            current = by_lower[heading]
+            continue
+        item = re.sub(r"^(?:[-*•]|\d+[.)])\s*", "", stripped).replace("**", "").strip()
+        if current and item and item.upper() not in ("N/A", "NA", "NONE"):
+            sections[current].append(item)
+    return sections
+
+def risk_themes(analysis: dict) -> dict:
+    """
+    {theme: [risk bullets mentioning it]} for the risk bullets of one stored analysis.
+    """
+    themes = {}
+    for item in parse_insight_sections(analysis.get("insights", ""))[RISK_CATEGORY]:
+        for name, pattern in RISK_THEME_PATTERNS:
+            if pattern.search(item):
+                themes.setdefault(name, []).append(item)
+    return themes
+
+def headline_kpis(records: list) -> dict:
+    """
+    One headline value per KPI from extracted KPI records, first mention wins:
+    levels ("revenue", "eps", "gross_margin"), growth rates stated with a YoY/QoQ
+    comparison ("revenue_growth_yoy", negative when the figure is a decline), and guidance
+    ranges ("revenue_guidance", midpoint). Returns {kpi: {"value", "unit", "text"}}.
+    """
+    headlines = {}
+    for record in records:
+        if not record.get("metric") or record.get("value") is None:
+            continue
+        if record["kind"] == "guidance":
+            key = f"{record['metric']}_guidance"
+        elif record["forward_looking"]:
+            continue
+        elif record["kind"] == "percentage" and record["comparison"]:
+            key = f"{record['metric']}_growth_{record['comparison'].lower()}"
+        elif record["kind"] in ("amount", "eps", "margin", "count"):
+            key = record["metric"]
+        else:
+            continue
+        value = -record["value"] if key.startswith(f"{record['metric']}_growth") and record["direction"] == "down" else record["value"]
+        headlines.setdefault(key, {"value": value, "unit": record["unit"], "text": record["text"]})
+    return headlines
+
+def compare_quarters(ticker: str, quarters: list) -> dict:
+    """
+    Deterministic comparison of stored analyses, oldest first ([{"period", "analysis"}]):
+    sentiment per quarter and its shifts, KPI deltas between the two most recent quarters that
+    report each KPI, and risk themes that are new, dropped, or persistent in the latest quarter.
+    """
+    periods = [quarter["period"] for quarter in quarters]
+
+    sentiment = []
+    for quarter in quarters:
+        analysis = quarter["analysis"]
+        label = sentiment_label(analysis.get("sentiment"))
+        sentiment.append({
+            "period": quarter["period"],
+            "label": label,
+            "value": SENTIMENT_VALUES.get(label),
+            # Lexicon net score in [-1, 1]; stored whenever the lexicon scored the call
+            "net": (analysis.get("sentiment_score") or {}).get("net"),
+            "source": analysis.get("sentiment_source"),
+        })
+    shifts = []
+    for previous, current in zip(sentiment, sentiment[1:]):
+        if previous["value"] is None or current["value"] is None:
+            direction = "unknown"
+        else:
+            change = current["value"] - previous["value"]
+            if change == 0 and previous["net"] is not None and current["net"] is not None \
+                    and abs(current["net"] - previous["net"]) > NET_SHIFT_THRESHOLD:
+                change = current["net"] - previous["net"]
+            direction = "improved" if change > 0 else "deteriorated" if change < 0 else "unchanged"
+        shifts.append({"from": previous["period"], "to": current["period"],
+                       "change": f"{previous['label']} -> {current['label']}", "direction": direction})
+
+    headlines = [headline_kpis(quarter["analysis"].get("kpis", [])) for quarter in quarters]
+    ranked = [] # (magnitude, delta): relative change, or percentage points / 100 for "%" KPIs
+    for key, latest in headlines[-1].items():
+        series = {period: values[key]["value"] for period, values in zip(periods, headlines)
+                  if key in values and values[key]["unit"] == latest["unit"]}
+        if len(series) < 2:
+            continue
+        reported = list(series)
+        previous_value = series[reported[-2]]
+        change = latest["value"] - previous_value
+        if latest["unit"] == "%":
+            relative, change_pct = change / 100, None # Percentage-point change
+        else:
+            relative = change / abs(previous_value) if previous_value else None
+            change_pct = round(relative * 100, 2) if relative is not None else None
+        ranked.append((abs(relative) if relative is not None else 0, {
+            "kpi": key,
+            "unit": latest["unit"],
+            "series": series,
+            "previous_period": reported[-2],
+            "change": round(change, 4),
+            "change_pct": change_pct,
+            "direction": (
+                "flat" if relative is not None and abs(relative) < FLAT_CHANGE_THRESHOLD
+                else "up" if change > 0 else "down" if change < 0 else "flat"
+            ),
+        }))
+    # Largest moves first, so margin and growth-rate moves compete with amounts for render_comparison's max_kpis
+    ranked.sort(key=lambda item: item[0], reverse=True)
+    kpi_deltas = [delta for _, delta in ranked]
+
+    themes = [risk_themes(quarter["analysis"]) for quarter in quarters]
+    latest_themes, earlier_themes = set(themes[-1]), set().union(*themes[:-1])
+    previous_themes = set(themes[-2])
+    risks = {
+        "by_quarter": {period: sorted(quarter_themes) for period, quarter_themes in zip(periods, themes)},
+        # New: not mentioned in any earlier quarter; dropped: mentioned last quarter but not now
+        "new": {theme: themes[-1][theme] for theme in sorted(latest_themes - earlier_themes)},
+        "dropped": sorted(previous_themes - latest_themes),
+        "persistent": sorted(latest_themes & previous_themes),
+    }
+
+    return {
+        "ticker": ticker,
+        "periods": periods,
+        "sentiment": {"by_quarter": sentiment, "shifts": shifts},
+        "kpi_deltas": kpi_deltas,
+        "risk_themes": risks,
+    }
+
+def render_comparison(comparison: dict, max_kpis: int = 8) -> str:
+    """
+    Compact plain-text rendering of a comparison for the narrative prompt.
+    """
+    lines = ["Sentiment: " + ", ".join(f"{entry['period']} {entry['label']}" for entry in comparison["sentiment"]["by_quarter"])]
+    for delta in comparison["kpi_deltas"][:max_kpis]:
+        if delta["unit"] == "%":
+            change = f"{delta['change']:+g} percentage points"
+        elif delta["change_pct"] is not None:
+            change = f"{delta['change_pct']:+g}%"
+        else:
+            change = f"{delta['change']:+g} {delta['unit']}"
+        values = ", ".join(f"{period} {format_value(value, delta['unit'])}" for period, value in delta["series"].items())
+        lines.append(f"KPI {delta['kpi']} ({delta['unit']}): {values}; change vs {delta['previous_period']}: {change}")
+    risks = comparison["risk_themes"]
+    for theme, items in risks["new"].items():
+        lines.append(f"New risk theme {theme}: {'; '.join(items[:2])}")
+    if risks["dropped"]:
+        lines.append(f"Risk themes no longer mentioned: {', '.join(risks['dropped'])}")
+    if risks["persistent"]:
+        lines.append(f"Persistent risk themes: {', '.join(risks['persistent'])}")
+    return "\n".join(lines)
+
+class QuarterStore:
+    """
+    SQLite store of per-call analyses keyed by (ticker, fiscal year, fiscal quarter).
+    Re-analyzing a quarter replaces its stored analysis.
+    """
+
+    def __init__(self, db_path: str):
+        self.db_path = db_path
+        os.makedirs(os.path.dirname(db_path) or ".", exist_ok=True)
+        with self._connect() as db:
+            db.execute("PRAGMA journal_mode=WAL")
+            db.execute(
+                "CREATE TABLE IF NOT EXISTS call_analyses ("
+                "ticker TEXT NOT NULL, fiscal_year INTEGER NOT NULL, fiscal_quarter INTEGER NOT NULL, "
+                "created_at REAL NOT NULL, analysis TEXT NOT NULL, "
+                "PRIMARY KEY (ticker, fiscal_year, fiscal_quarter))"
+            )
+            db.execute("CREATE INDEX IF NOT EXISTS idx_call_analyses_created_at ON call_analyses(created_at)")
+
+    @contextmanager
+    def _connect(self):
+        db = sqlite3.connect(self.db_path, timeout=30)
+        try:
+            with db:
+                yield db
+        finally:
+            db.close()
+
+    def save_analysis(self, ticker: str, year: int, quarter: int, analysis: dict):
+        with self._connect() as db:
+            db.execute(
+                "INSERT OR REPLACE INTO call_analyses (ticker, fiscal_year, fiscal_quarter, created_at, analysis) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (ticker.upper(), year, quarter, time.time(), json.dumps(analysis))
+            )
+
+    def list_quarters(self, ticker: str) -> list:
+        """
+        Returns [{"period", "year", "quarter", "created_at"}] for a ticker, oldest first.
+        """
+        with self._connect() as db:
+            rows = db.execute(
+                "SELECT fiscal_year, fiscal_quarter, created_at FROM call_analyses "
+                "WHERE ticker = ? ORDER BY fiscal_year, fiscal_quarter",
+                (ticker.upper(),)
+            ).fetchall()
+        return [{"period": format_period(row[0], row[1]), "year": row[0], "quarter": row[1], "created_at": row[2]} for row in rows]
+
+    def recent_quarters(self, ticker: str, count: int, end: tuple = None) -> list:
+        """
+        Returns up to count stored analyses ([{"period", "analysis"}]) ending at end = (year, quarter),
+        or at the latest stored quarter, oldest first.
+        """
+        end_year, end_quarter = end or (9999, 4)
+        with self._connect() as db:
+            rows = db.execute(
+                "SELECT fiscal_year, fiscal_quarter, analysis FROM call_analyses "
+                "WHERE ticker = ? AND (fiscal_year < ? OR (fiscal_year = ? AND fiscal_quarter <= ?)) "
+                "ORDER BY fiscal_year DESC, fiscal_quarter DESC LIMIT ?",
+                (ticker.upper(), end_year, end_year, end_quarter, count)
+            ).fetchall()
+        return [{"period": format_period(row[0], row[1]), "analysis": json.loads(row[2])} for row in reversed(rows)]
+
+    def analyses_since(self, timestamp: float) -> list:
+        """
+        Returns [{"ticker", "year", "quarter", "created_at", "analysis"}] stored after timestamp, oldest first.
+        """
+        with self._connect() as db:
+            rows = db.execute(
+                "SELECT ticker, fiscal_year, fiscal_quarter, created_at, analysis FROM call_analyses "
+                "WHERE created_at > ? ORDER BY created_at",
+                (timestamp,)
+            ).fetchall()
+        return [{"ticker": row[0], "year": row[1], "quarter": row[2], "created_at": row[3], "analysis": json.loads(row[4])}
+                for row in rows]
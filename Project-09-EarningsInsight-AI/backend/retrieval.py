@@ -0,0 +1,163 @@
+# backend/retrieval.py
+
+import hashlib
+import os
+import sqlite3
+import time
+from contextlib import contextmanager
+
+import numpy as np
+from backend.kpi_extractor import split_sentences
+from backend.llm_cache import normalize_text
+
+# What each insight category is about, embedded once per model and used as the retrieval query
+CATEGORY_QUERIES = {
+    "Revenue & Growth Forecasts": (
+        "Revenue, sales, and deliveries growth; financial guidance, outlook, and forecasts for next quarter "
+        "and the full year; expected demand, volume, and margin trends."
+    ),
+    "Risk Warnings & Challenges": (
+        "Risks, headwinds, and challenges: supply chain constraints, costs and inflation, pricing pressure, "
+        "competition, regulation, interest rates, weaker demand, delays, and uncertainty."
+    ),
+    "Strategic Investments": (
+        "Strategic investments and capital allocation: capital expenditures, new factories and capacity, "
+        "research and development, AI and technology, new products, acquisitions, and partnerships."
+    ),
+}
+
+CATEGORY_INSIGHTS_PROMPT = (
+    "Extract key financial signals and actionable insights about '{category}' from the following excerpts "
+    "of an earnings call transcript. The excerpts were selected for this category and may be out of order. "
+    "Present the insights as a bulleted list, one signal per bullet, with figures where given. "
+    "If the excerpts say nothing about this category, respond with only 'N/A'. "
+    "Excerpts:\n\n---\n{text}\n---"
+)
+
+def chunk_transcript(text: str, chunk_chars: int, overlap_sentences: int = 1) -> list:
+    """
+    Packs whole sentences into chunks of about chunk_chars characters, repeating the last
+    overlap_sentences sentences at the start of the next chunk.
+    Returns [{"index", "start", "end", "text"}] with character offsets into text.
+    """
+    sentences = split_sentences(text)
+    chunks, current = [], []
+
+    def close():
+        chunks.append({
+            "index": len(chunks),
+            "start": current[0]["start"],
+            "end": current[-1]["end"],
+            "text": " ".join(sentence["text"] for sentence in current),
+        })
+
+    for sentence in sentences:
+        if current and sum(len(s["text"]) + 1 for s in current) + len(sentence["text"]) > chunk_chars:
+            close()
+            current = current[-overlap_sentences:] if overlap_sentences and len(current) > overlap_sentences else []
+        current.append(sentence)
+    if current:
+        close()
+    return chunks
+
+def embedding_key(text: str, model: str) -> str:
+    """
+    Content hash identifying one embedding: the model plus the normalized chunk text.
+    """
+    return hashlib.sha256(f"{model}\x00{normalize_text(text)}".encode("utf-8")).hexdigest()
+
+class EmbeddingCache:
+    """
+    SQLite store of embedding vectors (float32) keyed by embedding_key, so re-analyzing a transcript,
+    or one that shares passages with an earlier one, does not re-embed the same text.
+    """
+
+    def __init__(self, db_path: str):
+        self.db_path = db_path
+        os.makedirs(os.path.dirname(db_path) or ".", exist_ok=True)
+        with self._connect() as db:
+            db.execute("PRAGMA journal_mode=WAL")
+            db.execute(
+                "CREATE TABLE IF NOT EXISTS embeddings ("
+                "key TEXT PRIMARY KEY, dim INTEGER NOT NULL, vector BLOB NOT NULL, created_at REAL NOT NULL)"
+            )
+
+    @contextmanager
+    def _connect(self):
+        db = sqlite3.connect(self.db_path, timeout=30)
+        try:
+            with db:
+                yield db
+        finally:
+            db.close()
+
+    def get_many(self, keys: list) -> dict:
+        """
+        Returns {key: vector} for the keys that are stored.
+        """
+        unique, found = list(set(keys)), {}
+        with self._connect() as db:
+            # Query in batches to stay under SQLite's bound-parameter limit
+            for start in range(0, len(unique), 500):
+                batch = unique[start:start + 500]
+                rows = db.execute(
+                    f"SELECT key, vector FROM embeddings WHERE key IN ({','.join('?' * len(batch))})", batch
+                ).fetchall()
+                for key, blob in rows:
+                    found[key] = np.frombuffer(blob, dtype=np.float32)
+        return found
+
+    def set_many(self, vectors: dict):
+        now = time.time()
+        with self._connect() as db:
+            db.executemany(
+                "INSERT OR REPLACE INTO embeddings (key, dim, vector, created_at) VALUES (?, ?, ?, ?)",
+                [(key, len(vector), np.asarray(vector, dtype=np.float32).tobytes(), now) for key, vector in vectors.items()]
+            )
+
+    def stats(self) -> dict:
+        with self._connect() as db:
+            count, size = db.execute("SELECT COUNT(*), COALESCE(SUM(LENGTH(vector)), 0) FROM embeddings").fetchone()
+        return {"embeddings": count, "bytes": size}
+
+class VectorIndex:
+    """
+    In-memory cosine-similarity index over one transcript's chunk embeddings.
+    Rows are L2-normalized once, so a search is a single matrix-vector product.
+    """
+
+    def __init__(self, vectors):
+        matrix = np.asarray(vectors, dtype=np.float32)
+        norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+        self.matrix = matrix / np.where(norms == 0, 1, norms)
+
+    def search(self, query, k: int) -> list:
+        """
+        Returns [(row, score)] for the k most similar rows, best first.
+        """
+        query = np.asarray(query, dtype=np.float32)
+        query = query / (np.linalg.norm(query) or 1)
+        scores = self.matrix @ query
+        k = min(k, len(scores))
+        if k == 0:
+            return []
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        return [(int(row), float(scores[row])) for row in top]
+
+def format_excerpts(chunks: list, rows: list) -> str:
+    """
+    Joins retrieved chunks in transcript order (retrieval order is by score) so the LLM reads them
+    as the call unfolded.
+    """
+    return "\n[...]\n".join(chunks[row]["text"] for row in sorted(rows))
+
+def render_category_insights(outputs: dict) -> str:
+    """
+    Combines per-category LLM outputs into the bulleted markdown the frontend displays.
+    """
+    blocks = []
+    for category in CATEGORY_QUERIES:
+        body = (outputs.get(category) or "").strip() or "N/A"
+        blocks.append(f"**{category}**\n{body}")
+    return "\n\n".join(blocks)
@@ -0,0 +1,132 @@
+# backend/sentiment_lexicon.py
+
+import re
+import numpy as np
+
+# Finance-oriented word lists in the spirit of the Loughran-McDonald dictionary.
+# General-purpose sentiment lexicons misread earnings language ("liability", "tax", "cost" are neutral here).
+POSITIVE_WORDS = """
+accelerate accelerated accelerating achieve achieved achievement achieving advance advanced advances
+advantage advantageous ample attractive beat beats beneficial benefit benefited benefits best better
+boost boosted breakthrough confident confidence delighted efficiency efficient encouraged encouraging
+enhance enhanced excellent exceed exceeded exceeding exceeds exceptional expand expanded expanding
+expansion favorable gain gained gains grew grow growing growth healthy improve improved improvement
+improvements improving increase increased increasing innovation innovative leadership momentum opportunities
+opportunity optimistic outperform outperformed pleased positive profitable profitability progress
+rebound record recovered recovery resilient robust solid strength strengthen strengthened strong
+stronger strongest succeed success successful surpass surpassed tailwind tailwinds upside
+""".split()
+
+NEGATIVE_WORDS = """
+adverse adversely challenge challenged challenges challenging concern concerned concerns constrained
+constraint constraints contraction decline declined declines declining decrease decreased decreasing
+deficit delay delayed delays deteriorate deteriorated deteriorating deterioration difficult difficulties
+difficulty disappointed disappointing disruption disruptions downturn drag fell headwind headwinds
+impairment impairments inflationary lawsuit litigation lose losing loss losses lower lowered miss
+missed negative negatively pressure pressures recall recession restructuring risk risks setback shortfall
+shortage shortages slowdown slower slowing soft softer softness struggle struggled unfavorable weak
+weaken weakened weaker weakness worse worsened writedown
+""".split()
+
+UNCERTAINTY_WORDS = """
+anticipate anticipated appear appears approximately assume assumption assumptions believe could depend
+depends dependent fluctuate fluctuation fluctuations may maybe might possible possibly predict
+preliminary probable roughly seem seems somewhat suggest tentative uncertain uncertainties uncertainty
+unclear unknown unpredictable variability volatile volatility
+""".split()
+
+# A negator up to NEGATION_WINDOW tokens before a sentiment word flips its polarity ("not strong", "no growth")
+NEGATORS = ["not", "no", "never", "neither", "nor", "without", "don't", "didn't", "isn't", "wasn't", "aren't", "won't", "cannot"]
+NEGATION_WINDOW = 3
+
+# Net scores within +/- NEUTRAL_BAND are labelled Neutral
+NEUTRAL_BAND = 0.2
+# Evidence saturates confidence: with EVIDENCE_SCALE sentiment hits the evidence factor reaches ~63%
+EVIDENCE_SCALE = 8.0
+
+TOKEN_PATTERN = re.compile(r"[a-z]+(?:'[a-z]+)?")
+
+class LexiconSentimentScorer:
+    """
+    Scores text against the finance word lists with vectorized NumPy counts.
+    """
+
+    def __init__(self, positive=POSITIVE_WORDS, negative=NEGATIVE_WORDS, uncertainty=UNCERTAINTY_WORDS,
+                 negators=NEGATORS):
+        vocabulary = sorted(set(positive) | set(negative) | set(uncertainty) | set(negators))
+        self.index = {word: i for i, word in enumerate(vocabulary)}
+        self.words = np.array(vocabulary + [""])
+        size = len(vocabulary) + 1 # Last slot stands for every out-of-vocabulary token
+        self.polarity = np.zeros(size, dtype=np.int8)
+        self.polarity[[self.index[w] for w in positive]] = 1
+        self.polarity[[self.index[w] for w in negative]] = -1
+        self.is_uncertain = np.zeros(size, dtype=bool)
+        self.is_uncertain[[self.index[w] for w in uncertainty]] = True
+        self.is_negator = np.zeros(size, dtype=bool)
+        self.is_negator[[self.index[w] for w in negators]] = True
+        self.unknown = size - 1
+
+    def score(self, text: str) -> dict:
+        """
+        Returns {"label", "confidence", "net", "positive", "negative", "uncertainty", "tokens", "top_terms"}.
+        """
+        tokens = TOKEN_PATTERN.findall(text.lower())
+        ids = np.fromiter((self.index.get(token, self.unknown) for token in tokens), dtype=np.int32, count=len(tokens))
+
+        token_polarity = self.polarity[ids]
+        negator = self.is_negator[ids]
+        negated = np.zeros(len(ids), dtype=bool)
+        for distance in range(1, NEGATION_WINDOW + 1):
+            negated[distance:] |= negator[:-distance]
+        signed = np.where(negated, -token_polarity, token_polarity)
+
+        positive = int(np.count_nonzero(signed > 0))
+        negative = int(np.count_nonzero(signed < 0))
+        uncertainty = int(np.count_nonzero(self.is_uncertain[ids]))
+        evidence = positive + negative
+        net = (positive - negative) / evidence if evidence else 0.0
+
+        if net > NEUTRAL_BAND:
+            label = "Positive"
+        elif net < -NEUTRAL_BAND:
+            label = "Negative"
+        else:
+            label = "Neutral"
+
+        # Confidence = how much evidence there is x how clearly the net score sits inside its label's range,
+        # discounted by the share of hedging language
+        strength = 1.0 - np.exp(-evidence / EVIDENCE_SCALE)
+        if label == "Neutral":
+            clarity = 1.0 - abs(net) / NEUTRAL_BAND
+        else:
+            clarity = min(1.0, (abs(net) - NEUTRAL_BAND) / (1.0 - NEUTRAL_BAND))
+        hedging = uncertainty / (evidence + uncertainty) if evidence + uncertainty else 0.0
+        confidence = float(strength * (0.5 + 0.5 * clarity) * (1.0 - 0.5 * hedging))
+
+        # Negated words ("not strong") would make a confusing justification, so only plain hits are listed
+        supporting = (token_polarity < 0) if label == "Negative" else (token_polarity > 0)
+        return {
+            "label": label,
+            "confidence": round(confidence, 3),
+            "net": round(net, 3),
+            "positive": positive,
+            "negative": negative,
+            "uncertainty": uncertainty,
+            "tokens": len(tokens),
+            "top_terms": self._top_terms(ids[supporting & ~negated]),
+        }
+
+    def _top_terms(self, ids, limit: int = 3) -> list:
+        counts = np.bincount(ids, minlength=len(self.words))
+        top = np.argsort(counts)[::-1][:limit]
+        return [str(self.words[i]) for i in top if counts[i] > 0]
+
+def format_sentiment(score: dict) -> str:
+    """
+    Renders a lexicon score in the "Label: one-sentence justification" layout the frontend parses.
+    """
+    terms = ", ".join(f"'{term}'" for term in score["top_terms"]) or "no strongly weighted terms"
+    return (
+        f"{score['label']}: The transcript uses {score['positive']} positive versus {score['negative']} negative "
+        f"financial terms (most frequent: {terms}), with {score['uncertainty']} hedging terms."
+    )
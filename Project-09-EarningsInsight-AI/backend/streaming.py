@@ -0,0 +1,128 @@
+# backend/streaming.py
+
+import asyncio
+import json
+import time
+import httpx
+
+def format_sse(event: str, data: dict) -> str:
+    """
+    Formats one Server-Sent Event.
+    """
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+async def _stream_section(client, semaphore, queue, section, prompt, base_url, model, cache, cache_key):
+    """
+    Streams one prompt from Ollama, pushing tagged SSE events onto queue.
+    Returns this section's timing information. Errors are reported as events, not raised,
+    so one failing section does not cut off the others.
+    """
+    async with semaphore:
+        started = time.perf_counter()
+        await queue.put(format_sse("section_start", {"section": section}))
+
+        cached = cache.get(cache_key) if cache is not None else None
+        if cached is not None:
+            await queue.put(format_sse("token", {"section": section, "token": cached}))
+            await queue.put(format_sse("section_end", {"section": section, "text": cached, "cached": True}))
+            elapsed = round(time.perf_counter() - started, 3)
+            return {"cached": True, "time_to_first_token_seconds": elapsed, "duration_seconds": elapsed}
+
+        parts, first_token_at, ollama_stats = [], None, {}
+        try:
+            async with client.stream(
+                "POST",
+                f"{base_url}/api/generate",
+                json={"model": model, "prompt": prompt, "stream": True}
+            ) as response:
+                response.raise_for_status()
+                async for line in response.aiter_lines():
+                    if not line.strip():
+                        continue
+                    chunk = json.loads(line)
+                    if chunk.get("error"):
+                        raise ValueError(f"Ollama error: {chunk['error']}")
+                    token = chunk.get("response", "")
+                    if token:
+                        if first_token_at is None:
+                            first_token_at = time.perf_counter()
+                        parts.append(token)
+                        await queue.put(format_sse("token", {"section": section, "token": token}))
+                    if chunk.get("done"):
+                        ollama_stats = {
+                            key: chunk.get(key)
+                            for key in ("prompt_eval_count", "eval_count", "total_duration", "eval_duration")
+                        }
+        except httpx.ConnectError:
+            detail = f"Could not connect to Ollama server at {base_url}. Please ensure Ollama is running and the model '{model}' is pulled."
+        except httpx.TimeoutException:
+            detail = "Ollama server timed out. The LLM might be taking too long to respond."
+        except Exception as e:
+            detail = f"An error occurred while streaming from the Ollama LLM: {e}"
+        else:
+            detail = None
+
+        timing = {
+            "cached": False,
+            "time_to_first_token_seconds": round(first_token_at - started, 3) if first_token_at else None,
+            "duration_seconds": round(time.perf_counter() - started, 3),
+            **ollama_stats
+        }
+        if detail:
+            await queue.put(format_sse("error", {"section": section, "detail": detail}))
+            return {**timing, "error": detail}
+
+        text = "".join(parts).strip()
+        if cache is not None:
+            cache.set(cache_key, text)
+        await queue.put(format_sse("section_end", {"section": section, "text": text, "cached": False}))
+        return timing
+
+async def stream_sections(prompts: dict, base_url: str, model: str, timeout: float, max_concurrency: int,
+                          cache=None, cache_key_fn=None):
+    """
+    Async generator of Server-Sent Events for several prompts generated concurrently.
+
+    Events: section_start, token ({"section", "token"}), section_end (full text),
+    error (per section), and a final done event with per-section and total timings.
+    cache_key_fn(prompt) builds the LLM cache key when a cache is given.
+    """
+    queue = asyncio.Queue()
+    semaphore = asyncio.Semaphore(max_concurrency)
+    started = time.perf_counter()
+
+    async with httpx.AsyncClient(timeout=timeout) as client:
+        tasks = {
+            section: asyncio.create_task(_stream_section(
+                client, semaphore, queue, section, prompt, base_url, model,
+                cache, cache_key_fn(prompt) if cache is not None else None
+            ))
+            for section, prompt in prompts.items()
+        }
+
+        async def close_queue_when_done():
+            await asyncio.gather(*tasks.values())
+            await queue.put(None)
+
+        closer = asyncio.create_task(close_queue_when_done())
+        try:
+            while True:
+                event = await queue.get()
+                if event is None:
+                    break
+                yield event
+            await closer
+        finally:
+            # Client disconnected (or generator closed early): stop generating
+            if not closer.done():
+                closer.cancel()
+                for task in tasks.values():
+                    task.cancel()
+
+    timings = {section: task.result() for section, task in tasks.items()}
+    first_tokens = [t["time_to_first_token_seconds"] for t in timings.values() if t.get("time_to_first_token_seconds") is not None]
+    yield format_sse("done", {
+        "total_seconds": round(time.perf_counter() - started, 3),
+        "time_to_first_token_seconds": min(first_tokens) if first_tokens else None,
+        "sections": timings
+    })
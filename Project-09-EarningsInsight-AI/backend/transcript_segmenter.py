@@ -0,0 +1,315 @@
+# backend/transcript_segmenter.py
+
+import json
+import re
+
+from backend.kpi_extractor import METRIC_PATTERN, split_sentences
+
+INSIGHT_CATEGORIES = ["Revenue & Growth Forecasts", "Risk Warnings & Challenges", "Strategic Investments"]
+SENTIMENT_LABELS = ["Positive", "Neutral", "Negative"]
+
+# Speaker turns: "[CEO]: ...", "[Analyst 1]: ...", or "Jane Doe -- Chief Financial Officer" / "Operator:" headers
+BRACKET_SPEAKER_PATTERN = re.compile(r"^\s*\[(?P<speaker>[^\]\n]{1,60})\]\s*:?\s*", re.MULTILINE)
+NAMED_SPEAKER_PATTERN = re.compile(
+    r"^\s*(?P<speaker>(?P<name>Operator|[A-Z][\w.'-]*(?:\s+[A-Z][\w.'-]*){0,3})"
+    r"(?:\s*(?:--|–|—|-)\s*(?P<title>[^:\n]{2,80}))?)\s*:\s+",
+    re.MULTILINE
+)
+# Speaker labels accepted without a "-- Title"; any other bare "Name:" must appear with a title elsewhere,
+# so "Revenue: $5 billion" or "Gross Margin: 22%" lines are not taken for speakers
+KNOWN_SPEAKER_LABELS = {"operator", "moderator", "host", "unidentified analyst", "unidentified participant",
+                        "unidentified speaker", "unidentified company representative"}
+# Bracket-tagged transcripts often keep untagged "Operator:" lines
+OPERATOR_LINE_PATTERN = re.compile(r"^\s*(?P<speaker>Operator)\s*:\s*", re.MULTILINE | re.IGNORECASE)
+
+ROLE_PATTERNS = [
+    ("operator", re.compile(r"\boperator\b", re.IGNORECASE)),
+    ("analyst", re.compile(r"\banalyst\b|\bresearch\b|\bsecurities\b|\bcapital markets\b", re.IGNORECASE)),
+    ("ceo", re.compile(r"\bceo\b|chief executive", re.IGNORECASE)),
+    ("cfo", re.compile(r"\bcfo\b|chief financial", re.IGNORECASE)),
+    ("executive", re.compile(r"\bc[a-z]o\b|chief|president|officer|head of|investor relations|\bir\b|director", re.IGNORECASE)),
+]
+
+# The Q&A section starts at the first analyst turn, or at an operator line announcing it
+QA_START_PATTERN = re.compile(r"question[- ]and[- ]answer|\bq\s?&\s?a\b|first question|open (?:up )?the (?:line|floor)", re.IGNORECASE)
+
+SEGMENT_PROMPT = (
+    "The following is one segment ({section}) of an earnings call transcript, spoken by {speakers}. "
+    "Analyze only this segment and respond with a single JSON object containing these keys:\n"
+    "- \"summary\": one or two sentences on the key financial performance, strategic updates, or outlook in this segment\n"
+    "- \"sentiment\": exactly one of \"Positive\", \"Neutral\", or \"Negative\", regarding the company's future outlook\n"
+    "- \"sentiment_reason\": one sentence justifying the sentiment\n"
+    "- \"insights\": an object with exactly the keys "
+    + ", ".join(f'"{category}"' for category in INSIGHT_CATEGORIES)
+    + ", each holding a list of short strings (use an empty list if the segment says nothing about it)\n"
+    "Respond with JSON only, no commentary. "
+    "Segment:\n\n---\n{text}\n---"
+)
+
+REDUCE_SUMMARY_PROMPT = (
+    "The following are summaries of consecutive segments of one earnings call, in order "
+    "(prepared remarks first, then the Q&A). Combine them into one concise paragraph highlighting "
+    "key financial performance, strategic updates, and future outlook. "
+    "Focus on the most important information for an investor. "
+    "Segment summaries:\n\n---\n{text}\n---"
+)
+
+def classify_role(speaker: str) -> str:
+    """
+    Maps a speaker label ("CFO", "Analyst 2", "Jane Doe -- Chief Financial Officer") to a role.
+    """
+    for role, pattern in ROLE_PATTERNS:
+        if pattern.search(speaker):
+            return role
+    return "other"
+
+def _named_speaker_markers(text: str) -> list:
+    """
+    "Name -- Title:" speaker headers, plus bare "Name:" headers for known labels (Operator) and for
+    names that appear with a title elsewhere in the transcript. Labels made only of KPI metric words
+    ("Revenue", "Gross Margin") are never speakers.
+    """
+    candidates = [
+        marker for marker in NAMED_SPEAKER_PATTERN.finditer(text)
+        if METRIC_PATTERN.sub("", marker.group("name")).strip()
+    ]
+    titled = {" ".join(marker.group("name").split()).lower() for marker in candidates if marker.group("title")}
+    return [
+        marker for marker in candidates
+        if marker.group("title") or " ".join(marker.group("name").split()).lower() in KNOWN_SPEAKER_LABELS | titled
+    ]
+
+def parse_turns(text: str) -> list:
+    """
+    Splits a transcript into speaker turns tagged with role and section
+    ("prepared_remarks" or "qa"). Returns [{"speaker", "role", "section", "start", "end", "text_start", "text"}]
+    where text_start is the offset of the turn's text in the transcript.
+    A transcript without speaker tags comes back as a single turn.
+    """
+    markers = list(BRACKET_SPEAKER_PATTERN.finditer(text))
+    if markers:
+        markers = sorted(markers + list(OPERATOR_LINE_PATTERN.finditer(text)), key=lambda marker: marker.start())
+    else:
+        markers = _named_speaker_markers(text)
+    if not markers:
+        return [{"speaker": "Unknown", "role": "other", "section": "prepared_remarks", "start": 0, "end": len(text),
+                 "text_start": len(text) - len(text.lstrip()), "text": text.strip()}] if text.strip() else []
+
+    turns, section = [], "prepared_remarks"
+    if text[:markers[0].start()].strip():
+        preamble = text[:markers[0].start()]
+        turns.append({"speaker": "Unknown", "role": "other", "section": section, "start": 0, "end": markers[0].start(),
+                      "text_start": len(preamble) - len(preamble.lstrip()), "text": preamble.strip()})
+    for position, marker in enumerate(markers):
+        end = markers[position + 1].start() if position + 1 < len(markers) else len(text)
+        speaker = " ".join(marker.group("speaker").split())
+        role = classify_role(speaker)
+        raw_body = text[marker.end():end]
+        body = raw_body.strip()
+        if section == "prepared_remarks" and (role == "analyst" or (role == "operator" and QA_START_PATTERN.search(body))):
+            section = "qa"
+        turns.append({"speaker": speaker, "role": role, "section": section, "start": marker.start(), "end": end,
+                      "text_start": marker.end() + len(raw_body) - len(raw_body.lstrip()), "text": body})
+    return [turn for turn in turns if turn["text"]]
+
+def split_long_turn(turn: dict, max_chars: int) -> list:
+    """
+    Splits a turn longer than max_chars at sentence boundaries into pieces of at most max_chars
+    (a single longer sentence is cut at the last space before the limit). Each piece keeps the
+    turn's speaker, role, and section; start and end are the piece's offsets in the transcript.
+    """
+    if len(turn["text"]) <= max_chars:
+        return [turn]
+    spans = []
+    for sentence in split_sentences(turn["text"]):
+        start, end = sentence["start"], sentence["end"]
+        while end - start > max_chars:
+            cut = turn["text"].rfind(" ", start + 1, start + max_chars + 1)
+            cut = cut if cut > start else start + max_chars
+            spans.append((start, cut))
+            start = cut + (turn["text"][cut:cut + 1] == " ")
+        spans.append((start, end))
+
+    # Pack consecutive sentence spans into pieces of at most max_chars
+    groups = []
+    for start, end in spans:
+        if groups and end - groups[-1][0] <= max_chars:
+            groups[-1][1] = end
+        else:
+            groups.append([start, end])
+    offset = turn.get("text_start", turn["start"])
+    return [
+        {
+            **turn,
+            "start": turn["start"] if number == 0 else offset + start,
+            "end": turn["end"] if number == len(groups) - 1 else offset + end,
+            "text_start": offset + start,
+            "text": turn["text"][start:end],
+        }
+        for number, (start, end) in enumerate(groups)
+    ]
+
+def build_segments(turns: list, max_chars: int) -> list:
+    """
+    Groups turns into analysis segments, in transcript order.
+
+    Prepared remarks: each speaker's consecutive remarks form a segment.
+    Q&A: each analyst question starts a new segment with the answers that follow it.
+    Operator turns stay with the turn they introduce; operator-only segments are dropped.
+    Segments never mix sections, and a segment is closed before it would exceed max_chars.
+    A single turn longer than max_chars is first split at sentence boundaries (split_long_turn);
+    its pieces keep the speaker, role, and section and become consecutive segments.
+    Returns [{"index", "section", "speakers", "roles", "start", "end", "text"}].
+    """
+    segments, current = [], []
+
+    def close():
+        if current:
+            segments.append({
+                "index": len(segments),
+                "section": current[0]["section"],
+                "speakers": list(dict.fromkeys(turn["speaker"] for turn in current)),
+                "roles": list(dict.fromkeys(turn["role"] for turn in current)),
+                "start": current[0]["start"],
+                "end": current[-1]["end"],
+                "text": "\n\n".join(f"[{turn['speaker']}]: {turn['text']}" for turn in current),
+            })
+            current.clear()
+
+    for turn in (piece for turn in turns for piece in split_long_turn(turn, max_chars)):
+        if current:
+            previous = current[-1]
+            current_len = sum(len(t["text"]) for t in current)
+            new_section = turn["section"] != previous["section"]
+            # Operator introductions stay with the speaker (or question) they introduce
+            if turn["section"] == "qa":
+                boundary = turn["role"] in ("analyst", "operator") and previous["role"] not in ("analyst", "operator")
+            else:
+                boundary = turn["speaker"] != previous["speaker"] and previous["role"] != "operator"
+            if new_section or boundary or current_len + len(turn["text"]) > max_chars:
+                close()
+        current.append(turn)
+    close()
+    # Operator-only segments ("That concludes today's call") carry nothing worth analyzing
+    segments = [segment for segment in segments if segment["roles"] != ["operator"]]
+    for index, segment in enumerate(segments):
+        segment["index"] = index
+    return segments
+
+def parse_json_object(raw: str) -> dict:
+    """
+    Tolerantly parses a JSON object out of an LLM response.
+    Handles markdown code fences, leading/trailing chatter, and trailing commas.
+    Returns an empty dict if nothing usable is found.
+    """
+    if not raw:
+        return {}
+    cleaned = re.sub(r"^```(?:json)?\s*|\s*```$", "", raw.strip(), flags=re.IGNORECASE)
+    start, end = cleaned.find("{"), cleaned.rfind("}")
+    if start == -1 or end <= start:
+        return {}
+    candidate = cleaned[start:end + 1]
+    for attempt in (candidate, re.sub(r",\s*([}\]])", r"\1", candidate)):
+        try:
+            parsed = json.loads(attempt)
+            return parsed if isinstance(parsed, dict) else {}
+        except json.JSONDecodeError:
+            continue
+    return {}
+
+def normalize_segment_result(data: dict) -> dict:
+    """
+    Coerces one parsed segment response into {"summary", "sentiment", "sentiment_reason", "insights"}.
+    """
+    by_lower = {str(key).strip().lower(): value for key, value in (data or {}).items()}
+    sentiment = str(by_lower.get("sentiment", "")).strip().capitalize()
+    insights_raw = by_lower.get("insights") if isinstance(by_lower.get("insights"), dict) else {}
+    insights_by_lower = {str(key).strip().lower(): value for key, value in insights_raw.items()}
+    insights = {}
+    for category in INSIGHT_CATEGORIES:
+        items = insights_by_lower.get(category.lower(), [])
+        if isinstance(items, str):
+            items = [items]
+        insights[category] = [str(item).strip() for item in items if isinstance(item, (str, int, float)) and str(item).strip()]
+    return {
+        "summary": str(by_lower.get("summary") or "").strip(),
+        "sentiment": sentiment if sentiment in SENTIMENT_LABELS else "Neutral",
+        "sentiment_reason": str(by_lower.get("sentiment_reason") or "").strip(),
+        "insights": insights,
+    }
+
+def aggregate_sentiment(segments: list, results: list) -> dict:
+    """
+    Ordered, length-weighted vote over per-segment sentiment labels.
+    Returns {"label", "text", "sections": {section: label}} where text uses the
+    "Label: one-sentence justification" layout the frontend parses.
+    """
+    def vote(pairs):
+        weights = {label: 0 for label in SENTIMENT_LABELS}
+        for segment, result in pairs:
+            weights[result["sentiment"]] += len(segment["text"])
+        total = sum(weights.values())
+        # Positive vs Negative balance decides; a small net leaves the call Neutral
+        net = (weights["Positive"] - weights["Negative"]) / total if total else 0.0
+        return ("Positive" if net > 0.2 else "Negative" if net < -0.2 else "Neutral"), weights
+
+    pairs = list(zip(segments, results))
+    label, _ = vote(pairs)
+    sections = {}
+    for section in ("prepared_remarks", "qa"):
+        section_pairs = [(segment, result) for segment, result in pairs if segment["section"] == section]
+        if section_pairs:
+            sections[section] = vote(section_pairs)[0]
+
+    counts = {name: sum(1 for result in results if result["sentiment"] == name) for name in SENTIMENT_LABELS}
+    section_text = ", ".join(f"{'prepared remarks' if name == 'prepared_remarks' else 'Q&A'} {value.lower()}"
+                             for name, value in sections.items())
+    text = (f"{label}: Of {len(results)} transcript segments, {counts['Positive']} were positive, "
+            f"{counts['Neutral']} neutral and {counts['Negative']} negative"
+            + (f" ({section_text})." if section_text else "."))
+    return {"label": label, "text": text, "sections": sections}
+
+def merge_insights(results: list) -> dict:
+    """
+    Merges per-segment insights in transcript order, de-duplicating case-insensitively.
+    """
+    merged = {}
+    for category in INSIGHT_CATEGORIES:
+        seen, items = set(), []
+        for result in results:
+            for item in result["insights"][category]:
+                key = " ".join(item.lower().split())
+                if key not in seen:
+                    seen.add(key)
+                    items.append(item)
+        merged[category] = items
+    return merged
+
+def render_insights(insights: dict) -> str:
+    """
+    Renders merged insights as the bulleted markdown the frontend displays.
+    """
+    blocks = []
+    for category, items in insights.items():
+        body = "\n".join(f"- {item}" for item in items) if items else "N/A"
+        blocks.append(f"**{category}**\n{body}")
+    return "\n\n".join(blocks)
+
+def group_for_reduce(summaries: list, max_chars: int) -> list:
+    """
+    Groups consecutive summaries so each reduce prompt stays under max_chars.
+    Every group holds at least two summaries, so repeated reduction always converges.
+    """
+    groups, current, current_len = [], [], 0
+    for summary in summaries:
+        if len(current) >= 2 and current_len + len(summary) > max_chars:
+            groups.append(current)
+            current, current_len = [], 0
+        current.append(summary)
+        current_len += len(summary)
+    if current:
+        if len(current) == 1 and groups:
+            groups[-1].append(current[0])
+        else:
+            groups.append(current)
+    return groups
@@ -147,6 +147,51 @@ call_text = st.text_area(
     value=st.session_state.earnings_call_text_input # Ensure the text area reflects the session state
 )
 
+# Sentiment source forwarded as the backend's sentiment_mode field
+SENTIMENT_MODES = {
+    "Auto (lexicon, LLM if unsure)": "auto",
+    "LLM only": "llm",
+    "Lexicon only (instant)": "lexicon",
+}
+sentiment_mode_label = st.selectbox(
+    "Sentiment analysis",
+    list(SENTIMENT_MODES.keys()),
+    help="The lexicon scorer counts positive, negative, and hedging finance terms locally in milliseconds. "
+         "Auto uses it when it is confident and asks the LLM otherwise."
+)
+
+# Insights prompt input forwarded as the backend's insights_mode field
+INSIGHTS_MODES = {
+    "Extracted KPIs and their sentences": "kpi",
+    "Whole transcript": "full",
+    "Retrieved passages per category (embeddings)": "retrieval",
+}
+insights_mode_label = st.selectbox(
+    "Insights input",
+    list(INSIGHTS_MODES.keys()),
+    help="Retrieval embeds the transcript with Ollama and gives each insight category only its most relevant passages. "
+         "It needs the embedding model to be pulled (ollama pull nomic-embed-text)."
+)
+
+# Pipeline forwarded as the backend's mode field
+ANALYSIS_MODES = {
+    "Whole transcript": "whole",
+    "Segmented by speaker and section (long calls)": "segmented",
+}
+analysis_mode_label = st.selectbox(
+    "Analysis mode",
+    list(ANALYSIS_MODES.keys()),
+    help="Segmented mode analyzes prepared remarks and each Q&A exchange separately and in parallel, "
+         "then combines them and reports sentiment per segment."
+)
+
+# Optional: store the analysis per ticker and quarter for cross-quarter comparison (GET /compare/{ticker})
+ticker_col, quarter_col = st.columns([1, 1])
+with ticker_col:
+    ticker_input = st.text_input("Ticker (optional)", placeholder="e.g. TSLA")
+with quarter_col:
+    quarter_input = st.text_input("Fiscal quarter (optional)", placeholder="e.g. Q4 2024")
+
 col1, col2 = st.columns([1, 1])
 
 with col1:
@@ -159,7 +204,19 @@ if analyze_button and call_text:
     with st.spinner("Analyzing transcript... This may take a moment."):
         try:
             # Make a POST request to the FastAPI backend with an explicit timeout
-            response = requests.post(BACKEND_URL, data={"text": call_text}, timeout=REQUEST_TIMEOUT_SECONDS)
+            response = requests.post(
+                BACKEND_URL,
+                data={
+                    "text": call_text,
+                    "mode": ANALYSIS_MODES[analysis_mode_label],
+                    "sentiment_mode": SENTIMENT_MODES[sentiment_mode_label],
+                    "insights_mode": INSIGHTS_MODES[insights_mode_label],
+                    # Only sent together: the backend needs both to store the analysis
+                    **({"ticker": ticker_input.strip(), "quarter": quarter_input.strip()}
+                       if ticker_input.strip() and quarter_input.strip() else {})
+                },
+                timeout=REQUEST_TIMEOUT_SECONDS
+            )
             response.raise_for_status() # Raise an HTTPError for bad responses (4xx or 5xx)
             st.session_state.results = response.json()
             st.success("Analysis complete!")
@@ -191,6 +248,8 @@ if st.session_state.results:
 
     st.markdown("---") # Separator
     st.header("📊 Analysis Results")
+    if results.get("stored"):
+        st.caption(f"Stored as {results['stored']['ticker']} {results['stored']['period']} for cross-quarter comparison.")
 
     # Summary
     st.subheader("📝 Earnings Call Summary")
@@ -218,6 +277,16 @@ if st.session_state.results:
         st.markdown(f'<div class="sentiment-neutral">Sentiment: Neutral ⚖️<br>{sentiment_explanation}</div>', unsafe_allow_html=True)
     else:
         st.write(f"Sentiment: {sentiment_raw}")
+    if results.get("sentiment_source"):
+        st.caption(f"Sentiment source: {results['sentiment_source']}")
+
+    # Per-segment sentiment from the segmented mode
+    if results.get("segments"):
+        with st.expander("Sentiment by segment"):
+            segment_columns = ["index", "section", "speakers", "sentiment", "sentiment_reason", "summary"]
+            segments_df = pd.DataFrame(results["segments"])[segment_columns]
+            segments_df["speakers"] = segments_df["speakers"].apply(", ".join)
+            st.dataframe(segments_df, use_container_width=True)
 
     # Key Insights
     st.subheader("💡 Key Financial Insights")
@@ -226,6 +295,12 @@ if st.session_state.results:
     # Display insights as markdown (assuming LLM outputs bullet points)
     st.markdown(insights_text)
 
+    # Figures extracted locally by the backend's KPI extractor
+    if results.get("kpis"):
+        st.subheader("🔢 Extracted KPIs")
+        kpi_columns = ["metric", "kind", "value", "unit", "low", "high", "direction", "comparison", "period", "forward_looking", "text"]
+        st.dataframe(pd.DataFrame(results["kpis"])[kpi_columns], use_container_width=True)
+
     # --- Download Options ---
     st.markdown("---")
     st.subheader("⬇️ Download Results")
@@ -234,7 +309,9 @@ if st.session_state.results:
     download_data = {
         "summary": results.get("summary", ""),
         "sentiment": results.get("sentiment", ""),
-        "insights": results.get("insights", "")
+        "insights": results.get("insights", ""),
+        "kpis": results.get("kpis", []),
+        "segments": results.get("segments", [])
     }
     json_output = json.dumps(download_data, indent=4)
 
@@ -0,0 +1,201 @@
+# backend/keyphrases.py
+
+import os
+import re
+import sqlite3
+import threading
+from collections import Counter
+from contextlib import contextmanager
+
+import numpy as np
+
+STOPWORDS = frozenset("""
+a about above across after again against all almost along also although always am among an and another any
+are around as at away be became because become becomes been before being below between both but by can
+cannot could did do does doing done down during each either else enough etc even ever every few for from
+further get gets given gives go goes had has have having he her here hers herself him himself his how however
+i if in into is it its itself just known largely least less like made main make makes many may me might more
+most mostly much must my near nearly neither no nor not now of off often on once one only onto or other others
+otherwise our ours out over own per perhaps rather same several shall she should since so some such than that
+the their theirs them themselves then there therefore these they this those though through throughout thus to
+together too toward towards under until up upon us use used uses using usually very via was we well were what
+when where whether which while who whom whose why will with within without would yet you your yours
+also called example examples include includes including known such various way ways
+""".split())
+
+# Words: letters, optionally with digits, hyphens, or apostrophes inside ("CO2", "bio-based", "Earth's")
+WORD_PATTERN = re.compile(r"[A-Za-z][A-Za-z0-9]*(?:[-'][A-Za-z0-9]+)*")
+# Phrase boundaries: sentence and clause punctuation, brackets, and line breaks
+BOUNDARY_PATTERN = re.compile(r"[.!?,;:()\[\]{}\"\n–—]+|\s-\s")
+
+CONCEPT_POLISH_PROMPT = (
+    "These candidate key terms were extracted automatically from a lesson, best first:\n{terms}\n\n"
+    "Return the {count} most useful key concepts for a student revising this lesson, as a comma-separated list. "
+    "Use only terms from the list (you may fix capitalization or merge near-duplicates). "
+    "Respond with the list only."
+)
+
+def tokenize(text: str) -> list:
+    return [word.lower() for word in WORD_PATTERN.findall(text)]
+
+def _normalize_word(word: str) -> str:
+    """
+    Folds simple English plurals ("reservoirs" -> "reservoir") so singular and plural forms count together.
+    """
+    word = word.lower().removesuffix("'s")
+    if len(word) > 4 and word.endswith("ies"):
+        return word[:-3] + "y"
+    if len(word) > 3 and word.endswith("s") and not word.endswith(("ss", "us", "is")):
+        return word[:-1]
+    return word
+
+def candidate_phrases(text: str, max_words: int = 3) -> list:
+    """
+    RAKE-style candidates: runs of content words between stopwords and punctuation.
+    Runs longer than max_words contribute their n-grams of 2..max_words words instead.
+    Returns [(normalized word tuple, surface form)] in text order.
+    """
+    candidates = []
+    for fragment in BOUNDARY_PATTERN.split(text):
+        run = []
+        for word in WORD_PATTERN.findall(fragment) + [None]:
+            if word is not None and word.lower() not in STOPWORDS and len(word) > 1 and not word.isdigit():
+                run.append(word)
+                continue
+            if 0 < len(run) <= max_words:
+                candidates.append((tuple(_normalize_word(w) for w in run), " ".join(run)))
+            elif len(run) > max_words:
+                for size in range(2, max_words + 1):
+                    for start in range(len(run) - size + 1):
+                        words = run[start:start + size]
+                        candidates.append((tuple(_normalize_word(w) for w in words), " ".join(words)))
+            run = []
+    return candidates
+
+class IDFTable:
+    """
+    Document frequencies of normalized words over a background corpus of lessons, persisted in SQLite
+    and mirrored in memory so lookups cost nothing on the request path. Each lesson is counted once,
+    keyed by its content hash.
+    """
+
+    def __init__(self, db_path: str):
+        self.db_path = db_path
+        self._lock = threading.Lock()
+        os.makedirs(os.path.dirname(db_path) or ".", exist_ok=True)
+        with self._connect() as db:
+            db.execute("PRAGMA journal_mode=WAL")
+            db.execute("CREATE TABLE IF NOT EXISTS idf_documents (key TEXT PRIMARY KEY)")
+            db.execute("CREATE TABLE IF NOT EXISTS idf_terms (term TEXT PRIMARY KEY, df INTEGER NOT NULL)")
+            self._documents = {row[0] for row in db.execute("SELECT key FROM idf_documents")}
+            self._df = dict(db.execute("SELECT term, df FROM idf_terms").fetchall())
+
+    @contextmanager
+    def _connect(self):
+        db = sqlite3.connect(self.db_path, timeout=30)
+        try:
+            with db:
+                yield db
+        finally:
+            db.close()
+
+    def add_document(self, key: str, text: str) -> bool:
+        """
+        Counts a lesson's words into the table unless the lesson was already counted. Returns True if it was added.
+        """
+        terms = {_normalize_word(word) for word in tokenize(text)} - STOPWORDS
+        with self._lock:
+            if key in self._documents:
+                return False
+            self._documents.add(key)
+            for term in terms:
+                self._df[term] = self._df.get(term, 0) + 1
+        with self._connect() as db:
+            db.execute("INSERT OR IGNORE INTO idf_documents (key) VALUES (?)", (key,))
+            db.executemany(
+                "INSERT INTO idf_terms (term, df) VALUES (?, 1) ON CONFLICT(term) DO UPDATE SET df = df + 1",
+                [(term,) for term in terms]
+            )
+        return True
+
+    def idf(self, terms: list) -> np.ndarray:
+        """
+        Smoothed inverse document frequencies, log((1 + N) / (1 + df)) + 1; unseen terms get the maximum.
+        """
+        with self._lock:
+            total = len(self._documents)
+            df = np.array([self._df.get(term, 0) for term in terms], dtype=np.float64)
+        return np.log((1 + total) / (1 + df)) + 1
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"documents": len(self._documents), "terms": len(self._df)}
+
+def extract_keyphrases(text: str, idf_table: IDFTable = None, top_k: int = 10, max_words: int = 3) -> list:
+    """
+    Ranks candidate phrases by TF-IDF: each word is weighted by its log-scaled frequency in the lesson
+    times its IDF over the background corpus, and a phrase scores the sum of its word weights, boosted by
+    how often the phrase itself occurs and damped by its length. Phrases whose words are all covered by a
+    better-ranked phrase, or that occur once and are long or only extend one, are skipped. Returns [{"phrase", "score"}]
+    best first.
+    """
+    candidates = candidate_phrases(text, max_words)
+    if not candidates:
+        return []
+
+    phrase_counts = Counter(words for words, _ in candidates)
+    surfaces = {}
+    for words, surface in candidates:
+        surfaces.setdefault(words, Counter())[surface] += 1
+    vocabulary = sorted({word for words in phrase_counts for word in words})
+    index = {word: position for position, word in enumerate(vocabulary)}
+
+    # Word weights over the lesson's vocabulary (a sparse TF-IDF row, stored densely for this one document)
+    word_counts = Counter(_normalize_word(word) for word in tokenize(text))
+    tf = 1 + np.log(np.array([word_counts.get(word, 1) for word in vocabulary], dtype=np.float64))
+    idf = idf_table.idf(vocabulary) if idf_table is not None else np.ones(len(vocabulary))
+    weights = tf * idf
+
+    # Phrase -> word incidence as flat index lists, summed per phrase with reduceat
+    phrases = list(phrase_counts)
+    flat = np.array([index[word] for words in phrases for word in words])
+    offsets = np.cumsum([0] + [len(words) for words in phrases[:-1]])
+    lengths = np.array([len(words) for words in phrases], dtype=np.float64)
+    counts = np.array([phrase_counts[words] for words in phrases], dtype=np.float64)
+    scores = np.add.reduceat(weights[flat], offsets) / np.sqrt(lengths) * (1 + np.log(counts))
+
+    ranked, covered = [], []
+    for position in np.argsort(-scores, kind="stable"):
+        words = phrases[position]
+        if any(set(words) <= chosen for chosen in covered):
+            continue
+        # A one-off run of three words is usually a clause ("carbon exists primarily"), and a one-off
+        # "organic matter releases" only extends "organic matter"
+        if phrase_counts[words] == 1 and (len(words) >= 3 or any(chosen < set(words) for chosen in covered)):
+            continue
+        covered.append(set(words))
+        # Most frequent spelling; on ties the one with fewer capitals ("carbon cycle" over "Carbon Cycle")
+        surface = max(surfaces[words].items(), key=lambda item: (item[1], -sum(c.isupper() for c in item[0])))[0]
+        ranked.append({"phrase": surface[0].upper() + surface[1:], "score": round(float(scores[position]), 3)})
+        if len(ranked) == top_k:
+            break
+    return ranked
+
+def parse_polished_concepts(raw: str, ranked: list) -> list:
+    """
+    Parses the comma-separated polish response, keeping only terms built from words of the ranked candidates.
+    """
+    known = {_normalize_word(word) for item in ranked for word in tokenize(item["phrase"])}
+    concepts = []
+    for term in re.split(r"[,\n]", raw or ""):
+        term = re.sub(r"^\s*(?:[-*•]|\d+[.)])\s*", "", term).strip().strip(".")
+        words = {_normalize_word(word) for word in tokenize(term)} - STOPWORDS
+        if term and words and words <= known and term.lower() not in (c.lower() for c in concepts):
+            concepts.append(term)
+    return concepts
+
+def render_concepts(concepts: list) -> str:
+    """
+    Renders concepts as the bulleted markdown list the frontend displays.
+    """
+    return "\n".join(f"- {concept}" for concept in concepts)
@@ -0,0 +1,152 @@
+# backend/lesson_sections.py
+
+import re
+
+# Heading lines: "# Title", "Chapter 3: ...", "2.1 Photosynthesis", or a short standalone title line
+# ("Key Reservoirs of Carbon:") that does not end like a sentence
+MARKDOWN_HEADING_PATTERN = re.compile(r"^\s{0,3}#{1,6}\s+(?P<title>.+?)\s*#*\s*$")
+NAMED_HEADING_PATTERN = re.compile(
+    r"^\s*(?P<title>(?:chapter|section|unit|lesson|part|module|topic)\s+[\w.-]+\b.{0,80})$", re.IGNORECASE
+)
+NUMBERED_HEADING_PATTERN = re.compile(r"^\s*(?P<title>(?:\d+(?:\.\d+)*\.?|[IVX]+\.)\s+[A-Z][^.!?]{0,80})$")
+UNDERLINE_PATTERN = re.compile(r"^\s*(?:=+|-+)\s*$")
+SENTENCE_END_PATTERN = re.compile(r"(?<=[.!?])\s+")
+
+SECTION_EXPLANATION_PROMPT = (
+    "The following is the section \"{title}\" of a longer lesson. Explain it in simple, easy-to-understand "
+    "terms for a student who is new to the topic, in one or two short paragraphs. Focus on clarity and "
+    "conciseness, avoiding overly technical jargon. "
+    "Text:\n\n---\n{text}\n---"
+)
+
+def _is_title_line(line: str, previous_blank: bool) -> bool:
+    """
+    A short standalone line that reads like a title rather than a sentence.
+    """
+    stripped = line.strip()
+    if not stripped or not previous_blank or len(stripped) > 80 or len(stripped.split()) > 12:
+        return False
+    if stripped[-1] in ".!?,;" or not (stripped[0].isupper() or stripped[0].isdigit()):
+        return False
+    # "Atmosphere: Carbon exists primarily as CO2." is a definition, not a heading
+    return ":" not in stripped[:-1] or stripped.endswith(":") or len(stripped.split(":", 1)[1].split()) <= 6
+
+def find_headings(text: str) -> list:
+    """
+    Returns [(start_offset, title)] for heading lines, in order.
+    """
+    lines = text.splitlines(keepends=True)
+    headings, offset, previous_blank = [], 0, True
+    for position, line in enumerate(lines):
+        stripped = line.strip()
+        next_line = lines[position + 1] if position + 1 < len(lines) else ""
+        title = None
+        for pattern in (MARKDOWN_HEADING_PATTERN, NAMED_HEADING_PATTERN, NUMBERED_HEADING_PATTERN):
+            match = pattern.match(stripped)
+            if match:
+                title = match.group("title")
+                break
+        if title is None and stripped and UNDERLINE_PATTERN.match(next_line) and len(stripped) <= 80:
+            title = stripped
+        # A title line needs body text after it
+        if title is None and _is_title_line(line, previous_blank) and text[offset + len(line):].strip():
+            title = stripped
+        if title is not None and not UNDERLINE_PATTERN.match(stripped):
+            headings.append((offset, title.strip().rstrip(":").strip()))
+        offset += len(line)
+        previous_blank = not stripped or UNDERLINE_PATTERN.match(stripped) is not None
+    return headings
+
+def _split_long(text: str, max_chars: int) -> list:
+    """
+    Packs paragraphs (then sentences, for a paragraph longer than max_chars) into parts of at most
+    about max_chars characters. Returns [(start_offset, end_offset)] relative to text.
+    """
+    pieces = []
+    for match in re.finditer(r"\S(?:.*?\S)?(?=\n\s*\n|\s*$)", text, re.DOTALL):
+        if match.end() - match.start() <= max_chars:
+            pieces.append((match.start(), match.end()))
+            continue
+        start = match.start()
+        for sentence in SENTENCE_END_PATTERN.split(match.group()):
+            position = text.find(sentence, start)
+            pieces.append((position, position + len(sentence)))
+            start = position + len(sentence)
+
+    parts = []
+    for start, end in pieces:
+        if parts and end - parts[-1][0] <= max_chars:
+            parts[-1] = (parts[-1][0], end)
+        else:
+            parts.append((start, end))
+    return parts
+
+def split_sections(text: str, max_chars: int, min_chars: int = 0) -> list:
+    """
+    Splits a lesson into sections at its headings. Sections shorter than min_chars are merged into the
+    next one (a chapter title followed by its first heading), and sections longer than max_chars are cut
+    at paragraph boundaries into numbered parts. A lesson without headings is cut into parts the same way.
+    Returns [{"index", "title", "start", "end", "text"}] in lesson order.
+    """
+    headings = find_headings(text)
+    if not headings or headings[0][0] > 0 and text[:headings[0][0]].strip():
+        headings = [(0, None)] + headings
+
+    raw = []
+    for position, (start, title) in enumerate(headings):
+        end = headings[position + 1][0] if position + 1 < len(headings) else len(text)
+        if text[start:end].strip():
+            raw.append({"title": title, "start": start, "end": end})
+
+    merged = []
+    for section in raw:
+        if merged and len(text[merged[-1]["start"]:merged[-1]["end"]].strip()) < min_chars:
+            merged[-1]["end"] = section["end"]
+            merged[-1]["title"] = merged[-1]["title"] or section["title"]
+        else:
+            merged.append(dict(section))
+    if len(merged) > 1 and len(text[merged[-1]["start"]:merged[-1]["end"]].strip()) < min_chars:
+        last = merged.pop()
+        merged[-1]["end"] = last["end"]
+
+    sections = []
+    for section in merged:
+        body = text[section["start"]:section["end"]]
+        parts = _split_long(body, max_chars) if len(body.strip()) > max_chars else [(0, len(body))]
+        for number, (start, end) in enumerate(parts, start=1):
+            if section["title"] is None:
+                title = f"Part {len(sections) + 1}"
+            else:
+                title = f"{section['title']} (part {number})" if len(parts) > 1 else section["title"]
+            sections.append({
+                "index": len(sections),
+                "title": title,
+                "start": section["start"] + start,
+                "end": section["start"] + end,
+                "text": body[start:end].strip(),
+            })
+    return sections
+
+def allocate_questions(sections: list, total: int) -> list:
+    """
+    Splits total questions across sections in proportion to their length (largest remainder),
+    so the counts always add up to total. Short sections may get none.
+    """
+    lengths = [len(section["text"]) for section in sections]
+    size = sum(lengths)
+    if not size:
+        return [0] * len(sections)
+    quotas = [total * length / size for length in lengths]
+    counts = [int(quota) for quota in quotas]
+    by_remainder = sorted(range(len(sections)), key=lambda i: (quotas[i] - counts[i], lengths[i]), reverse=True)
+    for i in by_remainder[:total - sum(counts)]:
+        counts[i] += 1
+    return counts
+
+def render_section_explanations(sections: list, explanations: list) -> str:
+    """
+    Joins per-section explanations, in lesson order, under their section titles.
+    """
+    return "\n\n".join(
+        f"**{section['title']}**\n\n{explanation.strip()}" for section, explanation in zip(sections, explanations)
+    )
@@ -1,10 +1,32 @@
 # backend/main.py
 
-from fastapi import FastAPI, Form, HTTPException
+from fastapi import FastAPI, Form, HTTPException, BackgroundTasks
+from fastapi.concurrency import run_in_threadpool
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import StreamingResponse
 import requests
+import httpx
+import asyncio
 import json
 import os
+import threading
+import time
+from contextlib import contextmanager
+from backend.llm_cache import LLMCache, make_cache_key
+from backend.streaming import stream_sections
+from backend.quiz_schema import (
+    QUIZ_SCHEMA, QUIZ_PROMPT, REPLACEMENT_PROMPT, parse_quiz_response, validate_questions, render_quiz_text
+)
+from backend.question_bank import QuestionBank, lesson_key
+from backend.keyphrases import (
+    CONCEPT_POLISH_PROMPT, IDFTable, extract_keyphrases, parse_polished_concepts, render_concepts
+)
+from backend.lesson_sections import (
+    SECTION_EXPLANATION_PROMPT, split_sections, allocate_questions, render_section_explanations
+)
+from backend.pregeneration import LessonLibrary, PregenerationQueue
+from backend.quiz_grading import GRADING_SCHEMA, AmbiguousAnswerBatcher, adds_negation, grade_choice, grade_short_answer
+from backend.quiz_sessions import QuizSessionStore
 
 # Initialize FastAPI app
 app = FastAPI(
@@ -37,22 +59,207 @@ LLM_MODEL = os.getenv("LLM_MODEL", "llama3:latest") # Default to mistral, can be
 # Set a generous timeout for Ollama call (e.g., 8 minutes)
 OLLAMA_REQUEST_TIMEOUT_SECONDS = 1000
 
-def call_llm(prompt: str) -> str:
+# Maximum number of sections generated at the same time by the streaming endpoint.
+# Match this to OLLAMA_NUM_PARALLEL on the Ollama host; extra requests just queue there.
+MAX_CONCURRENT_LLM_REQUESTS = int(os.getenv("MAX_CONCURRENT_LLM_REQUESTS", "3"))
+
+# Response cache in front of call_llm, keyed by the normalized prompt, LLM_MODEL, and PROMPT_TEMPLATE_VERSION.
+# Bump PROMPT_TEMPLATE_VERSION whenever prompts or their post-processing change so old answers are not reused.
+PROMPT_TEMPLATE_VERSION = "2"
+LLM_CACHE_ENABLED = os.getenv("LLM_CACHE_ENABLED", "true").lower() == "true"
+LLM_CACHE_PATH = os.getenv("LLM_CACHE_PATH", "cache/llm_cache.sqlite3")
+LLM_CACHE_MEMORY_MB = int(os.getenv("LLM_CACHE_MEMORY_MB", "64"))
+LLM_CACHE_DISK_MB = int(os.getenv("LLM_CACHE_DISK_MB", "512"))
+LLM_CACHE_TTL_SECONDS = int(os.getenv("LLM_CACHE_TTL_SECONDS", str(7 * 24 * 3600))) # 0 disables expiry
+
+llm_cache = LLMCache(
+    LLM_CACHE_PATH,
+    max_memory_bytes=LLM_CACHE_MEMORY_MB * 1024 * 1024,
+    max_disk_bytes=LLM_CACHE_DISK_MB * 1024 * 1024,
+    ttl_seconds=LLM_CACHE_TTL_SECONDS
+) if LLM_CACHE_ENABLED else None
+
+# Structured quiz generation for /generate/: the model fills QUIZ_SCHEMA, every question is validated,
+# and only rejected questions are regenerated, in at most QUIZ_MAX_REGENERATION_ROUNDS extra LLM calls.
+QUIZ_QUESTION_COUNT = int(os.getenv("QUIZ_QUESTION_COUNT", "5"))
+QUIZ_MAX_REGENERATION_ROUNDS = int(os.getenv("QUIZ_MAX_REGENERATION_ROUNDS", "3"))
+
+# Generation modes for /generate/:
+# - "whole": each prompt sees the entire lesson (original behavior)
+# - "sectioned": the lesson is split at headings and paragraphs into sections of at most SECTION_MAX_CHARS
+#   (shorter than SECTION_MIN_CHARS are merged), and explanations and quiz questions are generated per
+#   section concurrently, with questions allocated in proportion to section length
+LESSON_MODES = ["whole", "sectioned"]
+SECTION_MAX_CHARS = int(os.getenv("SECTION_MAX_CHARS", "4000"))
+SECTION_MIN_CHARS = int(os.getenv("SECTION_MIN_CHARS", "300"))
+
+# Key concepts for /generate/:
+# - "local": TF-IDF keyphrases ranked in milliseconds against an IDF table of the lesson library, no LLM call
+# - "polish": the LLM picks and tidies the best local candidates, capped at CONCEPT_POLISH_MAX_TOKENS tokens
+# - "llm": the original full-generation concepts prompt
+CONCEPT_MODES = ["local", "polish", "llm"]
+CONCEPTS_MODE = os.getenv("CONCEPTS_MODE", "local")
+CONCEPT_COUNT = int(os.getenv("CONCEPT_COUNT", "10"))
+CONCEPT_POLISH_MAX_TOKENS = int(os.getenv("CONCEPT_POLISH_MAX_TOKENS", "48"))
+# Background corpus for IDF: lesson files under LESSON_LIBRARY_DIR (indexed at startup) plus every lesson processed
+LESSON_LIBRARY_DIR = os.getenv("LESSON_LIBRARY_DIR", "data")
+IDF_TABLE_PATH = os.getenv("IDF_TABLE_PATH", "cache/keyphrase_idf.sqlite3")
+
+idf_table = IDFTable(IDF_TABLE_PATH)
+
+# Question bank: every validated question is kept per lesson (keyed by a hash of the lesson text) and
+# quizzes are sampled from it. Background top-ups add QUESTION_BANK_TOPUP_BATCH questions while the bank
+# is below QUESTION_BANK_TARGET_SIZE or a student has seen all of a lesson's questions, and never grow it
+# past QUESTION_BANK_MAX_SIZE. Generation prompts list at most QUIZ_PROMPT_MAX_EXISTING of the most recent
+# banked questions to avoid, so a large bank does not overflow the model's context; older ones are still
+# rejected as duplicates and near-duplicates after generation.
+QUESTION_BANK_PATH = os.getenv("QUESTION_BANK_PATH", "cache/question_bank.sqlite3")
+QUESTION_BANK_TARGET_SIZE = int(os.getenv("QUESTION_BANK_TARGET_SIZE", "30"))
+QUESTION_BANK_TOPUP_BATCH = int(os.getenv("QUESTION_BANK_TOPUP_BATCH", "10"))
+QUESTION_BANK_MAX_SIZE = int(os.getenv("QUESTION_BANK_MAX_SIZE", "150"))
+QUIZ_PROMPT_MAX_EXISTING = int(os.getenv("QUIZ_PROMPT_MAX_EXISTING", "30"))
+
+# Near-duplicate questions: MinHash signatures of each question's text are indexed with LSH in the question
+# bank database, together with hashes of its correct answer and option set. A generated question whose score
+# against a banked question (or one already in the quiz) reaches QUESTION_DEDUP_THRESHOLD is rejected and
+# regenerated, and never stored. The score is the estimated text similarity, raised for the same correct
+# answer (more for the same option set too) and lowered for a different one; see MinHashIndex.
+# Set QUESTION_DEDUP_THRESHOLD=0 to disable.
+QUESTION_DEDUP_THRESHOLD = float(os.getenv("QUESTION_DEDUP_THRESHOLD", "0.58"))
+NEAR_DUPLICATE_PROBLEM = "rephrases a question already in the quiz or the question bank"
+
+question_bank = QuestionBank(QUESTION_BANK_PATH, near_duplicate_threshold=QUESTION_DEDUP_THRESHOLD or None)
+bank_top_ups = set() # lesson keys with a top-up in progress
+bank_top_ups_lock = threading.Lock()
+
+# Lesson library and pre-generation: teachers register lessons with POST /lessons/ and a priority queue
+# precomputes their explanation, key concepts, and question bank in PREGENERATION_WORKERS background
+# threads. Jobs only start while no interactive request is using the LLM (checked every
+# PREGENERATION_IDLE_POLL_SECONDS), so students never wait behind pre-generation. /generate/ serves the
+# stored aids for a registered lesson and falls back to live generation on a miss.
+LESSON_DB_PATH = os.getenv("LESSON_DB_PATH", "cache/lessons.sqlite3")
+PREGENERATION_WORKERS = int(os.getenv("PREGENERATION_WORKERS", "1"))
+PREGENERATION_IDLE_POLL_SECONDS = float(os.getenv("PREGENERATION_IDLE_POLL_SECONDS", "1"))
+# Fields stored per lesson; the quiz is always sampled per student from the question bank
+PRECOMPUTED_FIELDS = ["explanation", "concepts", "concepts_ranked", "concepts_source", "sections"]
+
+live_requests = 0 # interactive generations in progress
+live_requests_lock = threading.Lock()
+
+@contextmanager
+def track_live_request():
+    global live_requests
+    with live_requests_lock:
+        live_requests += 1
+    try:
+        yield
+    finally:
+        with live_requests_lock:
+            live_requests -= 1
+
+def llm_is_idle() -> bool:
+    with live_requests_lock:
+        return live_requests == 0
+
+lesson_library = LessonLibrary(LESSON_DB_PATH)
+pregeneration_queue = PregenerationQueue(
+    LESSON_DB_PATH,
+    lesson_library,
+    generate_fn=lambda text, mode, concepts_mode: pregenerate_lesson(text, mode, concepts_mode),
+    is_idle=llm_is_idle,
+    workers=PREGENERATION_WORKERS,
+    idle_poll_seconds=PREGENERATION_IDLE_POLL_SECONDS
+)
+
+# Quiz sessions: students answer questions from the lesson's question bank one at a time. Multiple-choice
+# answers and clear-cut short answers are graded locally against the stored answer key. Only short answers
+# whose fuzzy similarity falls between SHORT_ANSWER_REJECT_RATIO and SHORT_ANSWER_ACCEPT_RATIO go to the
+# LLM, batched across concurrent students (up to GRADING_BATCH_SIZE answers per call, waiting at most
+# GRADING_BATCH_WAIT_SECONDS to fill a batch, with up to MAX_CONCURRENT_LLM_REQUESTS batches graded at once).
+# Each next question is the one whose predicted chance of a correct answer by this student is closest to
+# ADAPTIVE_TARGET_ACCURACY.
+QUIZ_SESSION_DB_PATH = os.getenv("QUIZ_SESSION_DB_PATH", "cache/quiz_sessions.sqlite3")
+SHORT_ANSWER_ACCEPT_RATIO = float(os.getenv("SHORT_ANSWER_ACCEPT_RATIO", "0.85"))
+SHORT_ANSWER_REJECT_RATIO = float(os.getenv("SHORT_ANSWER_REJECT_RATIO", "0.5"))
+GRADING_BATCH_SIZE = int(os.getenv("GRADING_BATCH_SIZE", "20"))
+GRADING_BATCH_WAIT_SECONDS = float(os.getenv("GRADING_BATCH_WAIT_SECONDS", "0.5"))
+ADAPTIVE_TARGET_ACCURACY = float(os.getenv("ADAPTIVE_TARGET_ACCURACY", "0.7"))
+
+quiz_sessions = QuizSessionStore(QUIZ_SESSION_DB_PATH, question_bank, target_accuracy=ADAPTIVE_TARGET_ACCURACY)
+grading_batcher = AmbiguousAnswerBatcher(
+    grade_fn=lambda prompt: grade_ambiguous_answers(prompt),
+    max_batch=GRADING_BATCH_SIZE,
+    max_wait_seconds=GRADING_BATCH_WAIT_SECONDS,
+    max_concurrency=MAX_CONCURRENT_LLM_REQUESTS
+)
+
+# Define prompts for different generation tasks
+# Using clear instructions, specific formats, and delimiters for better LLM performance
+PROMPTS = {
+    "explanation": (
+        "Explain the following educational text in simple, easy-to-understand terms for a student "
+        "who is new to the topic. Focus on clarity and conciseness, avoiding overly technical jargon. "
+        "Text:\n\n---\n{text}\n---"
+    ),
+    # Free-text quiz, used by the streaming endpoint; /generate/ uses the structured QUIZ_PROMPT
+    "quiz": (
+        "Generate a 5-question quiz based on the following educational text. "
+        "Each question should be either multiple-choice with 4 options (A, B, C, D) or a short answer question. "
+        "Provide the correct answer for each question clearly marked. "
+        "Format: \n\n1. Question?\nA) Option A\nB) Option B\nC) Option C\nD) Option D\nAnswer: [Correct Option]\n\n"
+        "2. Short answer question?\nAnswer: [Short Answer]\n\n"
+        "Text:\n\n---\n{text}\n---"
+    ),
+    "concepts": (
+        "List 5 to 10 key concepts or terms from the following educational content. "
+        "Present them as a clear bulleted list. "
+        "Text:\n\n---\n{text}\n---"
+    )
+}
+
+def build_llm_request(prompt: str, response_format=None, max_tokens: int = None) -> tuple:
+    """
+    Returns (cache_key, payload) for one Ollama generate call. The output format and token cap are
+    part of the cache key, since they change the response.
+    """
+    format_key = json.dumps(response_format, sort_keys=True) if isinstance(response_format, dict) else response_format
+    if max_tokens:
+        format_key = f"{format_key or ''}|num_predict={max_tokens}"
+    payload = {"model": LLM_MODEL, "prompt": prompt, "stream": False}
+    if response_format:
+        payload["format"] = response_format
+    if max_tokens:
+        payload["options"] = {"num_predict": max_tokens}
+    return make_cache_key(prompt, LLM_MODEL, PROMPT_TEMPLATE_VERSION, format_key), payload
+
+def call_llm(prompt: str, response_format=None, max_tokens: int = None) -> str:
     """
     Calls the Ollama LLM API to generate a response based on the given prompt.
+    Pass response_format="json" for Ollama's JSON mode, or a JSON schema dict for structured output,
+    and max_tokens to cap the generated length.
     Handles potential connection errors and unexpected responses.
+    Responses are served from / stored in llm_cache when it is enabled.
     """
+    cache_key, payload = build_llm_request(prompt, response_format, max_tokens)
+    if llm_cache is not None:
+        cached = llm_cache.get(cache_key)
+        if cached is not None:
+            return cached
+
     try:
         response = requests.post(
             f"{OLLAMA_API_BASE_URL}/api/generate",
-            json={"model": LLM_MODEL, "prompt": prompt, "stream": False},
+            json=payload,
             timeout=OLLAMA_REQUEST_TIMEOUT_SECONDS # Use the increased timeout
         )
         response.raise_for_status() # Raise an HTTPError for bad responses (4xx or 5xx)
         
         response_data = response.json()
         if "response" in response_data:
-            return response_data["response"].strip()
+            result = response_data["response"].strip()
+            if llm_cache is not None:
+                llm_cache.set(cache_key, result)
+            return result
         else:
             raise ValueError(f"Unexpected response format from Ollama: 'response' key missing. Response: {response_data}")
 
@@ -92,40 +299,409 @@ def call_llm(prompt: str) -> str:
             detail=f"An unexpected error occurred during LLM interaction: {e}"
         )
 
-@app.post("/generate/")
-def generate_learning_aids(text: str = Form(...)):
+async def call_llm_async(client: httpx.AsyncClient, semaphore: asyncio.Semaphore, prompt: str,
+                         response_format=None, max_tokens: int = None) -> str:
     """
-    Generates a simplified explanation, a quiz, and key concepts from educational text.
+    Async counterpart of call_llm used for quiz generation and the sectioned mode.
+    The semaphore caps how many generations are in flight at once.
     """
-    if not text.strip():
-        raise HTTPException(status_code=400, detail="Educational text cannot be empty.")
+    cache_key, payload = build_llm_request(prompt, response_format, max_tokens)
+    if llm_cache is not None:
+        cached = llm_cache.get(cache_key)
+        if cached is not None:
+            return cached
+
+    async with semaphore:
+        try:
+            response = await client.post(f"{OLLAMA_API_BASE_URL}/api/generate", json=payload)
+            response.raise_for_status()
+
+            response_data = response.json()
+            if "response" in response_data:
+                result = response_data["response"].strip()
+                if llm_cache is not None:
+                    llm_cache.set(cache_key, result)
+                return result
+            else:
+                raise ValueError(f"Unexpected response format from Ollama: 'response' key missing. Response: {response_data}")
+
+        except httpx.ConnectError:
+            raise HTTPException(
+                status_code=503,
+                detail=f"Could not connect to Ollama server at {OLLAMA_API_BASE_URL}. "
+                       f"Please ensure Ollama is running and the model '{LLM_MODEL}' is pulled."
+            )
+        except httpx.TimeoutException:
+            raise HTTPException(
+                status_code=504,
+                detail=f"Ollama server timed out after {OLLAMA_REQUEST_TIMEOUT_SECONDS} seconds. "
+                       "The LLM might be taking too long to respond. Consider a smaller model or more powerful hardware."
+            )
+        except httpx.HTTPError as e:
+            raise HTTPException(
+                status_code=500,
+                detail=f"An error occurred while calling the Ollama LLM API: {e}"
+            )
+        except json.JSONDecodeError:
+            raise HTTPException(
+                status_code=500,
+                detail="Failed to decode JSON response from Ollama. Check Ollama server logs for malformed output."
+            )
+        except ValueError as e:
+            raise HTTPException(
+                status_code=500,
+                detail=str(e)
+            )
+
+async def gather_tasks(coroutines: list) -> list:
+    """
+    Runs coroutines concurrently and returns their results in order. If one fails, the others are
+    cancelled instead of waiting for their generations.
+    """
+    tasks = [asyncio.create_task(coroutine) for coroutine in coroutines]
+    try:
+        return await asyncio.gather(*tasks)
+    except Exception:
+        for task in tasks:
+            task.cancel()
+        raise
+
+def split_near_duplicates(key: str, questions: list, accepted: list) -> tuple:
+    """
+    Splits validated questions into (kept, rejected): rejected ones are near-duplicates of a question
+    in the lesson's bank, in accepted, or earlier in questions.
+    """
+    matches = question_bank.find_near_duplicates(key, questions, pending=accepted)
+    kept = [question for question, match in zip(questions, matches) if match is None]
+    rejected = [
+        {"question": question, "problems": [NEAR_DUPLICATE_PROBLEM]}
+        for question, match in zip(questions, matches) if match is not None
+    ]
+    return kept, rejected
 
-    # Define prompts for different generation tasks
-    # Using clear instructions, specific formats, and delimiters for better LLM performance
-    prompts = {
-        "explanation": (
-            "Explain the following educational text in simple, easy-to-understand terms for a student "
-            "who is new to the topic. Focus on clarity and conciseness, avoiding overly technical jargon. "
-            "Text:\n\n---\n{text}\n---"
-        ),
-        "quiz": (
-            "Generate a 5-question quiz based on the following educational text. "
-            "Each question should be either multiple-choice with 4 options (A, B, C, D) or a short answer question. "
-            "Provide the correct answer for each question clearly marked. "
-            "Format: \n\n1. Question?\nA) Option A\nB) Option B\nC) Option C\nD) Option D\nAnswer: [Correct Option]\n\n"
-            "2. Short answer question?\nAnswer: [Short Answer]\n\n"
-            "Text:\n\n---\n{text}\n---"
-        ),
-        "concepts": (
-            "List 5 to 10 key concepts or terms from the following educational content. "
-            "Present them as a clear bulleted list. "
-            "Text:\n\n---\n{text}\n---"
+async def generate_quiz_async(client: httpx.AsyncClient, semaphore: asyncio.Semaphore, text: str,
+                              count: int = QUIZ_QUESTION_COUNT, existing: list = None, key: str = None) -> dict:
+    """
+    Generates a structured quiz of count questions. Questions failing validation (wrong number of
+    options, bad answer key, duplicates) are dropped and only the missing ones are requested again,
+    listing the accepted and rejected questions so replacements neither repeat them nor come
+    back unchanged from the response cache. Questions in existing (e.g. the lesson's question bank)
+    count as duplicates; the most recent QUIZ_PROMPT_MAX_EXISTING of them are listed from the first
+    prompt on. With the lesson key, near-duplicates of its banked questions are rejected too.
+    Returns {"quiz": <rendered text>, "quiz_questions": [...], "quiz_validation": {...}}.
+    """
+    existing = existing or []
+    listed_existing = [q["question"] for q in existing[max(0, len(existing) - QUIZ_PROMPT_MAX_EXISTING):]]
+    questions, problems, avoided = [], set(), []
+    attempts, rejected_total, near_duplicate_total = 0, 0, 0
+
+    while len(questions) < count and attempts <= QUIZ_MAX_REGENERATION_ROUNDS:
+        missing = count - len(questions)
+        if attempts == 0 and not existing:
+            prompt = QUIZ_PROMPT.format(count=count, text=text)
+        else:
+            listed = dict.fromkeys(listed_existing + [q["question"] for q in questions] + avoided)
+            prompt = REPLACEMENT_PROMPT.format(
+                count=missing,
+                existing="\n".join(f"- {question}" for question in listed) or "- (none)",
+                problems="\n".join(f"- {problem}" for problem in sorted(problems)) or "- (none)",
+                text=text
+            )
+        attempts += 1
+        candidates = parse_quiz_response(await call_llm_async(client, semaphore, prompt, response_format=QUIZ_SCHEMA))
+        valid, rejected = validate_questions(candidates, accepted=existing + questions)
+        if key is not None:
+            valid, near_duplicates = split_near_duplicates(key, valid, questions)
+            rejected += near_duplicates
+            near_duplicate_total += len(near_duplicates)
+        questions += valid[:missing]
+        rejected_total += len(rejected)
+        problems |= {problem for item in rejected for problem in item["problems"]}
+        avoided += [item["question"]["question"] for item in rejected if item["question"]["question"]]
+        if not candidates:
+            problems.add('the response was not a JSON object with a "questions" list')
+        if attempts > 1:
+            print(f"INFO: Quiz regeneration round {attempts - 1}: {len(valid[:missing])} of {missing} missing question(s) replaced")
+
+    if len(questions) < count:
+        print(f"INFO: Quiz has {len(questions)} of {count} questions after {attempts - 1} regeneration round(s)")
+    return {
+        "quiz": render_quiz_text(questions),
+        "quiz_questions": questions,
+        "quiz_validation": {
+            "requested": count,
+            "valid": len(questions),
+            "rejected": rejected_total,
+            "near_duplicates": near_duplicate_total,
+            "regeneration_rounds": attempts - 1,
+        },
+    }
+
+async def generate_sectioned_quiz_async(client: httpx.AsyncClient, semaphore: asyncio.Semaphore, sections: list,
+                                        count: int = QUIZ_QUESTION_COUNT, existing: list = None, key: str = None) -> dict:
+    """
+    Generates a quiz over a sectioned lesson: count questions are allocated to sections in proportion
+    to their length, every section's questions are generated (and validated / regenerated) concurrently,
+    and the quiz is assembled in lesson order. Questions repeating (or, with the lesson key, rephrasing)
+    one from an earlier section are dropped, and replacements for them are requested once from their
+    sections, avoiding every accepted question. quiz_validation["sections"] reports the requested and
+    valid question count of every section that was allocated questions.
+    """
+    existing = existing or []
+    allocation = allocate_questions(sections, count)
+    planned = [(section, section_count) for section, section_count in zip(sections, allocation) if section_count]
+    by_section = [[] for _ in planned]
+    rejected_total, near_duplicate_total, regeneration_rounds = 0, 0, 0
+
+    for replacement_pass in (False, True):
+        wanted = [(i, section_count - len(by_section[i])) for i, (_, section_count) in enumerate(planned)]
+        wanted = [(i, missing) for i, missing in wanted if missing > 0]
+        if not wanted:
+            break
+        accepted = [question for questions in by_section for question in questions]
+        generated = await gather_tasks([
+            generate_quiz_async(client, semaphore, planned[i][0]["text"], missing, existing + accepted, key)
+            for i, missing in wanted
+        ])
+        for (i, _), result in zip(wanted, generated):
+            accepted = [question for questions in by_section for question in questions]
+            kept, duplicates = validate_questions(result["quiz_questions"], accepted=existing + accepted)
+            if key is not None:
+                kept, near_duplicates = split_near_duplicates(key, kept, accepted)
+                duplicates += near_duplicates
+                near_duplicate_total += len(near_duplicates)
+            by_section[i] += kept
+            rejected_total += result["quiz_validation"]["rejected"] + len(duplicates)
+            near_duplicate_total += result["quiz_validation"]["near_duplicates"]
+            regeneration_rounds = max(
+                regeneration_rounds, result["quiz_validation"]["regeneration_rounds"] + replacement_pass
+            )
+        if replacement_pass:
+            print(f"INFO: Sectioned quiz replaced cross-section duplicates in {len(wanted)} section(s)")
+
+    questions = [question for questions in by_section for question in questions]
+    return {
+        "quiz": render_quiz_text(questions),
+        "quiz_questions": questions,
+        "quiz_validation": {
+            "requested": count,
+            "valid": len(questions),
+            "rejected": rejected_total,
+            "near_duplicates": near_duplicate_total,
+            "regeneration_rounds": regeneration_rounds,
+            "sections": [
+                {"index": section["index"], "requested": section_count, "valid": len(section_questions)}
+                for (section, section_count), section_questions in zip(planned, by_section)
+            ],
+        },
+    }
+
+def generate_quiz(text: str, count: int = QUIZ_QUESTION_COUNT, existing: list = None, mode: str = "whole",
+                  max_concurrency: int = MAX_CONCURRENT_LLM_REQUESTS) -> dict:
+    """
+    Synchronous entry point for quiz generation over the whole lesson or, in "sectioned" mode, per section.
+    """
+    key = lesson_key(text)
+
+    async def run():
+        semaphore = asyncio.Semaphore(max_concurrency)
+        async with httpx.AsyncClient(timeout=OLLAMA_REQUEST_TIMEOUT_SECONDS) as client:
+            if mode == "sectioned":
+                sections = split_sections(text, SECTION_MAX_CHARS, SECTION_MIN_CHARS)
+                return await generate_sectioned_quiz_async(client, semaphore, sections, count, existing, key)
+            return await generate_quiz_async(client, semaphore, text, count, existing, key)
+    return asyncio.run(run())
+
+def top_up_question_bank(text: str, key: str, mode: str = "whole"):
+    """
+    Background task: generates up to QUESTION_BANK_TOPUP_BATCH new questions for a lesson's bank,
+    avoiding the ones it already holds, without growing it past QUESTION_BANK_MAX_SIZE. At most one
+    top-up per lesson runs at a time.
+    """
+    with bank_top_ups_lock:
+        if key in bank_top_ups:
+            return
+        bank_top_ups.add(key)
+    try:
+        started = time.perf_counter()
+        existing = question_bank.questions(key)
+        count = min(QUESTION_BANK_TOPUP_BATCH, QUESTION_BANK_MAX_SIZE - len(existing))
+        if count <= 0:
+            return
+        generated = generate_quiz(text, count=count, existing=existing, mode=mode)
+        added = question_bank.add_questions(key, generated["quiz_questions"])
+        print(f"INFO: Question bank top-up for lesson {key[:12]}: {added} question(s) added "
+              f"in {time.perf_counter() - started:.1f}s")
+    except Exception as e:
+        # A failed top-up only delays growth of the bank; the next quiz request schedules another
+        print(f"INFO: Question bank top-up for lesson {key[:12]} failed: {e}")
+    finally:
+        with bank_top_ups_lock:
+            bank_top_ups.discard(key)
+
+def serve_quiz(text: str, student_id: str, background_tasks: BackgroundTasks, mode: str = "whole",
+               generated: dict = None) -> dict:
+    """
+    Serves a quiz from the lesson's question bank. Only a lesson without enough banked questions
+    waits for generation (unless the caller already generated a quiz for it); otherwise the quiz is a
+    database read, and a background top-up is scheduled when the bank is below QUESTION_BANK_TARGET_SIZE
+    or the student has seen all of its questions (until it reaches QUESTION_BANK_MAX_SIZE).
+    """
+    key = lesson_key(text)
+    results = {}
+    if generated is None and question_bank.count(key) < QUIZ_QUESTION_COUNT:
+        generated = generate_quiz(text, existing=question_bank.questions(key), mode=mode)
+    if generated is not None:
+        question_bank.add_questions(key, generated["quiz_questions"])
+        results["quiz_validation"] = generated["quiz_validation"]
+        source = "generated"
+    else:
+        source = "bank"
+
+    questions, unseen = question_bank.sample(key, QUIZ_QUESTION_COUNT, student_id)
+    size = question_bank.count(key)
+    top_up = size < QUESTION_BANK_TARGET_SIZE or (
+        unseen is not None and unseen < QUIZ_QUESTION_COUNT and size < QUESTION_BANK_MAX_SIZE
+    )
+    if top_up:
+        background_tasks.add_task(top_up_question_bank, text, key, mode)
+
+    results.update({
+        "quiz": render_quiz_text(questions),
+        "quiz_questions": questions,
+        "quiz_source": source,
+        "question_bank": {"lesson_key": key, "size": size, "unseen": unseen, "top_up_scheduled": top_up},
+    })
+    return results
+
+def plan_concepts(text: str, concepts_mode: str) -> tuple:
+    """
+    Ranks local keyphrase candidates for a lesson (milliseconds, no LLM) and returns
+    (ranked, prompt, max_tokens): the LLM prompt still needed by the "polish" and "llm" modes, or None.
+    """
+    idf_table.add_document(lesson_key(text), text)
+    ranked = extract_keyphrases(text, idf_table, top_k=CONCEPT_COUNT * 2)
+    if concepts_mode == "llm":
+        return ranked, PROMPTS["concepts"].format(text=text), None
+    if concepts_mode == "polish" and ranked:
+        terms = "\n".join(f"- {item['phrase']}" for item in ranked)
+        return ranked, CONCEPT_POLISH_PROMPT.format(terms=terms, count=CONCEPT_COUNT), CONCEPT_POLISH_MAX_TOKENS
+    return ranked, None, None
+
+def finish_concepts(concepts_mode: str, ranked: list, output: str = None) -> dict:
+    """
+    Builds the concepts fields of a response from the local ranking and, if one was made, the LLM output.
+    A polish response that yields no usable terms falls back to the local ranking.
+    """
+    if concepts_mode == "llm":
+        concepts = output
+    else:
+        polished = parse_polished_concepts(output, ranked)[:CONCEPT_COUNT] if output else []
+        concepts = render_concepts(polished or [item["phrase"] for item in ranked[:CONCEPT_COUNT]])
+    return {"concepts": concepts, "concepts_ranked": ranked[:CONCEPT_COUNT], "concepts_source": concepts_mode}
+
+def generate_concepts(text: str, concepts_mode: str) -> dict:
+    ranked, prompt, max_tokens = plan_concepts(text, concepts_mode)
+    return finish_concepts(concepts_mode, ranked, call_llm(prompt, max_tokens=max_tokens) if prompt else None)
+
+async def run_sectioned_generation(sections: list, max_concurrency: int, quiz_count: int, existing: list, key: str,
+                                   concepts_prompt: str = None, concepts_max_tokens: int = None) -> tuple:
+    """
+    Generates every section's explanation, the sectioned quiz (when quiz_count > 0), and the key concepts
+    LLM step (when there is one) at the same time, sharing one client and at most max_concurrency
+    generations in flight. Returns (explanations, generated_quiz_or_None, concepts_output_or_None).
+    """
+    semaphore = asyncio.Semaphore(max_concurrency)
+    async with httpx.AsyncClient(timeout=OLLAMA_REQUEST_TIMEOUT_SECONDS) as client:
+        explanation_calls = [
+            call_llm_async(client, semaphore, SECTION_EXPLANATION_PROMPT.format(title=section["title"], text=section["text"]))
+            for section in sections
+        ]
+        quiz_call = (
+            generate_sectioned_quiz_async(client, semaphore, sections, quiz_count, existing, key) if quiz_count else None
+        )
+        concepts_call = (
+            call_llm_async(client, semaphore, concepts_prompt, max_tokens=concepts_max_tokens) if concepts_prompt else None
         )
+        extra = [call for call in (quiz_call, concepts_call) if call is not None]
+        outputs = await gather_tasks(explanation_calls + extra)
+    extra_outputs = iter(outputs[len(sections):])
+    generated = next(extra_outputs) if quiz_call else None
+    concepts = next(extra_outputs) if concepts_call else None
+    return outputs[:len(sections)], generated, concepts
+
+def generate_sectioned_aids(text: str, student_id: str, background_tasks: BackgroundTasks, max_concurrency: int,
+                            concepts_mode: str = CONCEPTS_MODE) -> dict:
+    """
+    "sectioned" mode of /generate/: splits the lesson at headings and paragraphs (see SECTION_MAX_CHARS)
+    and generates per-section explanations and quiz questions concurrently, so a long chapter takes
+    about as long as its slowest section when Ollama serves several requests in parallel.
+    """
+    started = time.perf_counter()
+    sections = split_sections(text, SECTION_MAX_CHARS, SECTION_MIN_CHARS)
+    key = lesson_key(text)
+    quiz_count = QUIZ_QUESTION_COUNT if question_bank.count(key) < QUIZ_QUESTION_COUNT else 0
+    ranked, concepts_prompt, concepts_max_tokens = plan_concepts(text, concepts_mode)
+    explanations, generated, concepts_output = asyncio.run(run_sectioned_generation(
+        sections, max_concurrency, quiz_count, question_bank.questions(key) if quiz_count else [], key,
+        concepts_prompt, concepts_max_tokens
+    ))
+
+    results = {"explanation": render_section_explanations(sections, explanations)}
+    results.update(serve_quiz(text, student_id, background_tasks, mode="sectioned", generated=generated))
+    results.update(finish_concepts(concepts_mode, ranked, concepts_output))
+    # Questions actually generated from each section; none when the quiz was served from the bank
+    generated_counts = {
+        entry["index"]: entry["valid"] for entry in (generated or {}).get("quiz_validation", {}).get("sections", [])
     }
+    allocation = allocate_questions(sections, QUIZ_QUESTION_COUNT)
+    results["sections"] = [
+        {
+            "index": section["index"],
+            "title": section["title"],
+            "chars": len(section["text"]),
+            "questions_planned": section_count,
+            "questions": generated_counts.get(section["index"], 0),
+        }
+        for section, section_count in zip(sections, allocation)
+    ]
+    print(f"INFO: Sectioned generation over {len(sections)} section(s) took {time.perf_counter() - started:.1f}s")
+    return results
+
+def validate_generation_options(mode: str, concepts_mode: str):
+    if mode not in LESSON_MODES:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Unsupported generation mode: '{mode}'. Supported modes are: {', '.join(LESSON_MODES)}"
+        )
+    if concepts_mode not in CONCEPT_MODES:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Unsupported concepts mode: '{concepts_mode}'. Supported modes are: {', '.join(CONCEPT_MODES)}"
+        )
+
+def build_learning_aids(text: str, student_id: str, background_tasks: BackgroundTasks, mode: str = "whole",
+                        max_concurrency: int = MAX_CONCURRENT_LLM_REQUESTS, concepts_mode: str = CONCEPTS_MODE) -> dict:
+    """
+    Live generation of the explanation, quiz, and key concepts for a lesson (the /generate/ pipeline).
+    """
+    if mode == "sectioned":
+        try:
+            return generate_sectioned_aids(text, student_id, background_tasks, max_concurrency, concepts_mode)
+        except HTTPException as e:
+            raise e
+        except Exception as e:
+            raise HTTPException(status_code=500, detail=f"An unexpected error occurred during sectioned generation: {e}")
 
     results = {}
-    for key, prompt_template in prompts.items():
+    for key, prompt_template in PROMPTS.items():
         try:
+            if key == "quiz":
+                results.update(serve_quiz(text, student_id, background_tasks))
+                continue
+            if key == "concepts":
+                results.update(generate_concepts(text, concepts_mode))
+                continue
             formatted_prompt = prompt_template.format(text=text)
             results[key] = call_llm(formatted_prompt)
         except HTTPException as e:
@@ -137,6 +713,376 @@ def generate_learning_aids(text: str = Form(...)):
 
     return results
 
+def pregenerate_lesson(text: str, mode: str, concepts_mode: str) -> dict:
+    """
+    Pre-generation job: runs the /generate/ pipeline for a registered lesson, then grows its question
+    bank to QUESTION_BANK_TARGET_SIZE right away instead of waiting for student requests to trigger top-ups.
+    Returns the PRECOMPUTED_FIELDS of the result for the lesson library.
+    """
+    results = build_learning_aids(text, None, BackgroundTasks(), mode, MAX_CONCURRENT_LLM_REQUESTS, concepts_mode)
+    key = lesson_key(text)
+    size = question_bank.count(key)
+    while size < QUESTION_BANK_TARGET_SIZE:
+        top_up_question_bank(text, key, mode)
+        size, previous = question_bank.count(key), size
+        if size == previous: # The model keeps repeating itself (or failed); stop rather than spin
+            break
+    return {field: results[field] for field in PRECOMPUTED_FIELDS if field in results}
+
+@app.post("/generate/")
+def generate_learning_aids(
+    background_tasks: BackgroundTasks,
+    text: str = Form(...),
+    student_id: str = Form(None),
+    mode: str = Form("whole"),
+    max_concurrency: int = Form(MAX_CONCURRENT_LLM_REQUESTS),
+    concepts_mode: str = Form(CONCEPTS_MODE)
+):
+    """
+    Generates a simplified explanation, a quiz, and key concepts from educational text.
+    The quiz is sampled from the lesson's question bank; pass student_id to get unseen questions first.
+    mode selects the pipeline (see LESSON_MODES); in "sectioned" mode max_concurrency caps
+    how many section prompts are in flight at once. concepts_mode selects how key concepts are
+    produced (see CONCEPT_MODES). Aids precomputed for a registered lesson (see POST /lessons/) are
+    served without generation; "precomputed" in the response tells which path was taken.
+    """
+    if not text.strip():
+        raise HTTPException(status_code=400, detail="Educational text cannot be empty.")
+    validate_generation_options(mode, concepts_mode)
+    if max_concurrency < 1:
+        raise HTTPException(status_code=400, detail="max_concurrency must be at least 1.")
+
+    key = lesson_key(text)
+    aids = lesson_library.get_aids(key, mode, concepts_mode)
+    if aids is not None:
+        try:
+            results = dict(aids)
+            results.update(serve_quiz(text, student_id, background_tasks, mode=mode))
+        except HTTPException as e:
+            raise e
+        except Exception as e:
+            raise HTTPException(status_code=500, detail=f"An unexpected error occurred during quiz generation: {e}")
+        results["precomputed"] = True
+        return results
+
+    started = time.perf_counter()
+    with track_live_request():
+        results = build_learning_aids(text, student_id, background_tasks, mode, max_concurrency, concepts_mode)
+    if lesson_library.is_registered(key):
+        # A registered lesson requested before its job ran: keep the result so the queued job is skipped
+        lesson_library.save_aids(
+            key, mode, concepts_mode, {field: results[field] for field in PRECOMPUTED_FIELDS if field in results},
+            round(time.perf_counter() - started, 3)
+        )
+    results["precomputed"] = False
+    return results
+
+@app.post("/generate/stream")
+async def generate_learning_aids_stream(
+    text: str = Form(...),
+    max_concurrency: int = Form(MAX_CONCURRENT_LLM_REQUESTS)
+):
+    """
+    Server-Sent Events variant of /generate/: streams tokens for the explanation, quiz, and concepts sections
+    as Ollama produces them, each event tagged with its section, followed by a final "done" event with timings.
+    """
+    if not text.strip():
+        raise HTTPException(status_code=400, detail="Educational text cannot be empty.")
+    if max_concurrency < 1:
+        raise HTTPException(status_code=400, detail="max_concurrency must be at least 1.")
+
+    formatted_prompts = {key: template.format(text=text) for key, template in PROMPTS.items()}
+    events = stream_sections(
+        formatted_prompts,
+        base_url=OLLAMA_API_BASE_URL,
+        model=LLM_MODEL,
+        timeout=OLLAMA_REQUEST_TIMEOUT_SECONDS,
+        max_concurrency=max_concurrency,
+        cache=llm_cache,
+        cache_key_fn=lambda prompt: make_cache_key(prompt, LLM_MODEL, PROMPT_TEMPLATE_VERSION)
+    )
+    async def tracked_events():
+        # Streaming counts as interactive use of the LLM, so pre-generation waits for it to finish
+        with track_live_request():
+            async for event in events:
+                yield event
+
+    # X-Accel-Buffering stops reverse proxies such as nginx from holding back the stream
+    return StreamingResponse(
+        tracked_events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+@app.get("/cache/stats")
+def cache_stats():
+    """
+    Returns hit/miss counters and tier sizes of the LLM response cache.
+    """
+    if llm_cache is None:
+        return {"enabled": False}
+    return {"enabled": True, "model": LLM_MODEL, "prompt_template_version": PROMPT_TEMPLATE_VERSION, **llm_cache.stats()}
+
+@app.delete("/cache/")
+def clear_cache():
+    """
+    Empties both tiers of the LLM response cache.
+    """
+    if llm_cache is None:
+        raise HTTPException(status_code=404, detail="LLM response cache is disabled (LLM_CACHE_ENABLED=false).")
+    llm_cache.clear()
+    return {"cleared": True}
+
+def index_lesson_library():
+    """
+    Adds every .txt / .md lesson under LESSON_LIBRARY_DIR to the keyphrase IDF table; lessons already counted are skipped.
+    """
+    added, started = 0, time.perf_counter()
+    for root, _, files in os.walk(LESSON_LIBRARY_DIR):
+        for name in sorted(files):
+            if not name.lower().endswith((".txt", ".md")):
+                continue
+            try:
+                with open(os.path.join(root, name), encoding="utf-8", errors="replace") as f:
+                    lesson = f.read()
+            except OSError as e:
+                print(f"INFO: Skipping lesson file {name}: {e}")
+                continue
+            if lesson.strip() and idf_table.add_document(lesson_key(lesson), lesson):
+                added += 1
+    print(f"INFO: Indexed {added} new lesson(s) from {LESSON_LIBRARY_DIR} for keyphrase IDF "
+          f"in {time.perf_counter() - started:.2f}s ({idf_table.stats()['documents']} in total)")
+
+@app.on_event("startup")
+def start_lesson_library_indexing():
+    """
+    Builds the IDF table from the lesson library in a background thread so startup is not delayed.
+    """
+    threading.Thread(target=index_lesson_library, name="lesson-library-idf", daemon=True).start()
+
+def index_question_bank():
+    """
+    Adds questions banked before the near-duplicate index existed (or before its parameters changed) to it.
+    """
+    started = time.perf_counter()
+    indexed = question_bank.index_unindexed()
+    if indexed:
+        print(f"INFO: Indexed {indexed} banked question(s) for near-duplicate detection in {time.perf_counter() - started:.2f}s")
+
+@app.on_event("startup")
+def start_question_bank_indexing():
+    """
+    Backfills the near-duplicate index in a background thread so startup is not delayed.
+    """
+    if question_bank.index is not None:
+        threading.Thread(target=index_question_bank, name="question-bank-minhash", daemon=True).start()
+
+@app.get("/concepts/idf/stats")
+def idf_stats():
+    """
+    Returns the size of the keyphrase IDF table (lessons counted and distinct terms).
+    """
+    return {"path": IDF_TABLE_PATH, "library_dir": LESSON_LIBRARY_DIR, **idf_table.stats()}
+
+@app.get("/question-bank/stats")
+def question_bank_stats():
+    """
+    Returns question bank sizes and the lessons with a top-up in progress.
+    """
+    with bank_top_ups_lock:
+        in_progress = len(bank_top_ups)
+    return {
+        "path": QUESTION_BANK_PATH,
+        "target_size": QUESTION_BANK_TARGET_SIZE,
+        "max_size": QUESTION_BANK_MAX_SIZE,
+        "top_ups_in_progress": in_progress,
+        **question_bank.stats()
+    }
+
+@app.post("/lessons/")
+def register_lesson(
+    text: str = Form(...),
+    title: str = Form(None),
+    priority: int = Form(0),
+    mode: str = Form("whole"),
+    concepts_mode: str = Form(CONCEPTS_MODE)
+):
+    """
+    Registers a lesson and queues pre-generation of its learning aids for the given mode and concepts_mode.
+    Higher priority jobs run first; registering a lesson again only updates its title and can raise its priority.
+    """
+    if not text.strip():
+        raise HTTPException(status_code=400, detail="Educational text cannot be empty.")
+    validate_generation_options(mode, concepts_mode)
+
+    key = lesson_key(text)
+    lesson_library.register(key, text, title)
+    idf_table.add_document(key, text)
+    if lesson_library.get_aids(key, mode, concepts_mode) is not None:
+        job = {"job_id": None, "status": "precomputed", "priority": priority}
+    else:
+        job = pregeneration_queue.enqueue(key, mode, concepts_mode, priority)
+    return {"lesson_key": key, "title": title, "mode": mode, "concepts_mode": concepts_mode, **job}
+
+@app.get("/lessons/")
+def list_lessons(limit: int = 100):
+    """
+    Lists registered lessons, newest first, with how many option sets have precomputed aids.
+    """
+    return {"lessons": lesson_library.list_lessons(limit)}
+
+@app.get("/lessons/{lesson_key}")
+def get_lesson(lesson_key: str):
+    """
+    Returns a registered lesson and the mode / concepts_mode combinations precomputed for it.
+    """
+    lesson = lesson_library.get_lesson(lesson_key)
+    if lesson is None:
+        raise HTTPException(status_code=404, detail=f"Lesson '{lesson_key}' is not registered.")
+    return lesson
+
+@app.get("/pregeneration/stats")
+def pregeneration_stats():
+    """
+    Returns queue depth, lag (age of the oldest queued job), and per-job wait and run times of recent jobs.
+    """
+    with live_requests_lock:
+        in_progress = live_requests
+    return {"workers": PREGENERATION_WORKERS, "live_requests": in_progress, **pregeneration_queue.stats()}
+
+def grade_ambiguous_answers(prompt: str) -> str:
+    """
+    One LLM call grading a batch of ambiguous short answers (see AmbiguousAnswerBatcher).
+    """
+    with track_live_request():
+        return call_llm(prompt, response_format=GRADING_SCHEMA)
+
+@app.post("/quiz/sessions/")
+def start_quiz_session(
+    background_tasks: BackgroundTasks,
+    student_id: str = Form(...),
+    text: str = Form(None),
+    key: str = Form(None, alias="lesson_key"),
+    length: int = Form(QUIZ_QUESTION_COUNT)
+):
+    """
+    Starts an adaptive quiz session of length questions for a student, on a lesson given by its text or,
+    for a registered lesson, its lesson_key. Questions are generated first only if the lesson's question
+    bank holds fewer than length. Returns the session with its first question (without the answer).
+    """
+    if not student_id.strip():
+        raise HTTPException(status_code=400, detail="student_id cannot be empty.")
+    if length < 1:
+        raise HTTPException(status_code=400, detail="length must be at least 1.")
+    if text and text.strip():
+        key = lesson_key(text)
+    elif key:
+        lesson = lesson_library.get_lesson(key)
+        text = lesson["text"] if lesson else None
+    else:
+        raise HTTPException(status_code=400, detail="Provide the lesson text or the lesson_key of a registered lesson.")
+
+    banked = question_bank.count(key)
+    if banked < length:
+        if text is None:
+            raise HTTPException(status_code=404, detail=f"Lesson '{key}' is not registered and has no questions banked.")
+        try:
+            with track_live_request():
+                generated = generate_quiz(text, count=length - banked, existing=question_bank.questions(key))
+            question_bank.add_questions(key, generated["quiz_questions"])
+        except HTTPException as e:
+            raise e
+        except Exception as e:
+            raise HTTPException(status_code=500, detail=f"An unexpected error occurred during quiz generation: {e}")
+    if text is not None and question_bank.count(key) < QUESTION_BANK_TARGET_SIZE:
+        background_tasks.add_task(top_up_question_bank, text, key)
+    return quiz_sessions.create(key, student_id.strip(), length)
+
+@app.post("/quiz/sessions/{session_id}/answers")
+async def answer_quiz_question(session_id: str, question_id: int = Form(...), answer: str = Form(...)):
+    """
+    Grades the answer to the session's current question and returns the result with the next question.
+    Multiple-choice answers (a letter or the option text) and clear short answers are graded locally;
+    ambiguous short answers await a batched LLM grading call without holding a threadpool thread, so
+    they never hold up locally graded answers.
+    """
+    found = await run_in_threadpool(quiz_sessions.current, session_id)
+    if found is None:
+        raise HTTPException(status_code=404, detail=f"Quiz session '{session_id}' not found.")
+    session, key = found
+    if session["finished"]:
+        raise HTTPException(status_code=400, detail="This quiz session is already finished.")
+    if question_id != session["next_question"]["id"]:
+        raise HTTPException(status_code=400, detail=f"Question {question_id} is not the current question of this session.")
+
+    started = time.perf_counter()
+    similarity = None
+    if key["type"] == "multiple_choice":
+        correct, _ = grade_choice(answer, key)
+        method = "choice"
+    else:
+        correct, method, similarity = grade_short_answer(answer, key, SHORT_ANSWER_ACCEPT_RATIO, SHORT_ANSWER_REJECT_RATIO)
+        if correct is None:
+            try:
+                correct = await asyncio.wait_for(
+                    asyncio.wrap_future(grading_batcher.submit(key["question"], key["answer"], answer)),
+                    timeout=OLLAMA_REQUEST_TIMEOUT_SECONDS
+                )
+                method = "llm"
+            except Exception as e:
+                # Without the LLM, split the ambiguous band at its midpoint rather than fail the student's answer;
+                # a negated answer is still marked wrong
+                print(f"INFO: LLM grading failed, falling back to fuzzy matching: {getattr(e, 'detail', e)}")
+                correct = (similarity >= (SHORT_ANSWER_ACCEPT_RATIO + SHORT_ANSWER_REJECT_RATIO) / 2
+                           and not adds_negation(answer, key))
+                method = "fuzzy_fallback"
+    grading_ms = round((time.perf_counter() - started) * 1000, 2)
+
+    try:
+        session = await run_in_threadpool(quiz_sessions.record, session_id, question_id, answer, correct, method, similarity)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return {
+        "question_id": question_id,
+        "correct": correct,
+        "correct_answer": key["answer"],
+        "method": method,
+        "similarity": similarity,
+        "grading_ms": grading_ms,
+        **session
+    }
+
+@app.get("/quiz/sessions/{session_id}")
+def get_quiz_session(session_id: str):
+    """
+    Returns a quiz session's progress, score, current question, and graded answers.
+    """
+    found = quiz_sessions.current(session_id)
+    if found is None:
+        raise HTTPException(status_code=404, detail=f"Quiz session '{session_id}' not found.")
+    return {**found[0], "answers": quiz_sessions.answers(session_id)}
+
+@app.get("/quiz/grading/stats")
+def quiz_grading_stats():
+    """
+    Returns session counts, answers graded per method, and the batching of LLM-graded short answers.
+    """
+    return {
+        "accept_ratio": SHORT_ANSWER_ACCEPT_RATIO,
+        "reject_ratio": SHORT_ANSWER_REJECT_RATIO,
+        "target_accuracy": ADAPTIVE_TARGET_ACCURACY,
+        **quiz_sessions.stats(),
+        "llm_grading": grading_batcher.stats()
+    }
+
+@app.on_event("startup")
+def start_pregeneration():
+    """
+    Starts the pre-generation workers, re-queuing jobs interrupted by the last shutdown.
+    """
+    resumed = pregeneration_queue.start()
+    print(f"INFO: Pre-generation started with {PREGENERATION_WORKERS} worker(s); {resumed} interrupted job(s) re-queued")
+
 # Example of how to run this backend:
 # Make sure you have uvicorn installed: pip install uvicorn
 # Run from the 'ai-tutor-learnsphere' directory:
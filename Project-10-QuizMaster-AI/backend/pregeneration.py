@@ -0,0 +1,285 @@
+# backend/pregeneration.py
+
+import json
+import os
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+
+class LessonLibrary:
+    """
+    SQLite store of registered lessons and their precomputed learning aids, keyed by lesson_key.
+    Aids are stored per (lesson, mode, concepts_mode), since those options change the output.
+    """
+
+    def __init__(self, db_path: str):
+        self.db_path = db_path
+        os.makedirs(os.path.dirname(db_path) or ".", exist_ok=True)
+        with self._connect() as db:
+            db.execute("PRAGMA journal_mode=WAL")
+            db.execute(
+                "CREATE TABLE IF NOT EXISTS lessons ("
+                "key TEXT PRIMARY KEY, title TEXT, text TEXT NOT NULL, registered_at REAL NOT NULL)"
+            )
+            db.execute(
+                "CREATE TABLE IF NOT EXISTS precomputed_aids ("
+                "lesson_key TEXT NOT NULL, mode TEXT NOT NULL, concepts_mode TEXT NOT NULL, "
+                "aids TEXT NOT NULL, generated_at REAL NOT NULL, duration_seconds REAL, "
+                "PRIMARY KEY (lesson_key, mode, concepts_mode))"
+            )
+
+    @contextmanager
+    def _connect(self):
+        db = sqlite3.connect(self.db_path, timeout=30)
+        try:
+            with db:
+                yield db
+        finally:
+            db.close()
+
+    def register(self, key: str, text: str, title: str = None):
+        with self._connect() as db:
+            db.execute(
+                "INSERT INTO lessons (key, title, text, registered_at) VALUES (?, ?, ?, ?) "
+                "ON CONFLICT(key) DO UPDATE SET title = COALESCE(excluded.title, lessons.title)",
+                (key, title, text, time.time())
+            )
+
+    def is_registered(self, key: str) -> bool:
+        with self._connect() as db:
+            return db.execute("SELECT 1 FROM lessons WHERE key = ?", (key,)).fetchone() is not None
+
+    def get_lesson(self, key: str):
+        """
+        Returns {"lesson_key", "title", "text", "registered_at", "precomputed": [...]} or None.
+        """
+        with self._connect() as db:
+            row = db.execute("SELECT key, title, text, registered_at FROM lessons WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                return None
+            aids = db.execute(
+                "SELECT mode, concepts_mode, generated_at, duration_seconds FROM precomputed_aids "
+                "WHERE lesson_key = ? ORDER BY generated_at", (key,)
+            ).fetchall()
+        return {
+            "lesson_key": row[0], "title": row[1], "text": row[2], "registered_at": row[3],
+            "precomputed": [
+                {"mode": aid[0], "concepts_mode": aid[1], "generated_at": aid[2], "duration_seconds": aid[3]}
+                for aid in aids
+            ],
+        }
+
+    def list_lessons(self, limit: int = 100) -> list:
+        with self._connect() as db:
+            rows = db.execute(
+                "SELECT l.key, l.title, LENGTH(l.text), l.registered_at, COUNT(p.lesson_key) FROM lessons l "
+                "LEFT JOIN precomputed_aids p ON p.lesson_key = l.key "
+                "GROUP BY l.key ORDER BY l.registered_at DESC LIMIT ?",
+                (limit,)
+            ).fetchall()
+        return [
+            {"lesson_key": row[0], "title": row[1], "chars": row[2], "registered_at": row[3], "precomputed": row[4]}
+            for row in rows
+        ]
+
+    def get_aids(self, key: str, mode: str, concepts_mode: str):
+        with self._connect() as db:
+            row = db.execute(
+                "SELECT aids FROM precomputed_aids WHERE lesson_key = ? AND mode = ? AND concepts_mode = ?",
+                (key, mode, concepts_mode)
+            ).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def save_aids(self, key: str, mode: str, concepts_mode: str, aids: dict, duration_seconds: float = None):
+        with self._connect() as db:
+            db.execute(
+                "INSERT OR REPLACE INTO precomputed_aids "
+                "(lesson_key, mode, concepts_mode, aids, generated_at, duration_seconds) VALUES (?, ?, ?, ?, ?, ?)",
+                (key, mode, concepts_mode, json.dumps(aids), time.time(), duration_seconds)
+            )
+
+class PregenerationQueue:
+    """
+    Persistent priority queue of pre-generation jobs, worked by background threads.
+
+    Jobs run highest priority first, then oldest first, and only while is_idle() reports that no
+    interactive request is using the LLM, so pre-generation soaks up idle Ollama capacity instead of
+    competing with students. Jobs left running by a previous server run are re-queued by start().
+    """
+
+    def __init__(self, db_path: str, library: LessonLibrary, generate_fn, is_idle, workers: int = 1,
+                 idle_poll_seconds: float = 1.0):
+        # generate_fn(text, mode, concepts_mode) -> dict of aids; raises on failure
+        self.db_path = db_path
+        self.library = library
+        self.generate_fn = generate_fn
+        self.is_idle = is_idle
+        self.workers = workers
+        self.idle_poll_seconds = idle_poll_seconds
+        self._wakeup = threading.Condition()
+        self._threads = []
+
+        os.makedirs(os.path.dirname(db_path) or ".", exist_ok=True)
+        with self._connect() as db:
+            db.execute("PRAGMA journal_mode=WAL")
+            db.execute(
+                "CREATE TABLE IF NOT EXISTS pregeneration_jobs ("
+                "id INTEGER PRIMARY KEY AUTOINCREMENT, lesson_key TEXT NOT NULL, mode TEXT NOT NULL, "
+                "concepts_mode TEXT NOT NULL, priority INTEGER NOT NULL, status TEXT NOT NULL, "
+                "enqueued_at REAL NOT NULL, started_at REAL, finished_at REAL, error TEXT)"
+            )
+            db.execute(
+                "CREATE INDEX IF NOT EXISTS idx_pregeneration_jobs_queue "
+                "ON pregeneration_jobs(status, priority DESC, enqueued_at)"
+            )
+
+    @contextmanager
+    def _connect(self):
+        db = sqlite3.connect(self.db_path, timeout=30)
+        try:
+            with db:
+                yield db
+        finally:
+            db.close()
+
+    def enqueue(self, key: str, mode: str, concepts_mode: str, priority: int = 0) -> dict:
+        """
+        Queues a lesson for pre-generation. If the same lesson and options are already queued, the job
+        keeps its place and only its priority is raised. Returns {"job_id", "status", "priority"}.
+        """
+        with self._connect() as db:
+            existing = db.execute(
+                "SELECT id, status, priority FROM pregeneration_jobs WHERE lesson_key = ? AND mode = ? "
+                "AND concepts_mode = ? AND status IN ('queued', 'running') ORDER BY id DESC LIMIT 1",
+                (key, mode, concepts_mode)
+            ).fetchone()
+            if existing:
+                if existing[1] == "queued" and priority > existing[2]:
+                    db.execute("UPDATE pregeneration_jobs SET priority = ? WHERE id = ?", (priority, existing[0]))
+                return {"job_id": existing[0], "status": existing[1], "priority": max(priority, existing[2])}
+            job_id = db.execute(
+                "INSERT INTO pregeneration_jobs (lesson_key, mode, concepts_mode, priority, status, enqueued_at) "
+                "VALUES (?, ?, ?, ?, 'queued', ?)",
+                (key, mode, concepts_mode, priority, time.time())
+            ).lastrowid
+        with self._wakeup:
+            self._wakeup.notify()
+        return {"job_id": job_id, "status": "queued", "priority": priority}
+
+    def start(self) -> int:
+        """
+        Re-queues jobs interrupted by a restart and starts the worker threads. Returns the number re-queued.
+        """
+        with self._connect() as db:
+            resumed = db.execute(
+                "UPDATE pregeneration_jobs SET status = 'queued', started_at = NULL WHERE status = 'running'"
+            ).rowcount
+        for number in range(self.workers - len(self._threads)):
+            thread = threading.Thread(target=self._work, name=f"learnsphere-pregen-{number}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+        return resumed
+
+    def _claim_next(self):
+        """
+        Atomically marks the best queued job as running and returns (id, lesson_key, mode, concepts_mode), or None.
+        """
+        with self._connect() as db:
+            db.execute("BEGIN IMMEDIATE")
+            row = db.execute(
+                "SELECT id, lesson_key, mode, concepts_mode FROM pregeneration_jobs WHERE status = 'queued' "
+                "ORDER BY priority DESC, enqueued_at LIMIT 1"
+            ).fetchone()
+            if row:
+                db.execute(
+                    "UPDATE pregeneration_jobs SET status = 'running', started_at = ? WHERE id = ?", (time.time(), row[0])
+                )
+        return row
+
+    def _has_queued(self) -> bool:
+        with self._connect() as db:
+            return db.execute("SELECT 1 FROM pregeneration_jobs WHERE status = 'queued' LIMIT 1").fetchone() is not None
+
+    def _work(self):
+        while True:
+            # Sleep until there is work, then until the LLM is idle
+            with self._wakeup:
+                while not self._has_queued():
+                    self._wakeup.wait(timeout=30)
+            if not self.is_idle():
+                time.sleep(self.idle_poll_seconds)
+                continue
+            job = self._claim_next()
+            if job is not None:
+                self._run(*job)
+
+    def _run(self, job_id: int, key: str, mode: str, concepts_mode: str):
+        started = time.perf_counter()
+        status, error = "completed", None
+        try:
+            if self.library.get_aids(key, mode, concepts_mode) is None:
+                lesson = self.library.get_lesson(key)
+                if lesson is None:
+                    raise ValueError(f"Lesson '{key}' is not registered.")
+                aids = self.generate_fn(lesson["text"], mode, concepts_mode)
+                self.library.save_aids(key, mode, concepts_mode, aids, round(time.perf_counter() - started, 3))
+        except Exception as e:
+            # HTTPException carries its message in .detail; anything else in str(e)
+            status, error = "failed", str(getattr(e, "detail", e))
+            print(f"INFO: Pre-generation job {job_id} for lesson {key[:12]} failed: {error}")
+        with self._connect() as db:
+            db.execute(
+                "UPDATE pregeneration_jobs SET status = ?, error = ?, finished_at = ? WHERE id = ?",
+                (status, error, time.time(), job_id)
+            )
+        if status == "completed":
+            print(f"INFO: Pre-generated lesson {key[:12]} ({mode}, concepts {concepts_mode}) "
+                  f"in {time.perf_counter() - started:.1f}s")
+
+    def stats(self, recent: int = 20) -> dict:
+        """
+        Queue depth by status and priority, lag (age of the oldest queued job), and timings of recent jobs.
+        """
+        now = time.time()
+        with self._connect() as db:
+            counts = dict(db.execute("SELECT status, COUNT(*) FROM pregeneration_jobs GROUP BY status").fetchall())
+            by_priority = db.execute(
+                "SELECT priority, COUNT(*) FROM pregeneration_jobs WHERE status = 'queued' "
+                "GROUP BY priority ORDER BY priority DESC"
+            ).fetchall()
+            oldest = db.execute("SELECT MIN(enqueued_at) FROM pregeneration_jobs WHERE status = 'queued'").fetchone()[0]
+            jobs = db.execute(
+                "SELECT id, lesson_key, mode, concepts_mode, priority, status, enqueued_at, started_at, finished_at, error "
+                "FROM pregeneration_jobs WHERE status IN ('completed', 'failed', 'running') "
+                "ORDER BY COALESCE(finished_at, started_at) DESC LIMIT ?",
+                (recent,)
+            ).fetchall()
+
+        recent_jobs = [
+            {
+                "job_id": job[0], "lesson_key": job[1], "mode": job[2], "concepts_mode": job[3], "priority": job[4],
+                "status": job[5], "error": job[9],
+                "wait_seconds": round(job[7] - job[6], 3) if job[7] else None,
+                "duration_seconds": round(job[8] - job[7], 3) if job[7] and job[8] else None,
+            }
+            for job in jobs
+        ]
+        durations = sorted(job["duration_seconds"] for job in recent_jobs if job["status"] == "completed")
+        waits = [job["wait_seconds"] for job in recent_jobs if job["wait_seconds"] is not None]
+        return {
+            "depth": counts.get("queued", 0),
+            "running": counts.get("running", 0),
+            "completed": counts.get("completed", 0),
+            "failed": counts.get("failed", 0),
+            "queued_by_priority": {str(priority): count for priority, count in by_priority},
+            "lag_seconds": round(now - oldest, 3) if oldest else 0.0,
+            "llm_idle": self.is_idle(),
+            "recent": {
+                "jobs": len(recent_jobs),
+                "avg_duration_seconds": round(sum(durations) / len(durations), 3) if durations else None,
+                "max_duration_seconds": durations[-1] if durations else None,
+                "avg_wait_seconds": round(sum(waits) / len(waits), 3) if waits else None,
+            },
+            "recent_jobs": recent_jobs,
+        }
@@ -0,0 +1,180 @@
+# backend/question_bank.py
+
+import hashlib
+import json
+import os
+import sqlite3
+import time
+from contextlib import contextmanager
+
+from backend.llm_cache import normalize_text
+from backend.question_dedup import MinHashIndex
+from backend.quiz_schema import normalize_key
+
+def lesson_key(text: str) -> str:
+    """
+    Content hash identifying a lesson: SHA-256 of the normalized lesson text.
+    """
+    return hashlib.sha256(normalize_text(text).encode("utf-8")).hexdigest()
+
+class QuestionBank:
+    """
+    SQLite store of every validated quiz question generated per lesson, keyed by lesson_key.
+    Quizzes are sampled from the bank; a student's seen questions are tracked so they get
+    unseen questions first. With a near_duplicate_threshold, a MinHash LSH index over question text,
+    correct answers, and option sets (in the same database) keeps near-duplicates of banked questions out.
+    """
+
+    def __init__(self, db_path: str, near_duplicate_threshold: float = None):
+        self.db_path = db_path
+        os.makedirs(os.path.dirname(db_path) or ".", exist_ok=True)
+        with self._connect() as db:
+            db.execute("PRAGMA journal_mode=WAL")
+            db.execute(
+                "CREATE TABLE IF NOT EXISTS questions ("
+                "id INTEGER PRIMARY KEY AUTOINCREMENT, lesson_key TEXT NOT NULL, question_key TEXT NOT NULL, "
+                "type TEXT NOT NULL, question TEXT NOT NULL, options TEXT NOT NULL, answer TEXT NOT NULL, "
+                "created_at REAL NOT NULL, UNIQUE (lesson_key, question_key))"
+            )
+            db.execute(
+                "CREATE TABLE IF NOT EXISTS seen_questions ("
+                "student_id TEXT NOT NULL, question_id INTEGER NOT NULL, lesson_key TEXT NOT NULL, seen_at REAL NOT NULL, "
+                "PRIMARY KEY (student_id, question_id))"
+            )
+            db.execute("CREATE INDEX IF NOT EXISTS idx_seen_questions_lesson ON seen_questions(lesson_key, student_id)")
+        self.index = MinHashIndex(db_path, threshold=near_duplicate_threshold) if near_duplicate_threshold else None
+
+    @contextmanager
+    def _connect(self):
+        db = sqlite3.connect(self.db_path, timeout=30)
+        try:
+            with db:
+                yield db
+        finally:
+            db.close()
+
+    @staticmethod
+    def _row_to_question(row) -> dict:
+        return {"id": row[0], "type": row[1], "question": row[2], "options": json.loads(row[3]), "answer": row[4]}
+
+    def add_questions(self, key: str, questions: list) -> int:
+        """
+        Stores validated questions for a lesson, skipping ones already in its bank and, with the
+        near-duplicate index, ones too similar to a banked question. Returns how many were added.
+        """
+        if self.index is not None:
+            matches = self.find_near_duplicates(key, questions)
+            questions = [question for question, match in zip(questions, matches) if match is None]
+        now = time.time()
+        added = []
+        with self._connect() as db:
+            for question in questions:
+                cursor = db.execute(
+                    "INSERT OR IGNORE INTO questions (lesson_key, question_key, type, question, options, answer, created_at) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                    (key, normalize_key(question["question"]), question["type"], question["question"],
+                     json.dumps(question["options"]), question["answer"], now)
+                )
+                if cursor.rowcount:
+                    added.append((cursor.lastrowid, question))
+        if self.index is not None:
+            self.index.insert(key, [(question_id, self.index.signature(question)) for question_id, question in added])
+        return len(added)
+
+    def find_near_duplicates(self, key: str, questions: list, pending: list = None) -> list:
+        """
+        For each question, the near-duplicate it would add to the lesson: {"question_id", "similarity"} for
+        a banked question, {"question", "similarity"} for one in pending (not yet banked, e.g. accepted
+        earlier in the same quiz) or earlier in questions, or None. Returns all None without the index.
+        """
+        if self.index is None:
+            return [None] * len(questions)
+        accepted = [(question, self.index.signature(question)) for question in pending or []]
+        matches = []
+        for question in questions:
+            signature = self.index.signature(question)
+            match = self.index.query(key, signature)
+            if match is not None:
+                matches.append({"question_id": match[0], "similarity": match[1]})
+                continue
+            scores = [(self.index.similarity(signature, other), other_question) for other_question, other in accepted]
+            best = max(scores, key=lambda item: item[0], default=(0.0, None))
+            if best[0] >= self.index.threshold:
+                matches.append({"question": best[1]["question"], "similarity": round(best[0], 3)})
+                continue
+            matches.append(None)
+            accepted.append((question, signature))
+        return matches
+
+    def index_unindexed(self, batch_size: int = 1000) -> int:
+        """
+        Adds banked questions missing from the near-duplicate index (e.g. banked before it existed). Returns how many.
+        """
+        if self.index is None:
+            return 0
+        indexed = 0
+        while True:
+            with self._connect() as db:
+                rows = db.execute(
+                    "SELECT id, lesson_key, question, options, answer FROM questions WHERE id NOT IN "
+                    "(SELECT question_id FROM minhash_signatures) ORDER BY id LIMIT ?",
+                    (batch_size,)
+                ).fetchall()
+            if not rows:
+                return indexed
+            by_lesson = {}
+            for question_id, key, question, options, answer in rows:
+                signature = self.index.signature({"question": question, "options": json.loads(options), "answer": answer})
+                by_lesson.setdefault(key, []).append((question_id, signature))
+            for key, items in by_lesson.items():
+                self.index.insert(key, items)
+            indexed += len(rows)
+
+    def count(self, key: str) -> int:
+        with self._connect() as db:
+            return db.execute("SELECT COUNT(*) FROM questions WHERE lesson_key = ?", (key,)).fetchone()[0]
+
+    def questions(self, key: str) -> list:
+        with self._connect() as db:
+            rows = db.execute(
+                "SELECT id, type, question, options, answer FROM questions WHERE lesson_key = ? ORDER BY id", (key,)
+            ).fetchall()
+        return [self._row_to_question(row) for row in rows]
+
+    def sample(self, key: str, count: int, student_id: str = None) -> tuple:
+        """
+        Draws up to count random questions of a lesson. For a student, unseen questions come first,
+        then the least recently seen, and the drawn questions are marked as seen.
+        Returns (questions, unseen) where unseen is how many of the lesson's questions the student
+        has still not seen afterwards (None without a student).
+        """
+        with self._connect() as db:
+            rows = db.execute(
+                "SELECT q.id, q.type, q.question, q.options, q.answer FROM questions q "
+                "LEFT JOIN seen_questions s ON s.question_id = q.id AND s.student_id = ? "
+                "WHERE q.lesson_key = ? ORDER BY s.seen_at IS NOT NULL, s.seen_at, RANDOM() LIMIT ?",
+                (student_id or "", key, count)
+            ).fetchall()
+            if student_id is None:
+                return [self._row_to_question(row) for row in rows], None
+
+            now = time.time()
+            db.executemany(
+                "INSERT OR REPLACE INTO seen_questions (student_id, question_id, lesson_key, seen_at) VALUES (?, ?, ?, ?)",
+                [(student_id, row[0], key, now) for row in rows]
+            )
+            unseen = db.execute(
+                "SELECT COUNT(*) FROM questions q WHERE q.lesson_key = ? AND NOT EXISTS "
+                "(SELECT 1 FROM seen_questions s WHERE s.question_id = q.id AND s.student_id = ?)",
+                (key, student_id)
+            ).fetchone()[0]
+        return [self._row_to_question(row) for row in rows], unseen
+
+    def stats(self) -> dict:
+        with self._connect() as db:
+            lessons, questions = db.execute("SELECT COUNT(DISTINCT lesson_key), COUNT(*) FROM questions").fetchone()
+            students, views = db.execute("SELECT COUNT(DISTINCT student_id), COUNT(*) FROM seen_questions").fetchone()
+        stats = {"lessons": lessons, "questions": questions, "students": students, "seen_questions": views}
+        if self.index is not None:
+            stats["near_duplicate_index"] = self.index.stats()
+        return stats
@@ -0,0 +1,214 @@
+# backend/question_dedup.py
+
+import hashlib
+import os
+import sqlite3
+import zlib
+from contextlib import contextmanager
+
+import numpy as np
+
+from backend.quiz_grading import normalize_answer
+from backend.quiz_schema import OPTION_LETTERS, normalize_key
+
+# Universal hashing modulo a Mersenne prime; a * h stays below 2**62, so int64 never overflows
+MERSENNE_PRIME = (1 << 31) - 1
+SHINGLE_CHARS = 4
+
+def question_shingles(question: dict) -> set:
+    """
+    Character 4-grams of the normalized question text.
+    """
+    text = f" {normalize_key(question['question'])} "
+    return {text[start:start + SHINGLE_CHARS] for start in range(max(1, len(text) - SHINGLE_CHARS + 1))}
+
+def correct_answer_text(question: dict) -> str:
+    """
+    The normalized correct answer: the text of the correct option for multiple choice.
+    """
+    answer = question.get("answer") or ""
+    options = question.get("options") or []
+    if answer in OPTION_LETTERS and OPTION_LETTERS.index(answer) < len(options):
+        answer = options[OPTION_LETTERS.index(answer)]
+    return normalize_answer(answer)
+
+def _hash64(data: bytes) -> int:
+    # Signed 64-bit, so it fits an SQLite INTEGER
+    return int.from_bytes(hashlib.blake2b(data, digest_size=8).digest(), "little", signed=True)
+
+class MinHashIndex:
+    """
+    Near-duplicate index of questions: MinHash signatures of the question text with an LSH band index,
+    plus hashes of the correct answer and the option set, persisted in SQLite.
+
+    Text similarity alone does not separate paraphrases from different questions: rewording ("removes
+    CO2" / "takes carbon dioxide out") shares few shingles, while changing one word ("absorb" / "release",
+    "is" / "is NOT") shares most of them. What a paraphrase keeps is its correct answer. The score starts
+    from the estimated Jaccard similarity t of the text shingles and
+    - with the same correct answer, closes answer_weight of the gap to 1 (option_set_weight when the
+      multiple-choice options are the same set too): t + (1 - t) * weight
+    - with a different correct answer, is scaled by answer_mismatch_factor
+    The weights and the 0.58 default threshold were picked by hand from a small sample of paraphrase and
+    distinct question pairs written for one lesson (not shipped with the project): 0.58 sits between the
+    lowest paraphrase score and the distinct pairs, so treat it as a starting point and tune it per
+    deployment (QUESTION_DEDUP_THRESHOLD). Questions can only reach the threshold through similar text
+    (an LSH bucket shared with the query, one indexed lookup per band) or the same answer (one indexed
+    lookup), so only those candidates are scored. Everything is scoped per namespace (the lesson key). Inserts are
+    incremental; changing num_perm, bands, or seed rebuilds the index.
+    """
+
+    # Bump when the shingles or stored features change, so the index is rebuilt
+    FEATURES_VERSION = 2
+
+    def __init__(self, db_path: str, threshold: float = 0.58, num_perm: int = 128, bands: int = 32, seed: int = 1,
+                 answer_weight: float = 0.4, option_set_weight: float = 0.5, answer_mismatch_factor: float = 0.5):
+        if num_perm % bands:
+            raise ValueError("num_perm must be a multiple of bands.")
+        self.db_path = db_path
+        self.threshold = threshold
+        self.num_perm = num_perm
+        self.bands = bands
+        self.rows = num_perm // bands
+        self.answer_weight = answer_weight
+        self.option_set_weight = option_set_weight
+        self.answer_mismatch_factor = answer_mismatch_factor
+        # Fixed seed: persisted signatures are only comparable with the same permutations
+        generator = np.random.RandomState(seed)
+        self._a = generator.randint(1, MERSENNE_PRIME, size=num_perm).astype(np.int64)[:, None]
+        self._b = generator.randint(0, MERSENNE_PRIME, size=num_perm).astype(np.int64)[:, None]
+
+        os.makedirs(os.path.dirname(db_path) or ".", exist_ok=True)
+        params = f"num_perm={num_perm};bands={bands};seed={seed};features={self.FEATURES_VERSION}"
+        with self._connect() as db:
+            db.execute("PRAGMA journal_mode=WAL")
+            db.execute("CREATE TABLE IF NOT EXISTS minhash_meta (name TEXT PRIMARY KEY, value TEXT NOT NULL)")
+            stored = db.execute("SELECT value FROM minhash_meta WHERE name = 'params'").fetchone()
+            if stored is not None and stored[0] != params:
+                db.execute("DROP TABLE IF EXISTS minhash_signatures")
+                db.execute("DROP TABLE IF EXISTS minhash_buckets")
+            db.execute("INSERT OR REPLACE INTO minhash_meta (name, value) VALUES ('params', ?)", (params,))
+            db.execute(
+                "CREATE TABLE IF NOT EXISTS minhash_signatures ("
+                "question_id INTEGER PRIMARY KEY, namespace TEXT NOT NULL, signature BLOB NOT NULL, "
+                "answer_hash INTEGER NOT NULL, options_hash INTEGER)"
+            )
+            db.execute("CREATE INDEX IF NOT EXISTS idx_minhash_signatures_answer ON minhash_signatures(namespace, answer_hash)")
+            db.execute(
+                "CREATE TABLE IF NOT EXISTS minhash_buckets ("
+                "namespace TEXT NOT NULL, band INTEGER NOT NULL, bucket INTEGER NOT NULL, question_id INTEGER NOT NULL)"
+            )
+            db.execute("CREATE INDEX IF NOT EXISTS idx_minhash_buckets ON minhash_buckets(namespace, band, bucket)")
+
+    @contextmanager
+    def _connect(self):
+        db = sqlite3.connect(self.db_path, timeout=30)
+        try:
+            with db:
+                yield db
+        finally:
+            db.close()
+
+    def signature(self, question: dict) -> dict:
+        """
+        {"minhash": MinHash of the text shingles, "answer": correct answer hash, "options": option set hash or None}
+        """
+        hashes = np.array(
+            [zlib.crc32(shingle.encode("utf-8")) for shingle in question_shingles(question)], dtype=np.int64
+        ) % MERSENNE_PRIME
+        options = sorted(normalize_key(option) for option in question.get("options") or [])
+        return {
+            "minhash": ((self._a * hashes[None, :] + self._b) % MERSENNE_PRIME).min(axis=1).astype(np.uint32),
+            "answer": _hash64(correct_answer_text(question).encode("utf-8")),
+            "options": _hash64("\n".join(options).encode("utf-8")) if options else None,
+        }
+
+    def _buckets(self, minhash: np.ndarray) -> list:
+        return [
+            (band, _hash64(minhash[band * self.rows:(band + 1) * self.rows].tobytes()))
+            for band in range(self.bands)
+        ]
+
+    def similarity(self, first: dict, second: dict) -> float:
+        """
+        Near-duplicate score of two signatures: their estimated text similarity, raised when they share
+        the correct answer (more so with the same option set) and lowered when they do not.
+        """
+        text = float(np.mean(first["minhash"] == second["minhash"]))
+        if first["answer"] != second["answer"]:
+            return text * self.answer_mismatch_factor
+        same_options = first["options"] is not None and first["options"] == second["options"]
+        return text + (1 - text) * (self.option_set_weight if same_options else self.answer_weight)
+
+    def query(self, namespace: str, signature: np.ndarray):
+        """
+        Returns (question_id, similarity) of the most similar stored question in namespace at or above
+        threshold, or None.
+        """
+        buckets = self._buckets(signature["minhash"])
+        with self._connect() as db:
+            # One equality lookup per band; SQLite would only use the namespace prefix of the index for a
+            # combined (band, bucket) IN (...) and scan the whole lesson
+            candidates = list(dict.fromkeys(
+                row[0]
+                for band, bucket in buckets
+                for row in db.execute(
+                    "SELECT question_id FROM minhash_buckets WHERE namespace = ? AND band = ? AND bucket = ?",
+                    (namespace, band, bucket)
+                )
+            ))
+            rows = db.execute(
+                "SELECT question_id, signature, answer_hash, options_hash FROM minhash_signatures "
+                "WHERE namespace = ? AND answer_hash = ?",
+                (namespace, signature["answer"])
+            ).fetchall()
+            seen = {row[0] for row in rows}
+            candidates = [question_id for question_id in candidates if question_id not in seen]
+            if candidates:
+                rows += db.execute(
+                    "SELECT question_id, signature, answer_hash, options_hash FROM minhash_signatures "
+                    "WHERE question_id IN (" + ", ".join("?" for _ in candidates) + ")",
+                    candidates
+                ).fetchall()
+        best = None
+        for question_id, stored, answer_hash, options_hash in rows:
+            other = {"minhash": np.frombuffer(stored, dtype=np.uint32), "answer": answer_hash, "options": options_hash}
+            score = self.similarity(signature, other)
+            if score >= self.threshold and (best is None or score > best[1]):
+                best = (question_id, round(score, 3))
+        return best
+
+    def insert(self, namespace: str, items: list):
+        """
+        Adds [(question_id, signature)] to the index; question ids already indexed are replaced.
+        """
+        if not items:
+            return
+        with self._connect() as db:
+            # Re-indexing is rare, so old buckets are only looked up for ids that already have a signature
+            reindexed = [row[0] for row in db.execute(
+                "SELECT question_id FROM minhash_signatures WHERE question_id IN ("
+                + ", ".join("?" for _ in items) + ")",
+                [question_id for question_id, _ in items]
+            )]
+            db.executemany("DELETE FROM minhash_buckets WHERE question_id = ?", [(question_id,) for question_id in reindexed])
+            db.executemany(
+                "INSERT OR REPLACE INTO minhash_signatures (question_id, namespace, signature, answer_hash, options_hash) "
+                "VALUES (?, ?, ?, ?, ?)",
+                [(question_id, namespace, signature["minhash"].tobytes(), signature["answer"], signature["options"])
+                 for question_id, signature in items]
+            )
+            db.executemany(
+                "INSERT INTO minhash_buckets (namespace, band, bucket, question_id) VALUES (?, ?, ?, ?)",
+                [(namespace, band, bucket, question_id)
+                 for question_id, signature in items for band, bucket in self._buckets(signature["minhash"])]
+            )
+
+    def stats(self) -> dict:
+        with self._connect() as db:
+            signatures = db.execute("SELECT COUNT(*) FROM minhash_signatures").fetchone()[0]
+        return {
+            "indexed_questions": signatures,
+            "threshold": self.threshold,
+            "num_perm": self.num_perm,
+            "bands": self.bands,
+        }
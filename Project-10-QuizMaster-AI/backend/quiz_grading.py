@@ -0,0 +1,241 @@
+# backend/quiz_grading.py
+
+import difflib
+import re
+import threading
+import time
+import unicodedata
+from concurrent.futures import Future
+
+from backend.quiz_schema import OPTION_LETTERS, answer_letter, normalize_key, parse_json_object
+
+# Words that never decide whether a short answer is right ("the mitochondria" == "mitochondria")
+FILLER_WORDS = frozenset("a an the of is are it its to".split())
+# An answer negating something ("not carbon dioxide", "isn't oxygen") is never accepted locally
+NEGATION_PATTERN = re.compile(r"\b(?:not|no|never|none|neither|nor|without|except|cannot)\b|n['’]t\b", re.IGNORECASE)
+
+SHORT_ANSWER_GRADING_PROMPT = (
+    "Grade these short answers from a quiz. For each item decide whether the student's answer means the same "
+    "as the expected answer for that question. Ignore spelling mistakes, word order, and extra words that do "
+    "not change the meaning; an answer that is vague, incomplete, or wrong is incorrect.\n\n{items}\n\n"
+    "Respond with a JSON object {{\"grades\": [{{\"id\": <item id>, \"correct\": true or false}}]}} "
+    "with one grade per item, and nothing else."
+)
+
+# JSON schema passed as Ollama's "format" for the grading call
+GRADING_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "grades": {
+            "type": "array",
+            "items": {
+                "type": "object",
+                "properties": {"id": {"type": "integer"}, "correct": {"type": "boolean"}},
+                "required": ["id", "correct"],
+            },
+        },
+    },
+    "required": ["grades"],
+}
+
+def normalize_answer(text: str) -> str:
+    """
+    Accent-, case-, and punctuation-free form of a short answer without filler words.
+    """
+    text = unicodedata.normalize("NFKD", str(text)).encode("ascii", "ignore").decode("ascii")
+    return " ".join(word for word in normalize_key(text).split() if word not in FILLER_WORDS)
+
+def adds_negation(answer: str, key: dict) -> bool:
+    """
+    Whether a short answer negates something the expected answer does not ("not carbon dioxide").
+    """
+    return bool(NEGATION_PATTERN.search(answer or "")) and not key["negated"]
+
+def answer_key(question: dict) -> dict:
+    """
+    Precomputes what grading a question needs, so each answer is graded with dictionary lookups:
+    the correct letter and the normalized option texts for multiple choice, the normalized answer
+    and the words of the question for short answers.
+    """
+    if question["type"] == "multiple_choice":
+        # Option texts without filler words ("the chloroplast" for "Chloroplast"); options that
+        # only differ in filler words are left to the exact lookup
+        loose = {}
+        for letter, option in zip(OPTION_LETTERS, question["options"]):
+            loose.setdefault(normalize_answer(option), []).append(letter)
+        return {
+            "type": "multiple_choice",
+            "answer": question["answer"],
+            "option_texts": list(question["options"]),
+            "options": {normalize_key(option): letter for letter, option in zip(OPTION_LETTERS, question["options"])},
+            "loose_options": {text: letters[0] for text, letters in loose.items() if text and len(letters) == 1},
+        }
+    return {
+        "type": "short_answer",
+        "answer": question["answer"],
+        "normalized": normalize_answer(question["answer"]),
+        "negated": bool(NEGATION_PATTERN.search(question["answer"])),
+        "question": question["question"],
+        "question_words": frozenset(normalize_answer(question["question"]).split()),
+    }
+
+def grade_choice(answer: str, key: dict):
+    """
+    Grades a multiple-choice answer given as the option text ("the chloroplast") or as a letter
+    ("b", "B)", "(b)", "Option B"), which may only be followed by its own option text.
+    Returns (correct, chosen_letter); chosen_letter is None when the answer matches no option.
+    """
+    letter = (
+        key["options"].get(normalize_key(answer))
+        or key["loose_options"].get(normalize_answer(answer))
+        or answer_letter(answer, key["option_texts"])
+    )
+    return letter == key["answer"], letter
+
+def grade_short_answer(answer: str, key: dict, accept_ratio: float, reject_ratio: float):
+    """
+    Grades a short answer locally. Returns (correct, method, similarity) where correct is None when the
+    answer is ambiguous and needs the LLM: fuzzy similarity between reject_ratio and accept_ratio, an
+    expected answer surrounded by words that are not in the question, or a negation the expected answer
+    does not have.
+    """
+    given, expected = normalize_answer(answer), key["normalized"]
+    if not given:
+        return False, "empty", 0.0
+    negated = adds_negation(answer, key)
+    if given == expected and not negated:
+        return True, "exact", 1.0
+    similarity = difflib.SequenceMatcher(None, given, expected).ratio()
+    # Word-level overlap catches reordered answers ("dioxide carbon") that character matching scores low
+    given_words, expected_words = set(given.split()), set(expected.split())
+    if expected_words and given_words == expected_words:
+        similarity = max(similarity, accept_ratio)
+    similarity = round(similarity, 3)
+    if similarity <= reject_ratio:
+        return False, "fuzzy", similarity
+    if negated:
+        return None, "ambiguous", similarity
+    # The expected answer, in order, with extra words only echoing the question ("plants absorb carbon
+    # dioxide" for "carbon dioxide"); other extra words ("carbon dioxide and oxygen") may change the meaning
+    if expected and f" {expected} " in f" {given} ":
+        if given_words - expected_words <= key["question_words"]:
+            return True, "contained", 1.0
+        return None, "ambiguous", similarity
+    if similarity >= accept_ratio:
+        return True, "fuzzy", similarity
+    return None, "ambiguous", similarity
+
+def build_grading_prompt(items: list) -> str:
+    """
+    items: [{"id", "question", "expected", "answer"}]
+    """
+    listed = "\n\n".join(
+        f"Item {item['id']}:\nQuestion: {item['question']}\nExpected answer: {item['expected']}\n"
+        f"Student answer: {item['answer']}"
+        for item in items
+    )
+    return SHORT_ANSWER_GRADING_PROMPT.format(items=listed)
+
+def parse_grades(raw: str) -> dict:
+    """
+    Maps item id -> correct from a grading response; items the model skipped are absent.
+    """
+    grades = {}
+    for grade in parse_json_object(raw).get("grades") or []:
+        if not isinstance(grade, dict):
+            continue
+        try:
+            item_id = int(grade.get("id"))
+        except (TypeError, ValueError):
+            continue
+        correct = grade.get("correct")
+        if isinstance(correct, str):
+            correct = correct.strip().lower() in ("true", "yes", "correct")
+        grades[item_id] = bool(correct)
+    return grades
+
+class AmbiguousAnswerBatcher:
+    """
+    Collects ambiguous short answers from concurrent requests and grades them with one LLM call per batch.
+    A batch is sent when it reaches max_batch items or max_wait_seconds after its first item, so a classroom
+    submitting at once costs a handful of calls instead of one per answer. Up to max_concurrency batches
+    are graded at the same time; while all of them are busy, new answers gather into the next batch.
+    """
+
+    def __init__(self, grade_fn, max_batch: int = 20, max_wait_seconds: float = 0.5, max_concurrency: int = 1):
+        # grade_fn(prompt) -> raw LLM response text
+        self.grade_fn = grade_fn
+        self.max_batch = max_batch
+        self.max_wait_seconds = max_wait_seconds
+        self.max_concurrency = max_concurrency
+        self._pending = [] # (item, future)
+        self._condition = threading.Condition()
+        self._slots = threading.Semaphore(max_concurrency)
+        self._thread = None
+        self._in_flight = 0
+        self._counters = {"answers": 0, "batches": 0, "failed_batches": 0, "llm_seconds": 0.0}
+
+    def submit(self, question: str, expected: str, answer: str) -> Future:
+        """
+        Queues one answer; the future resolves to True/False, or raises if the LLM call failed.
+        """
+        future = Future()
+        with self._condition:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._work, name="learnsphere-grading", daemon=True)
+                self._thread.start()
+            self._pending.append(({"question": question, "expected": expected, "answer": answer}, future))
+            self._condition.notify()
+        return future
+
+    def _work(self):
+        while True:
+            # A batch only starts filling once a grading slot is free
+            self._slots.acquire()
+            with self._condition:
+                while not self._pending:
+                    self._condition.wait()
+                deadline = time.monotonic() + self.max_wait_seconds
+                while len(self._pending) < self.max_batch and time.monotonic() < deadline:
+                    self._condition.wait(timeout=deadline - time.monotonic())
+                batch, self._pending = self._pending[:self.max_batch], self._pending[self.max_batch:]
+                self._in_flight += 1
+            threading.Thread(target=self._grade, args=(batch,), name="learnsphere-grading-batch", daemon=True).start()
+
+    def _grade(self, batch: list):
+        items = [{"id": number, **item} for number, (item, _) in enumerate(batch, start=1)]
+        started = time.perf_counter()
+        grades, error = None, None
+        try:
+            grades = parse_grades(self.grade_fn(build_grading_prompt(items)))
+        except Exception as e:
+            error = e
+        finally:
+            with self._condition:
+                self._in_flight -= 1
+                self._counters["batches"] += 1
+                self._counters["answers"] += len(batch)
+                self._counters["failed_batches"] += error is not None
+                self._counters["llm_seconds"] += time.perf_counter() - started
+            self._slots.release()
+        for item, (_, future) in zip(items, batch):
+            if error is not None:
+                future.set_exception(error)
+            elif item["id"] in grades:
+                future.set_result(grades[item["id"]])
+            else:
+                future.set_exception(ValueError(f"The grading response had no grade for item {item['id']}."))
+
+    def stats(self) -> dict:
+        with self._condition:
+            pending, in_flight, counters = len(self._pending), self._in_flight, dict(self._counters)
+        return {
+            "pending": pending,
+            "in_flight_batches": in_flight,
+            "max_concurrency": self.max_concurrency,
+            "answers": counters["answers"],
+            "batches": counters["batches"],
+            "failed_batches": counters["failed_batches"],
+            "avg_batch_size": round(counters["answers"] / counters["batches"], 2) if counters["batches"] else None,
+            "avg_llm_seconds": round(counters["llm_seconds"] / counters["batches"], 3) if counters["batches"] else None,
+        }
@@ -0,0 +1,202 @@
+# backend/quiz_schema.py
+
+import json
+import re
+
+QUESTION_TYPES = ["multiple_choice", "short_answer"]
+OPTION_LETTERS = ["A", "B", "C", "D"]
+
+# JSON schema passed as Ollama's "format", so the model is constrained to this shape while generating
+QUIZ_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "questions": {
+            "type": "array",
+            "items": {
+                "type": "object",
+                "properties": {
+                    "type": {"type": "string", "enum": QUESTION_TYPES},
+                    "question": {"type": "string"},
+                    "options": {"type": "array", "items": {"type": "string"}},
+                    "answer": {"type": "string"},
+                },
+                "required": ["type", "question", "options", "answer"],
+            },
+        },
+    },
+    "required": ["questions"],
+}
+
+QUESTION_FORMAT_RULES = (
+    "Respond with a JSON object {{\"questions\": [...]}} where each question has:\n"
+    "- \"type\": \"multiple_choice\" or \"short_answer\"\n"
+    "- \"question\": the question text\n"
+    "- \"options\": for multiple_choice, exactly 4 distinct answer options without letter prefixes; "
+    "for short_answer, an empty list\n"
+    "- \"answer\": for multiple_choice, the letter (A, B, C, or D) of the correct option; "
+    "for short_answer, a short correct answer\n"
+    "Respond with JSON only, no commentary."
+)
+
+QUIZ_PROMPT = (
+    "Generate a {count}-question quiz based on the following educational text. "
+    "Each question should be either multiple-choice with 4 options or a short answer question, "
+    "and every question must ask about something different.\n"
+    + QUESTION_FORMAT_RULES +
+    "\n\nText:\n\n---\n{text}\n---"
+)
+
+REPLACEMENT_PROMPT = (
+    "Generate {count} new quiz question(s) based on the following educational text. "
+    "Each question should be either multiple-choice with 4 options or a short answer question.\n"
+    "Do not repeat or rephrase any of these questions, which are already in the quiz or were rejected:\n{existing}\n"
+    "Earlier attempts were rejected for these problems, avoid them:\n{problems}\n"
+    + QUESTION_FORMAT_RULES +
+    "\n\nText:\n\n---\n{text}\n---"
+)
+
+# "B", "B)", "(b)", "B.", "Option B", optionally followed by the option text: "B) Photosynthesis"
+ANSWER_LETTER_PATTERN = re.compile(r"^\s*(?:option\s+)?\(?([A-D])(?:\)|\.|:)?(?:\s+(.*?))?\s*$", re.IGNORECASE | re.DOTALL)
+OPTION_PREFIX_PATTERN = re.compile(r"^\s*\(?[A-Da-d][\).:]\s+")
+
+def parse_json_object(raw: str) -> dict:
+    """
+    Tolerantly parses a JSON object out of an LLM response.
+    Handles markdown code fences, leading/trailing chatter, and trailing commas.
+    Returns an empty dict if nothing usable is found.
+    """
+    if not raw:
+        return {}
+    cleaned = re.sub(r"^```(?:json)?\s*|\s*```$", "", raw.strip(), flags=re.IGNORECASE)
+    start, end = cleaned.find("{"), cleaned.rfind("}")
+    if start == -1 or end <= start:
+        return {}
+    candidate = cleaned[start:end + 1]
+    for attempt in (candidate, re.sub(r",\s*([}\]])", r"\1", candidate)):
+        try:
+            parsed = json.loads(attempt)
+            return parsed if isinstance(parsed, dict) else {}
+        except json.JSONDecodeError:
+            continue
+    return {}
+
+def normalize_key(text: str) -> str:
+    """
+    Lowercased, punctuation-free form of a question or option, for duplicate checks.
+    """
+    return " ".join(re.sub(r"[^\w\s]", " ", str(text).lower()).split())
+
+def answer_letter(answer: str, options: list):
+    """
+    The option letter an answer names ("B", "(b)", "Option B"), or None. Text after the letter is only
+    accepted when it is that option's text ("B) Photosynthesis"), so prose such as "A gas is oxygen"
+    is not read as letter A.
+    """
+    match = ANSWER_LETTER_PATTERN.match(answer or "")
+    if not match:
+        return None
+    letter, rest = match.group(1).upper(), match.group(2)
+    if rest:
+        index = OPTION_LETTERS.index(letter)
+        if index >= len(options) or normalize_key(rest) != normalize_key(options[index]):
+            return None
+    return letter
+
+def normalize_question(raw) -> dict:
+    """
+    Coerces one question object from the model into {"type", "question", "options", "answer"}.
+    Option letter prefixes ("A) ...") are stripped, and a multiple-choice answer given as
+    "B)", "b", or the option text itself becomes its letter. Nothing is dropped here;
+    validate_question decides whether the result is usable.
+    """
+    raw = raw if isinstance(raw, dict) else {}
+    by_lower = {str(key).strip().lower(): value for key, value in raw.items()}
+    options = by_lower.get("options") or []
+    if isinstance(options, dict):
+        options = list(options.values())
+    if not isinstance(options, list):
+        options = []
+    options = [OPTION_PREFIX_PATTERN.sub("", str(option)).strip() for option in options]
+
+    question_type = str(by_lower.get("type") or "").strip().lower().replace("-", "_").replace(" ", "_")
+    if question_type not in QUESTION_TYPES:
+        question_type = "multiple_choice" if options else "short_answer"
+
+    answer = str(by_lower.get("answer") or "").strip()
+    if question_type == "multiple_choice" and answer:
+        by_text = {normalize_key(option): letter for letter, option in zip(OPTION_LETTERS, options)}
+        answer = by_text.get(normalize_key(answer)) or answer_letter(answer, options) or answer
+
+    return {
+        "type": question_type,
+        "question": str(by_lower.get("question") or "").strip(),
+        "options": options if question_type == "multiple_choice" else [],
+        "answer": answer,
+    }
+
+def validate_question(question: dict) -> list:
+    """
+    Returns the problems that make a normalized question unusable (an empty list when it is valid).
+    """
+    problems = []
+    if len(question["question"]) < 5:
+        problems.append("question text is missing")
+    if not question["answer"]:
+        problems.append("answer is missing")
+    if question["type"] == "multiple_choice":
+        if len(question["options"]) != len(OPTION_LETTERS) or not all(question["options"]):
+            problems.append(f"multiple-choice questions need exactly {len(OPTION_LETTERS)} non-empty options")
+        elif len({normalize_key(option) for option in question["options"]}) != len(question["options"]):
+            problems.append("options must be distinct")
+        if question["answer"] and question["answer"] not in OPTION_LETTERS:
+            problems.append("multiple-choice answer must be one of the option letters A, B, C, or D")
+    return problems
+
+def validate_questions(candidates: list, accepted: list = None) -> tuple:
+    """
+    Normalizes and validates candidate questions in order. A question duplicating an accepted one
+    (or an earlier candidate) is rejected. Returns (valid, rejected) where rejected is
+    [{"question", "problems"}].
+    """
+    seen = {normalize_key(question["question"]) for question in accepted or []}
+    valid, rejected = [], []
+    for raw in candidates:
+        question = normalize_question(raw)
+        problems = validate_question(question)
+        key = normalize_key(question["question"])
+        if key and key in seen:
+            problems.append("duplicates another question in the quiz")
+        if problems:
+            rejected.append({"question": question, "problems": problems})
+        else:
+            seen.add(key)
+            valid.append(question)
+    return valid, rejected
+
+def parse_quiz_response(raw: str) -> list:
+    """
+    Candidate question objects from a quiz response: {"questions": [...]}, or a bare
+    object holding a single question.
+    """
+    data = parse_json_object(raw)
+    questions = data.get("questions")
+    if isinstance(questions, list):
+        return questions
+    return [data] if data.get("question") else []
+
+def render_quiz_text(questions: list) -> str:
+    """
+    Renders questions in the numbered "1. Question? / A) ... / Answer:" text layout the frontend
+    and the TXT download use.
+    """
+    blocks = []
+    for number, question in enumerate(questions, start=1):
+        lines = [f"{number}. {question['question']}"]
+        lines += [f"{letter}) {option}" for letter, option in zip(OPTION_LETTERS, question["options"])]
+        if question["type"] == "multiple_choice":
+            option = question["options"][OPTION_LETTERS.index(question["answer"])]
+            lines.append(f"Answer: {question['answer']}) {option}")
+        else:
+            lines.append(f"Answer: {question['answer']}")
+        blocks.append("\n".join(lines))
+    return "\n\n".join(blocks)
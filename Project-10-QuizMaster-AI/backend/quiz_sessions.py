@@ -0,0 +1,271 @@
+# backend/quiz_sessions.py
+
+import math
+import os
+import random
+import sqlite3
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+
+from backend.question_bank import QuestionBank
+from backend.quiz_grading import answer_key
+
+def _logit(p: float) -> float:
+    return math.log(p / (1 - p))
+
+class QuizSessionStore:
+    """
+    Quiz sessions over a lesson's question bank. Sessions and graded answers are persisted in SQLite,
+    while answer keys and per-question / per-student accuracy are mirrored in memory, so grading an
+    answer and picking the next question cost dictionary lookups plus one write.
+
+    Next questions are chosen adaptively: with smoothed accuracies a (student, on this lesson) and q
+    (all students, on the question), the predicted chance of a correct answer is
+    sigmoid(logit(a) + logit(q)), and the unasked question closest to target_accuracy is served.
+    Questions the student already answered correctly in earlier sessions are served last.
+    """
+
+    def __init__(self, db_path: str, question_bank: QuestionBank, target_accuracy: float = 0.7,
+                 prior_correct: float = 1.0, prior_attempts: float = 2.0):
+        self.db_path = db_path
+        self.question_bank = question_bank
+        self.target_accuracy = target_accuracy
+        self.prior_correct = prior_correct
+        self.prior_attempts = prior_attempts
+        self._lock = threading.Lock()
+        self._keys = {} # question_id -> answer key (plus its lesson_key)
+        self._questions = {} # lesson_key -> {question_id: public question}
+        self._question_stats = {} # question_id -> [correct, attempts]
+        self._student_history = {} # (student_id, lesson_key) -> {question_id: last answer correct}
+        self._student_stats = {} # (student_id, lesson_key) -> [correct, attempts]
+        self._sessions = {}
+
+        os.makedirs(os.path.dirname(db_path) or ".", exist_ok=True)
+        with self._connect() as db:
+            db.execute("PRAGMA journal_mode=WAL")
+            db.execute(
+                "CREATE TABLE IF NOT EXISTS quiz_sessions ("
+                "id TEXT PRIMARY KEY, lesson_key TEXT NOT NULL, student_id TEXT NOT NULL, length INTEGER NOT NULL, "
+                "current_question_id INTEGER, created_at REAL NOT NULL, finished_at REAL)"
+            )
+            db.execute(
+                "CREATE TABLE IF NOT EXISTS session_answers ("
+                "session_id TEXT NOT NULL, question_id INTEGER NOT NULL, lesson_key TEXT NOT NULL, "
+                "student_id TEXT NOT NULL, answer TEXT NOT NULL, correct INTEGER NOT NULL, method TEXT NOT NULL, "
+                "similarity REAL, answered_at REAL NOT NULL, PRIMARY KEY (session_id, question_id))"
+            )
+            db.execute("CREATE INDEX IF NOT EXISTS idx_session_answers_lesson ON session_answers(lesson_key, student_id)")
+
+    @contextmanager
+    def _connect(self):
+        db = sqlite3.connect(self.db_path, timeout=30)
+        try:
+            with db:
+                yield db
+        finally:
+            db.close()
+
+    def _load_lesson(self, key: str):
+        """
+        Loads (or refreshes, after a bank top-up) a lesson's answer keys, and its question accuracy once.
+        """
+        questions = self.question_bank.questions(key)
+        self._questions[key] = {
+            question["id"]: {name: question[name] for name in ("id", "type", "question", "options")}
+            for question in questions
+        }
+        for question in questions:
+            self._keys[question["id"]] = {**answer_key(question), "lesson_key": key}
+        if any(question_id not in self._question_stats for question_id in self._questions[key]):
+            with self._connect() as db:
+                rows = db.execute(
+                    "SELECT question_id, SUM(correct), COUNT(*) FROM session_answers WHERE lesson_key = ? GROUP BY question_id",
+                    (key,)
+                ).fetchall()
+            for question_id in self._questions[key]:
+                self._question_stats.setdefault(question_id, [0, 0])
+            for question_id, correct, attempts in rows:
+                self._question_stats[question_id] = [correct, attempts]
+
+    def _load_student(self, student_id: str, key: str):
+        if (student_id, key) in self._student_history:
+            return
+        with self._connect() as db:
+            rows = db.execute(
+                "SELECT question_id, correct FROM session_answers WHERE student_id = ? AND lesson_key = ? ORDER BY answered_at",
+                (student_id, key)
+            ).fetchall()
+        self._student_history[(student_id, key)] = {question_id: bool(correct) for question_id, correct in rows}
+        self._student_stats[(student_id, key)] = [sum(correct for _, correct in rows), len(rows)]
+
+    def _session(self, session_id: str):
+        """
+        The in-memory state of a session, reloaded from SQLite after a restart. None if it does not exist.
+        """
+        session = self._sessions.get(session_id)
+        if session is not None:
+            return session
+        with self._connect() as db:
+            row = db.execute(
+                "SELECT lesson_key, student_id, length, current_question_id, created_at, finished_at "
+                "FROM quiz_sessions WHERE id = ?", (session_id,)
+            ).fetchone()
+            if row is None:
+                return None
+            answers = db.execute(
+                "SELECT question_id, correct FROM session_answers WHERE session_id = ? ORDER BY answered_at", (session_id,)
+            ).fetchall()
+        session = {
+            "id": session_id, "lesson_key": row[0], "student_id": row[1], "length": row[2], "current": row[3],
+            "created_at": row[4], "finished_at": row[5],
+            "answered": {question_id: bool(correct) for question_id, correct in answers},
+        }
+        if row[0] not in self._questions:
+            self._load_lesson(row[0])
+        self._load_student(row[1], row[0])
+        self._sessions[session_id] = session
+        return session
+
+    def _predicted_accuracy(self, student_id: str, key: str, question_id: int) -> float:
+        student_correct, student_attempts = self._student_stats[(student_id, key)]
+        question_correct, question_attempts = self._question_stats.get(question_id, [0, 0])
+        ability = (student_correct + self.prior_correct) / (student_attempts + self.prior_attempts)
+        easiness = (question_correct + self.prior_correct) / (question_attempts + self.prior_attempts)
+        return 1 / (1 + math.exp(-(_logit(ability) + _logit(easiness))))
+
+    def _choose_next(self, session: dict):
+        key, student_id = session["lesson_key"], session["student_id"]
+        if len(session["answered"]) >= session["length"]:
+            return None
+        history = self._student_history[(student_id, key)]
+        candidates = [question_id for question_id in self._questions[key] if question_id not in session["answered"]]
+        if not candidates:
+            return None
+        return min(candidates, key=lambda question_id: (
+            history.get(question_id) is True,
+            abs(self._predicted_accuracy(student_id, key, question_id) - self.target_accuracy),
+            random.random(),
+        ))
+
+    def _public_question(self, session: dict, question_id: int):
+        if question_id is None:
+            return None
+        question = dict(self._questions[session["lesson_key"]][question_id])
+        question["number"] = len(session["answered"]) + 1
+        question["predicted_accuracy"] = round(
+            self._predicted_accuracy(session["student_id"], session["lesson_key"], question_id), 3
+        )
+        return question
+
+    def _save_current(self, session: dict):
+        with self._connect() as db:
+            db.execute(
+                "UPDATE quiz_sessions SET current_question_id = ?, finished_at = ? WHERE id = ?",
+                (session["current"], session["finished_at"], session["id"])
+            )
+
+    def create(self, key: str, student_id: str, length: int) -> dict:
+        """
+        Starts a session of up to length questions on a lesson and returns its summary with the first question.
+        """
+        session = {
+            "id": uuid.uuid4().hex, "lesson_key": key, "student_id": student_id, "length": length,
+            "current": None, "created_at": time.time(), "finished_at": None, "answered": {},
+        }
+        with self._lock:
+            self._load_lesson(key)
+            self._load_student(student_id, key)
+            session["current"] = self._choose_next(session)
+            with self._connect() as db:
+                db.execute(
+                    "INSERT INTO quiz_sessions (id, lesson_key, student_id, length, current_question_id, created_at) "
+                    "VALUES (?, ?, ?, ?, ?, ?)",
+                    (session["id"], key, student_id, length, session["current"], session["created_at"])
+                )
+            self._sessions[session["id"]] = session
+            return self._summary(session)
+
+    def current(self, session_id: str):
+        """
+        Returns (session summary, answer key of the current question), or None for an unknown session.
+        """
+        with self._lock:
+            session = self._session(session_id)
+            if session is None:
+                return None
+            return self._summary(session), self._keys.get(session["current"])
+
+    def record(self, session_id: str, question_id: int, answer: str, correct: bool, method: str,
+               similarity: float = None) -> dict:
+        """
+        Stores a graded answer to the session's current question, updates the accuracy statistics,
+        and moves on to the next question. Returns the updated session summary.
+        """
+        with self._lock:
+            session = self._session(session_id)
+            if session["current"] != question_id:
+                raise ValueError(f"Question {question_id} is not the current question of this session.")
+            key, student_id = session["lesson_key"], session["student_id"]
+            now = time.time()
+            with self._connect() as db:
+                db.execute(
+                    "INSERT INTO session_answers (session_id, question_id, lesson_key, student_id, answer, correct, "
+                    "method, similarity, answered_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                    (session_id, question_id, key, student_id, answer, int(correct), method, similarity, now)
+                )
+            session["answered"][question_id] = correct
+            self._student_history[(student_id, key)][question_id] = correct
+            for stats in (self._question_stats.setdefault(question_id, [0, 0]), self._student_stats[(student_id, key)]):
+                stats[0] += int(correct)
+                stats[1] += 1
+
+            session["current"] = self._choose_next(session)
+            if session["current"] is None and len(session["answered"]) < session["length"]:
+                # Out of questions: pick up any added to the bank by top-ups since the session started
+                self._load_lesson(key)
+                session["current"] = self._choose_next(session)
+            if session["current"] is None:
+                session["finished_at"] = now
+            self._save_current(session)
+            return self._summary(session)
+
+    def _summary(self, session: dict) -> dict:
+        correct = sum(session["answered"].values())
+        answered = len(session["answered"])
+        student_correct, student_attempts = self._student_stats[(session["student_id"], session["lesson_key"])]
+        return {
+            "session_id": session["id"],
+            "lesson_key": session["lesson_key"],
+            "student_id": session["student_id"],
+            "length": session["length"],
+            "answered": answered,
+            "answered_correctly": correct,
+            "score": round(correct / answered, 3) if answered else None,
+            "student_lesson_accuracy": round(student_correct / student_attempts, 3) if student_attempts else None,
+            "finished": session["current"] is None,
+            "next_question": self._public_question(session, session["current"]),
+        }
+
+    def answers(self, session_id: str) -> list:
+        with self._connect() as db:
+            rows = db.execute(
+                "SELECT question_id, answer, correct, method, similarity, answered_at FROM session_answers "
+                "WHERE session_id = ? ORDER BY answered_at", (session_id,)
+            ).fetchall()
+        return [
+            {"question_id": row[0], "answer": row[1], "correct": bool(row[2]), "method": row[3],
+             "similarity": row[4], "answered_at": row[5]}
+            for row in rows
+        ]
+
+    def stats(self) -> dict:
+        with self._connect() as db:
+            sessions, finished = db.execute(
+                "SELECT COUNT(*), COUNT(finished_at) FROM quiz_sessions"
+            ).fetchone()
+            by_method = dict(db.execute("SELECT method, COUNT(*) FROM session_answers GROUP BY method").fetchall())
+        with self._lock:
+            cached_keys = len(self._keys)
+        return {"sessions": sessions, "finished": finished, "answers_by_method": by_method, "cached_answer_keys": cached_keys}
@@ -135,6 +135,23 @@ lesson_text = st.text_area(
     key="lesson_text_input",
     value=st.session_state.lesson_text_input # Ensure the text area reflects the session state
 )
+generation_mode = st.selectbox(
+    "Generation mode",
+    options=["whole", "sectioned"],
+    help="'sectioned' splits long lessons at headings and paragraphs and generates explanations and quiz "
+         "questions for all sections in parallel. Use it for textbook chapters."
+)
+concepts_mode = st.selectbox(
+    "Key concepts",
+    options=["local", "polish", "llm"],
+    help="'local' ranks keyphrases instantly without the LLM; 'polish' lets the LLM tidy the top candidates "
+         "with a few tokens; 'llm' generates the list with a full LLM call."
+)
+student_id = st.text_input(
+    "Student ID (optional)",
+    placeholder="e.g. student-042",
+    help="With a student ID, repeated quizzes on the same lesson show questions this student has not seen yet."
+)
 
 col1, col2 = st.columns([1, 1])
 
@@ -148,7 +165,10 @@ if generate_button and lesson_text:
     with st.spinner("Generating learning aids... This may take a moment."):
         try:
             # Make a POST request to the FastAPI backend with an explicit timeout
-            response = requests.post(BACKEND_URL, data={"text": lesson_text}, timeout=REQUEST_TIMEOUT_SECONDS)
+            form_data = {"text": lesson_text, "mode": generation_mode, "concepts_mode": concepts_mode}
+            if student_id.strip():
+                form_data["student_id"] = student_id.strip()
+            response = requests.post(BACKEND_URL, data=form_data, timeout=REQUEST_TIMEOUT_SECONDS)
             response.raise_for_status() # Raise an HTTPError for bad responses (4xx or 5xx)
             st.session_state.results = response.json()
             st.success("Generation complete!")
@@ -180,10 +200,18 @@ if st.session_state.results:
 
     st.markdown("---") # Separator
     st.header("🎓 Generated Learning Aids")
+    if results.get("precomputed"):
+        st.caption("Served from the lesson library: these aids were prepared in advance for this lesson.")
 
     # Simplified Explanation
     st.subheader("🧠 Simplified Explanation")
-    st.info(results.get("explanation", "No simplified explanation generated."))
+    if results.get("sections"):
+        st.markdown(results.get("explanation", "No simplified explanation generated."))
+        with st.expander(f"📑 Lesson sections ({len(results['sections'])})"):
+            for section in results["sections"]:
+                st.write(f"{section['index'] + 1}. {section['title']} ({section['chars']} characters, {section['questions']} question(s))")
+    else:
+        st.info(results.get("explanation", "No simplified explanation generated."))
 
     # Quiz Questions & Answers
     st.subheader("📝 Quiz Questions & Answers")
@@ -203,6 +231,16 @@ if st.session_state.results:
     st.markdown("".join(formatted_quiz), unsafe_allow_html=True)
     if not quiz_text:
         st.write("No quiz questions generated.")
+    question_bank = results.get("question_bank")
+    if question_bank:
+        source = "question bank" if results.get("quiz_source") == "bank" else "newly generated questions"
+        st.caption(f"Quiz drawn from {source} ({question_bank['size']} questions banked for this lesson).")
+    quiz_validation = results.get("quiz_validation")
+    if quiz_validation and quiz_validation.get("rejected"):
+        st.caption(
+            f"{quiz_validation['rejected']} malformed or duplicate question(s) were regenerated "
+            f"in {quiz_validation['regeneration_rounds']} extra round(s)."
+        )
 
 
     # Key Concepts
@@ -221,6 +259,7 @@ if st.session_state.results:
     download_data = {
         "explanation": results.get("explanation", ""),
         "quiz": results.get("quiz", ""),
+        "quiz_questions": results.get("quiz_questions", []),
         "concepts": results.get("concepts", "")
     }
     json_output = json.dumps(download_data, indent=4)
@@ -2,7 +2,7 @@
 
 from fastapi import FastAPI, Form, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
-from orchestrator import run_research_pipeline # Import the orchestrator
+from orchestrator import run_research_pipeline, model_registry # Import the orchestrator
 import json
 import os # Import os for environment variables
 from dotenv import load_dotenv # Import load_dotenv
@@ -33,8 +33,21 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+DEFAULT_LLM_MODEL = os.getenv("DEFAULT_LLM_MODEL", "llama2")
+# --- UPDATED: Added 'qwen3:4b' to supported_models list ---
+SUPPORTED_MODELS = ["llama2", "mistral", "gemma", "phi3", "qwen3:4b"] # Add/remove models you support
+# Comma-separated models loaded into memory at startup (defaults to DEFAULT_LLM_MODEL); empty disables
+PREWARM_MODELS = [model.strip() for model in os.getenv("PREWARM_MODELS", DEFAULT_LLM_MODEL).split(",") if model.strip()]
+
+@app.on_event("startup")
+def start_model_registry():
+    """
+    Starts the Ollama heartbeat and pre-warms PREWARM_MODELS in the background.
+    """
+    model_registry.start(tracked=SUPPORTED_MODELS, prewarm=PREWARM_MODELS)
+
 @app.post("/research/")
-async def research_endpoint(topic: str = Form(...), llm_model: str = Form(os.getenv("DEFAULT_LLM_MODEL", "llama2"))): # Use .env for default
+async def research_endpoint(topic: str = Form(...), llm_model: str = Form(DEFAULT_LLM_MODEL)): # Use .env for default
     """
     Endpoint to trigger the multi-agent research pipeline.
     Accepts a research topic and an LLM model name, then returns the comprehensive research results.
@@ -43,12 +56,10 @@ async def research_endpoint(topic: str = Form(...), llm_model: str = Form(os.get
         raise HTTPException(status_code=400, detail="Research topic cannot be empty.")
     
     # Validate the LLM model name
-    # --- UPDATED: Added 'qwen3:4b' to supported_models list ---
-    supported_models = ["llama2", "mistral", "gemma", "phi3", "qwen3:4b"] # Add/remove models you support
-    if llm_model not in supported_models:
+    if llm_model not in SUPPORTED_MODELS:
         raise HTTPException(
             status_code=400,
-            detail=f"Unsupported LLM model: '{llm_model}'. Supported models are: {', '.join(supported_models)}"
+            detail=f"Unsupported LLM model: '{llm_model}'. Supported models are: {', '.join(SUPPORTED_MODELS)}"
         )
 
     print(f"INFO: Received research request for topic: '{topic}' using model: '{llm_model}'")
@@ -65,6 +76,13 @@ async def research_endpoint(topic: str = Form(...), llm_model: str = Form(os.get
     
     return results
 
+@app.get("/health/models")
+def models_health():
+    """
+    Returns the cached readiness of Ollama and its models (ready = loaded, pulled = loads on first use).
+    """
+    return model_registry.status()
+
 # Example of how to run this backend:
 # Make sure you have uvicorn installed: pip install uvicorn
 # Run from the 'multi-agent-researcher' directory:
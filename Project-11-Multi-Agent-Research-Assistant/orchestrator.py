@@ -8,6 +8,7 @@ from fastapi import HTTPException
 from langchain_ollama import OllamaLLM # Updated import as per deprecation warning
 import os
 from dotenv import load_dotenv # Import load_dotenv
+from model_registry import ModelRegistry
 
 # Load environment variables from .env file
 load_dotenv()
@@ -15,6 +16,18 @@ load_dotenv()
 # Set a generous timeout for Ollama call (e.g., 8 minutes, now 2000 seconds)
 OLLAMA_REQUEST_TIMEOUT_SECONDS = 10000 # Updated timeout as per your request
 
+# Model readiness is tracked by a background heartbeat against Ollama (see model_registry.py) instead of
+# a test generation before every run. MODEL_KEEP_ALIVE keeps used and pre-warmed models loaded.
+OLLAMA_API_BASE_URL = os.getenv("OLLAMA_API_BASE_URL", "http://localhost:11434")
+MODEL_HEARTBEAT_SECONDS = float(os.getenv("MODEL_HEARTBEAT_SECONDS", "15"))
+MODEL_KEEP_ALIVE = os.getenv("MODEL_KEEP_ALIVE", "30m")
+MODEL_WARM_TIMEOUT_SECONDS = float(os.getenv("MODEL_WARM_TIMEOUT_SECONDS", "600"))
+
+model_registry = ModelRegistry(
+    OLLAMA_API_BASE_URL, heartbeat_seconds=MODEL_HEARTBEAT_SECONDS, keep_alive=MODEL_KEEP_ALIVE,
+    warm_timeout=MODEL_WARM_TIMEOUT_SECONDS
+)
+
 def run_research_pipeline(topic: str, llm_model_name: str):
     """
     Orchestrates the multi-agent research pipeline using a dynamically selected LLM.
@@ -35,26 +48,21 @@ def run_research_pipeline(topic: str, llm_model_name: str):
     }
 
     try:
+        # Fail fast from the cached readiness state if Ollama is down or the model is not pulled
+        model_registry.require(llm_model_name)
+
         # Initialize the LangChain Ollama LLM instance once
         # This LLM instance will be passed to all agents that need to interact with Ollama
         llm = OllamaLLM( # Changed to OllamaLLM
             model=llm_model_name,
-            base_url=os.getenv("OLLAMA_API_BASE_URL", "http://localhost:11434"), # Use .env var
+            base_url=OLLAMA_API_BASE_URL, # Use .env var
             temperature=0.0, # Keep temperature low for factual tasks
             num_ctx=4096, # Set context window if needed, adjust based on model capability
             # request_timeout parameter is now part of the OllamaLLM constructor
             request_timeout=OLLAMA_REQUEST_TIMEOUT_SECONDS, # Passed the timeout here
+            keep_alive=MODEL_KEEP_ALIVE, # Keep the model loaded between research runs
             stop=["--- End Search Results ---", "Summary:", "Feedback/Corrections:", "Final Research Brief:"] # Common stop sequences
         )
-        
-        # Test if Ollama is reachable and the model is loaded
-        try:
-            llm.invoke("Hello") # Simple test call
-        except Exception as e:
-            raise HTTPException(
-                status_code=503,
-                detail=f"Ollama connectivity issue: Could not reach Ollama server or model '{llm_model_name}' is not loaded. Error: {e}"
-            )
 
         # Step 1: Search Agent (does not use LLM directly)
         print("Orchestrator: Running Search Agent...")
@@ -2,7 +2,7 @@
 
 from fastapi import FastAPI, Form, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
-from orchestrator import handle_query, get_available_topics, TinyDB, Query # Import TinyDB and Query
+from orchestrator import handle_query, get_available_topics, model_registry, TinyDB, Query # Import TinyDB and Query
 import json
 import os
 from dotenv import load_dotenv # Import load_dotenv
@@ -33,6 +33,19 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+DEFAULT_LLM_MODEL = os.getenv("DEFAULT_LLM_MODEL", "llama3:latest")
+# --- UPDATED: Supported models list ---
+SUPPORTED_MODELS = ["qwen3:4b", "deepseek-r1:1.5b", "llama3:latest", "mistral:latest"]
+# Comma-separated models loaded into memory at startup (defaults to DEFAULT_LLM_MODEL); empty disables
+PREWARM_MODELS = [model.strip() for model in os.getenv("PREWARM_MODELS", DEFAULT_LLM_MODEL).split(",") if model.strip()]
+
+@app.on_event("startup")
+def start_model_registry():
+    """
+    Starts the Ollama heartbeat and pre-warms PREWARM_MODELS in the background.
+    """
+    model_registry.start(tracked=SUPPORTED_MODELS, prewarm=PREWARM_MODELS)
+
 # --- API Endpoints ---
 
 @app.get("/topics/")
@@ -49,7 +62,7 @@ async def chat_endpoint(
     topic: str = Form(...),
     user_input: str = Form(...),
     # --- UPDATED: Default LLM model to 'llama3:latest' ---
-    llm_model: str = Form(os.getenv("DEFAULT_LLM_MODEL", "llama3:latest")) 
+    llm_model: str = Form(DEFAULT_LLM_MODEL)
 ):
     """
     Handles a user message for a specific topic, processes it with the agent,
@@ -59,12 +72,10 @@ async def chat_endpoint(
         raise HTTPException(status_code=400, detail="Topic and user input cannot be empty.")
     
     # Validate the LLM model name
-    # --- UPDATED: Supported models list ---
-    supported_models = ["qwen3:4b", "deepseek-r1:1.5b", "llama3:latest", "mistral:latest"] 
-    if llm_model not in supported_models:
+    if llm_model not in SUPPORTED_MODELS:
         raise HTTPException(
             status_code=400,
-            detail=f"Unsupported LLM model: '{llm_model}'. Supported models are: {', '.join(supported_models)}"
+            detail=f"Unsupported LLM model: '{llm_model}'. Supported models are: {', '.join(SUPPORTED_MODELS)}"
         )
 
     print(f"INFO: Received chat request for topic: '{topic}' with model: '{llm_model}'")
@@ -117,6 +128,13 @@ async def export_topic_endpoint(topic_name: str):
     
     return result[0] # Return the entire topic object for export
 
+@app.get("/health/models")
+async def models_health():
+    """
+    Returns the cached readiness of Ollama and its models (ready = loaded, pulled = loads on first use).
+    """
+    return model_registry.status()
+
 # Ensure the memory directory exists
 os.makedirs("memory", exist_ok=True)
 
@@ -0,0 +1,188 @@
+# model_registry.py
+
+import threading
+import time
+import requests
+from fastapi import HTTPException
+
+def normalize_model_name(name: str) -> str:
+    """
+    Ollama reports untagged models with ":latest" ("llama2" is "llama2:latest").
+    """
+    return name if ":" in name else f"{name}:latest"
+
+class ModelRegistry:
+    """
+    Cached readiness of Ollama models, kept fresh by a background heartbeat against /api/tags
+    (pulled models) and /api/ps (models loaded in memory). Requests check the cached state with
+    require() instead of making a test generation, so a missing model or an unreachable server fails
+    in microseconds and a healthy request pays nothing. Models can be pre-warmed at startup: an
+    empty generate request with keep_alive loads them, so the first real request skips the load.
+    """
+
+    def __init__(self, base_url: str, heartbeat_seconds: float = 15, keep_alive: str = "30m",
+                 request_timeout: float = 5, recheck_seconds: float = 5, warm_timeout: float = 600):
+        self.base_url = base_url
+        self.heartbeat_seconds = heartbeat_seconds
+        self.keep_alive = keep_alive
+        self.request_timeout = request_timeout
+        # Loading a large model can take minutes, but a hung load must not pin the model in "warming"
+        self.warm_timeout = warm_timeout
+        # A failed state is re-checked on demand once it is this old, so a model pulled (or a server
+        # started) after the last heartbeat is picked up without waiting for the next one
+        self.recheck_seconds = recheck_seconds
+        self.tracked = []
+        self._lock = threading.Lock()
+        self._thread = None
+        self._warming = set()
+        self._warmed = {} # model -> {"warmed_at", "warm_seconds", "error"}
+        self._state = {"reachable": None, "installed": {}, "loaded": {}, "checked_at": None, "check_ms": None, "error": None}
+
+    def refresh(self) -> dict:
+        """
+        One heartbeat: reads pulled and loaded models from Ollama and updates the cached state.
+        """
+        started = time.perf_counter()
+        try:
+            tags = requests.get(f"{self.base_url}/api/tags", timeout=self.request_timeout)
+            tags.raise_for_status()
+            ps = requests.get(f"{self.base_url}/api/ps", timeout=self.request_timeout)
+            ps.raise_for_status()
+            state = {
+                "reachable": True,
+                "installed": {model["name"]: model for model in tags.json().get("models") or []},
+                "loaded": {model["name"]: model for model in ps.json().get("models") or []},
+                "error": None,
+            }
+        except (requests.exceptions.RequestException, ValueError) as e:
+            state = {"reachable": False, "installed": {}, "loaded": {}, "error": str(e)}
+        state["checked_at"] = time.time()
+        state["check_ms"] = round((time.perf_counter() - started) * 1000, 1)
+        with self._lock:
+            if state["reachable"] is False and self._state["reachable"]:
+                print(f"INFO: Ollama at {self.base_url} became unreachable: {state['error']}")
+            self._state = state
+        return state
+
+    def warm(self, model: str):
+        """
+        Loads a model into memory (an empty generate request) and keeps it there for keep_alive.
+        At most one warm-up per model runs at a time.
+        """
+        model = normalize_model_name(model)
+        with self._lock:
+            if model in self._warming:
+                return
+            self._warming.add(model)
+        started = time.perf_counter()
+        try:
+            response = requests.post(
+                f"{self.base_url}/api/generate",
+                json={"model": model, "keep_alive": self.keep_alive},
+                timeout=(self.request_timeout, self.warm_timeout)
+            )
+            response.raise_for_status()
+            result = {"warmed_at": time.time(), "warm_seconds": round(time.perf_counter() - started, 2), "error": None}
+            print(f"INFO: Model '{model}' warmed up in {result['warm_seconds']:.1f}s (keep_alive {self.keep_alive})")
+        except requests.exceptions.RequestException as e:
+            result = {"warmed_at": None, "warm_seconds": None, "error": str(e)}
+            print(f"INFO: Warming up model '{model}' failed: {e}")
+        with self._lock:
+            self._warming.discard(model)
+            self._warmed[model] = result
+        self.refresh()
+
+    def warm_in_background(self, model: str):
+        threading.Thread(target=self.warm, args=(model,), name=f"warm-{model}", daemon=True).start()
+
+    def start(self, tracked: list, prewarm: list = None):
+        """
+        Starts the heartbeat thread, reporting on the tracked models. Pulled prewarm models are warmed
+        in background threads, so the heartbeat keeps running while they load.
+        """
+        self.tracked = [normalize_model_name(model) for model in tracked]
+        if self._thread is not None:
+            return
+
+        def run():
+            pending = list(prewarm or [])
+            while True:
+                try:
+                    state = self.refresh()
+                    for model in pending:
+                        if normalize_model_name(model) in state["installed"]:
+                            self.warm_in_background(model)
+                    pending = []
+                except Exception as e:
+                    # Anything refresh() does not expect is logged; the heartbeat thread must keep running
+                    print(f"INFO: Ollama heartbeat failed: {e!r}")
+                time.sleep(self.heartbeat_seconds)
+
+        self._thread = threading.Thread(target=run, name="ollama-heartbeat", daemon=True)
+        self._thread.start()
+
+    def require(self, model: str):
+        """
+        Fails fast with a 503 HTTPException unless the server is reachable and the model is pulled, judged
+        from the cached state (re-checked only when it is missing or a failed state is recheck_seconds old).
+        A pulled model that is not loaded is warmed in the background; Ollama loads it on first use anyway.
+        """
+        model = normalize_model_name(model)
+        with self._lock:
+            state = self._state
+        age = time.time() - state["checked_at"] if state["checked_at"] else None
+        failed = not state["reachable"] or model not in state["installed"]
+        if age is None or age > 3 * self.heartbeat_seconds or (failed and age > self.recheck_seconds):
+            state = self.refresh()
+
+        if not state["reachable"]:
+            raise HTTPException(
+                status_code=503,
+                detail=f"Ollama connectivity issue: Could not reach Ollama server at {self.base_url}. Error: {state['error']}"
+            )
+        if model not in state["installed"]:
+            raise HTTPException(
+                status_code=503,
+                detail=f"Ollama model '{model}' is not pulled on {self.base_url}. Run 'ollama pull {model}' and retry."
+            )
+        if model not in state["loaded"]:
+            self.warm_in_background(model)
+
+    def status(self) -> dict:
+        """
+        Cached readiness of the server and of every tracked, pulled, or loaded model.
+        """
+        with self._lock:
+            state, warming, warmed = self._state, set(self._warming), dict(self._warmed)
+        names = dict.fromkeys(self.tracked + sorted(state["installed"]) + sorted(state["loaded"]))
+        models = []
+        for name in names:
+            loaded = state["loaded"].get(name)
+            if loaded:
+                readiness = "ready"
+            elif name in warming:
+                readiness = "warming"
+            elif name in state["installed"]:
+                readiness = "pulled" # Usable; the first request waits for the model to load
+            else:
+                readiness = "missing" if state["reachable"] else "unknown"
+            models.append({
+                "model": name,
+                "state": readiness,
+                "tracked": name in self.tracked,
+                "size_vram": loaded.get("size_vram") if loaded else None,
+                "expires_at": loaded.get("expires_at") if loaded else None,
+                **warmed.get(name, {}),
+            })
+        return {
+            "ollama": {
+                "base_url": self.base_url,
+                "reachable": state["reachable"],
+                "checked_at": state["checked_at"],
+                "check_ms": state["check_ms"],
+                "error": state["error"],
+            },
+            "heartbeat_seconds": self.heartbeat_seconds,
+            "keep_alive": self.keep_alive,
+            "models": models,
+        }
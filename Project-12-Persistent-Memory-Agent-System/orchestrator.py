@@ -5,6 +5,7 @@ from dotenv import load_dotenv # Import load_dotenv
 from fastapi import HTTPException
 from langchain_ollama import OllamaLLM # For Ollama LLM integration via LangChain
 from agents.memory_agent import run_agent, get_topic_history, get_all_topics, TinyDB, Query # Import TinyDB and Query
+from model_registry import ModelRegistry
 
 # Load environment variables from .env file
 load_dotenv()
@@ -12,6 +13,18 @@ load_dotenv()
 # Set a generous timeout for Ollama call (e.g., 2000 seconds)
 OLLAMA_REQUEST_TIMEOUT_SECONDS = 2000
 
+# Model readiness is tracked by a background heartbeat against Ollama (see model_registry.py) instead of
+# a test generation on every message. MODEL_KEEP_ALIVE keeps used and pre-warmed models loaded.
+OLLAMA_API_BASE_URL = os.getenv("OLLAMA_API_BASE_URL", "http://localhost:11434")
+MODEL_HEARTBEAT_SECONDS = float(os.getenv("MODEL_HEARTBEAT_SECONDS", "15"))
+MODEL_KEEP_ALIVE = os.getenv("MODEL_KEEP_ALIVE", "30m")
+MODEL_WARM_TIMEOUT_SECONDS = float(os.getenv("MODEL_WARM_TIMEOUT_SECONDS", "600"))
+
+model_registry = ModelRegistry(
+    OLLAMA_API_BASE_URL, heartbeat_seconds=MODEL_HEARTBEAT_SECONDS, keep_alive=MODEL_KEEP_ALIVE,
+    warm_timeout=MODEL_WARM_TIMEOUT_SECONDS
+)
+
 # Initialize TinyDB for memory management (ensure this path is correct relative to execution)
 # This is initialized here to be accessible for get_all_topics and handle_query
 db = TinyDB('memory/memory_store.json')
@@ -19,19 +32,20 @@ db = TinyDB('memory/memory_store.json')
 def get_llm_instance(llm_model_name: str) -> OllamaLLM:
     """
     Initializes and returns a LangChain OllamaLLM instance.
-    Includes a test call to ensure connectivity and model loading.
+    Connectivity and model availability are checked against the cached model registry state,
+    so an unreachable server or a missing model fails fast without a test generation.
     """
+    model_registry.require(llm_model_name) # Raises a 503 HTTPException when the model is not usable
     try:
         llm = OllamaLLM(
             model=llm_model_name,
-            base_url=os.getenv("OLLAMA_API_BASE_URL", "http://localhost:11434"),
+            base_url=OLLAMA_API_BASE_URL,
             temperature=0.0, # Keep temperature low for factual/consistent responses
             num_ctx=4096, # Adjust context window as needed for your LLM
             request_timeout=OLLAMA_REQUEST_TIMEOUT_SECONDS,
+            keep_alive=MODEL_KEEP_ALIVE, # Keep the model loaded between chat messages
             stop=["User:", "AI:"] # Common stop sequences for conversational turns
         )
-        # Simple test call to ensure Ollama is reachable and the model is loaded
-        llm.invoke("Hello")
         return llm
     except Exception as e:
         raise HTTPException(